@@ -27,6 +27,8 @@ echo "Copying application files..."
 rsync -av --exclude='__pycache__' --exclude='*.pyc' spf_time/ "$APP_BUNDLE/spf_time/"
 cp pyproject.toml "$APP_BUNDLE/"
 cp generate_report.py "$APP_BUNDLE/"
+cp import_records.py "$APP_BUNDLE/"
+cp manage_db.py "$APP_BUNDLE/"
 cp run.sh "$APP_BUNDLE/"
 cp spf-time.desktop "$APP_BUNDLE/"
 cp README.md "$APP_BUNDLE/"
@@ -63,6 +65,8 @@ echo "Copying application files..."
 cp -r spf_time/ "$TARGET_DIR/" 2>/dev/null || true
 cp pyproject.toml "$TARGET_DIR/" 2>/dev/null || true
 cp generate_report.py "$TARGET_DIR/" 2>/dev/null || true
+cp import_records.py "$TARGET_DIR/" 2>/dev/null || true
+cp manage_db.py "$TARGET_DIR/" 2>/dev/null || true
 cp run.sh "$TARGET_DIR/" 2>/dev/null || true
 cp README.md "$TARGET_DIR/" 2>/dev/null || true
 
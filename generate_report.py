@@ -3,16 +3,21 @@
 Command-line time tracking report generator.
 
 Usage:
-    python generate_report.py <weeks> [-o=csv]
+    python generate_report.py <weeks> [-o=csv] [--snapshot [PATH]]
+    python generate_report.py --at "YYYY-MM-DD HH:MM"
     
 Arguments:
     weeks: Number of weeks to include in the report
     -o=csv: Optional flag to output CSV format instead of ASCII table
+    --snapshot: Read from a consistent snapshot instead of the live database
+    --at: List who was clocked in at the given time instead
 """
 
 import argparse
+import datetime
 import sys
 import os
+import tempfile
 
 # Add the spf_time module to the path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'spf_time'))
@@ -30,49 +35,88 @@ def main():
 Examples:
   python generate_report.py 2           # Generate ASCII table for last 2 weeks
   python generate_report.py 4 -o=csv    # Generate CSV report for last 4 weeks
+  python generate_report.py 52 --snapshot                 # Report from a fresh snapshot of the live database
+  python generate_report.py 4 --snapshot=nightly.db       # Report from an existing backup file
+  python generate_report.py --at "2024-03-05 14:30"       # Who was clocked in at that time
         """
     )
     
-    parser.add_argument('weeks', type=int, help='Number of weeks to include in the report')
+    parser.add_argument('weeks', type=int, nargs='?', help='Number of weeks to include in the report')
     parser.add_argument('-o', '--output', choices=['csv'], 
                        help='Output format (csv for CSV, omit for ASCII table)')
+    parser.add_argument('--snapshot', nargs='?', const='', metavar='PATH',
+                       help='Read from a snapshot file (from manage_db.py backup); without PATH, '
+                            'take a fresh snapshot of the live database first')
+    parser.add_argument('--at', metavar='"YYYY-MM-DD HH:MM"', type=datetime.datetime.fromisoformat,
+                       help='List who was clocked in at this time instead of a weekly report')
     
     args = parser.parse_args()
     
     # Validate weeks argument
-    if args.weeks < 1:
-        print("Error: Number of weeks must be at least 1", file=sys.stderr)
-        sys.exit(1)
-    
-    if args.weeks > 52:
-        print("Error: Number of weeks cannot exceed 52", file=sys.stderr)
-        sys.exit(1)
+    if args.at is None:
+        if args.weeks is None:
+            parser.error("the number of weeks is required unless --at is given")
+        
+        if args.weeks < 1:
+            print("Error: Number of weeks must be at least 1", file=sys.stderr)
+            sys.exit(1)
+        
+        if args.weeks > 52:
+            print("Error: Number of weeks cannot exceed 52", file=sys.stderr)
+            sys.exit(1)
     
     try:
         # Load configuration
         config = Config()
         
-        # Create database manager
-        db_manager = DatabaseManager(config.database.db_path)
-        
-        # Create report generator
-        generator = ReportGenerator(config, db_manager)
-        
-        # Generate report data
-        records, employees, start_date, end_date = generator.get_report_data(args.weeks)
-        
-        # Generate and display report
-        if args.output == 'csv':
-            report = generator.generate_csv_report(records, employees)
-            print(report, end='')
-        else:
-            # ASCII table output
-            print(f"Time Tracking Report - {args.weeks} Week{'s' if args.weeks > 1 else ''}")
-            print(f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
-            print()
+        # Create database manager; the finally below closes it and removes a temporary snapshot
+        db_manager = None
+        snapshot_path = None
+        try:
+            if args.snapshot:
+                db_manager = DatabaseManager.open_snapshot(args.snapshot)
+            elif args.snapshot is not None:
+                # Copy the live database in small steps, then report from the copy so
+                # a long report never holds a read transaction on the kiosk database
+                live_db = DatabaseManager.from_config(config.database)
+                fd, snapshot_path = tempfile.mkstemp(prefix='spf-snapshot-', suffix='.db')
+                os.close(fd)
+                try:
+                    live_db.backup_to(snapshot_path)
+                finally:
+                    live_db.close()
+                db_manager = DatabaseManager.open_snapshot(snapshot_path)
+            else:
+                db_manager = DatabaseManager.from_config(config.database)
+            
+            # Create report generator
+            generator = ReportGenerator(config, db_manager)
             
-            report = generator.generate_ascii_table(records, employees)
-            print(report)
+            # Generate and display report
+            if args.at is not None:
+                employees = {emp.id: emp.name for emp in db_manager.get_employees(active_only=False)}
+                print(generator.generate_on_site_report(args.at, employees))
+            elif args.output == 'csv':
+                # Stream rows straight to stdout so memory stays flat for long ranges
+                records, employees, start_date, end_date = generator.iter_report_data(args.weeks)
+                generator.write_csv_report(records, employees, sys.stdout, start_date, end_date)
+            else:
+                # The ASCII table sizes its columns from every row, so it needs the full list
+                records, employees, start_date, end_date = generator.get_report_data(args.weeks)
+                
+                # ASCII table output
+                print(f"Time Tracking Report - {args.weeks} Week{'s' if args.weeks > 1 else ''}")
+                print(f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
+                print()
+                
+                report = generator.generate_ascii_table(records, employees, start_date, end_date)
+                print(report)
+        finally:
+            # Removes any archive files inflated for this report
+            if db_manager is not None:
+                db_manager.close()
+            if snapshot_path:
+                os.remove(snapshot_path)
     
     except FileNotFoundError as e:
         print(f"Error: Configuration or database file not found: {e}", file=sys.stderr)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Command-line bulk importer for historical time records.
+
+Usage:
+    python import_records.py <csv_file> [--dry-run] [--create-employees]
+
+The CSV must use the same columns generate_report.py -o=csv produces:
+    Employee,Date,Clock In,Clock Out,Duration (Hours)
+
+Rows that are still clocked in or fail validation are reported and skipped.
+All valid rows are inserted in a single transaction; a row overlapping
+another session of the same employee aborts the whole import.
+"""
+
+import argparse
+import csv
+import datetime
+import sys
+import os
+
+# Add the spf_time module to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'spf_time'))
+
+from spf_time.database import DatabaseManager
+from spf_time.interval_index import OverlapError
+from spf_time.config import Config
+from spf_time.business_rules import TimeTrackingRules
+
+STILL_CLOCKED_IN = 'Still Clocked In'
+
+
+def read_employee_names(csv_path):
+    """First pass: collect the distinct employee names so they can be resolved in bulk"""
+    with open(csv_path, newline='') as f:
+        return {row['Employee'].strip() for row in csv.DictReader(f)}
+
+
+def parse_row(row):
+    """Return (employee_name, clock_in, clock_out) for one CSV row"""
+    work_date = datetime.date.fromisoformat(row['Date'].strip())
+    clock_in = datetime.datetime.combine(work_date, datetime.time.fromisoformat(row['Clock In'].strip()))
+
+    clock_out_text = row['Clock Out'].strip()
+    if clock_out_text == STILL_CLOCKED_IN:
+        raise ValueError("open sessions cannot be imported")
+
+    clock_out = datetime.datetime.combine(work_date, datetime.time.fromisoformat(clock_out_text))
+    # Reports only carry the clock-in date, so an earlier clock-out time means the shift crossed midnight
+    if clock_out <= clock_in:
+        clock_out += datetime.timedelta(days=1)
+
+    return row['Employee'].strip(), clock_in, clock_out
+
+
+def iter_valid_records(csv_path, employee_ids, rules, stats):
+    """Second pass: stream validated (employee_id, clock_in, clock_out) tuples"""
+    with open(csv_path, newline='') as f:
+        # Line 1 is the header
+        for line_number, row in enumerate(csv.DictReader(f), start=2):
+            try:
+                name, clock_in, clock_out = parse_row(row)
+            except (KeyError, ValueError, AttributeError) as e:
+                print(f"Line {line_number}: skipped ({e})", file=sys.stderr)
+                stats['skipped'] += 1
+                continue
+
+            employee_id = employee_ids.get(name)
+            if employee_id is None:
+                print(f"Line {line_number}: skipped (unknown employee '{name}')", file=sys.stderr)
+                stats['skipped'] += 1
+                continue
+
+            valid, message = rules.validate_time_entry(clock_in, clock_out)
+            if not valid:
+                print(f"Line {line_number}: skipped ({message})", file=sys.stderr)
+                stats['skipped'] += 1
+                continue
+
+            stats['valid'] += 1
+            stats['line'] = line_number
+            yield employee_id, clock_in, clock_out
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Import time records from a CSV file',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python import_records.py timesheets.csv                     # Import records for known employees
+  python import_records.py timesheets.csv --create-employees  # Also add employees not yet in the database
+  python import_records.py timesheets.csv --dry-run           # Validate only, write nothing
+        """
+    )
+
+    parser.add_argument('csv_file', help='CSV file in the generate_report.py -o=csv layout')
+    parser.add_argument('--dry-run', action='store_true',
+                       help='Validate the file without writing to the database')
+    parser.add_argument('--create-employees', action='store_true',
+                       help='Create employees that do not exist yet')
+
+    args = parser.parse_args()
+
+    try:
+        config = Config()
+        db_manager = DatabaseManager.from_config(config.database)
+        rules = TimeTrackingRules(db_manager, config)
+
+        names = read_employee_names(args.csv_file)
+        employee_ids = db_manager.get_employee_ids_by_name(
+            names, create_missing=args.create_employees and not args.dry_run
+        )
+        if args.dry_run and args.create_employees:
+            # Pretend missing employees exist so their rows are still validated
+            employee_ids.update({name: -1 for name in names if name not in employee_ids})
+
+        stats = {'valid': 0, 'skipped': 0, 'line': None}
+        records = iter_valid_records(args.csv_file, employee_ids, rules, stats)
+
+        if args.dry_run:
+            for _ in records:
+                pass
+            print(f"Dry run: {stats['valid']} records valid, {stats['skipped']} skipped")
+        else:
+            inserted = db_manager.bulk_insert_time_records(records)
+            print(f"Imported {inserted} records, {stats['skipped']} skipped")
+
+    except FileNotFoundError as e:
+        print(f"Error: File not found: {e}", file=sys.stderr)
+        sys.exit(1)
+    except OverlapError as e:
+        print(f"Line {stats['line']}: {e}; nothing was imported", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error importing records: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Database maintenance commands.
+
+Usage:
+    python manage_db.py rebuild-rollups
+    python manage_db.py archive [--before YYYY-MM-DD]
+    python manage_db.py backup <dest> [--pages N] [--sleep-ms MS]
+    python manage_db.py close-period [--weeks N]
+    python manage_db.py periods
+"""
+
+import argparse
+import datetime
+import sys
+import os
+
+# Add the spf_time module to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'spf_time'))
+
+from spf_time.database import DatabaseManager
+from spf_time.config import Config
+from spf_time.report_generator import ReportGenerator
+
+
+def rebuild_rollups(db_manager, config, args):
+    days = db_manager.rebuild_daily_hours()
+    print(f"Rebuilt daily hours rollup: {days} employee-days")
+
+
+def archive(db_manager, config, args):
+    if args.before:
+        before = datetime.date.fromisoformat(args.before)
+    elif db_manager.archive_after_days > 0:
+        before = datetime.date.today() - datetime.timedelta(days=db_manager.archive_after_days)
+    else:
+        print("Error: archive_after_days is 0 in settings.toml; pass --before to archive anyway", file=sys.stderr)
+        sys.exit(1)
+
+    moved = db_manager.archive_closed_records(before)
+    print(f"Archived {moved} closed records clocked in before {before.isoformat()} to {db_manager.archive_dir}/")
+
+
+def backup(db_manager, config, args):
+    db_manager.backup_to(args.dest, pages_per_step=args.pages, step_sleep_ms=args.sleep_ms)
+    print(f"Backed up {db_manager.db_path} to {args.dest}")
+
+
+def close_period(db_manager, config, args):
+    if args.weeks < 1:
+        print("Error: Number of weeks must be at least 1", file=sys.stderr)
+        sys.exit(1)
+
+    start_date, _ = ReportGenerator(config, db_manager).get_previous_complete_weeks_range(args.weeks)
+    for week in range(args.weeks):
+        week_start = start_date + datetime.timedelta(weeks=week)
+        period = db_manager.close_payroll_period(week_start, week_start + datetime.timedelta(days=6))
+        print(f"Closed payroll period {period.start_date.isoformat()} to {period.end_date.isoformat()}: "
+              f"{period.content_hash[:12]} at {period.closed_at.strftime('%Y-%m-%d %H:%M')}")
+
+
+def periods(db_manager, config, args):
+    for period in db_manager.get_payroll_periods():
+        status = '  STALE' if period.stale else ''
+        if period.reopen_count:
+            status += f"  reopened {period.reopen_count}x"
+        print(f"{period.start_date.isoformat()} to {period.end_date.isoformat()}  {period.content_hash[:12]}  "
+              f"closed {period.closed_at.strftime('%Y-%m-%d %H:%M')}{status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Time tracking database maintenance',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python manage_db.py rebuild-rollups             # Recompute daily hour totals from the time records
+  python manage_db.py archive                     # Archive records older than archive_after_days
+  python manage_db.py archive --before 2024-01-01 # Archive records clocked in before a date
+  python manage_db.py backup nightly.db           # Online backup while the kiosk keeps running
+  python manage_db.py close-period                # Freeze hours for the last complete payroll week
+  python manage_db.py close-period --weeks 4      # Close (or re-close stale) weeks among the last 4
+  python manage_db.py periods                     # List closed periods and which were reopened
+        """
+    )
+
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    rebuild_parser = subparsers.add_parser('rebuild-rollups',
+                                           help='Recompute the daily hours rollup from time records')
+    rebuild_parser.set_defaults(func=rebuild_rollups)
+
+    archive_parser = subparsers.add_parser('archive',
+                                           help='Move old closed records into per-year archive files')
+    archive_parser.add_argument('--before', metavar='YYYY-MM-DD',
+                                help='Archive records clocked in before this date (default: archive_after_days)')
+    archive_parser.set_defaults(func=archive)
+
+    backup_parser = subparsers.add_parser('backup',
+                                          help='Copy the live database to a consistent snapshot file')
+    backup_parser.add_argument('dest', help='Snapshot file to write (replaced atomically)')
+    backup_parser.add_argument('--pages', type=int, default=256,
+                               help='Pages copied per step (default: 256)')
+    backup_parser.add_argument('--sleep-ms', type=int, default=10,
+                               help='Pause between steps so kiosk writes keep flowing (default: 10)')
+    backup_parser.set_defaults(func=backup)
+
+    close_parser = subparsers.add_parser('close-period',
+                                         help='Freeze per-employee, per-day hours of finished payroll weeks')
+    close_parser.add_argument('--weeks', type=int, default=1,
+                              help='Close each of this many complete payroll weeks (default: 1, the last one)')
+    close_parser.set_defaults(func=close_period)
+
+    periods_parser = subparsers.add_parser('periods',
+                                           help='List closed payroll periods, flagging stale ones')
+    periods_parser.set_defaults(func=periods)
+
+    args = parser.parse_args()
+
+    try:
+        config = Config()
+        db_manager = DatabaseManager.from_config(config.database)
+        args.func(db_manager, config, args)
+        db_manager.close()
+
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
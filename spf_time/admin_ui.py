@@ -8,11 +8,14 @@ from kivy.uix.textinput import TextInput
 from kivy.uix.spinner import Spinner
 from kivy.clock import Clock
 import datetime
-from typing import List, Optional, Tuple
+import bisect
+from typing import Dict, List, Optional, Tuple
 import csv
 import io
 
-from .database import DatabaseManager, TimeRecord
+from .database import ArchivedRecordError, TimeRecord
+from .interval_index import OverlapError
+from .storage import StorageBackend
 from .config import Config
 from .email_service import EmailService
 from .time_picker import QuickTimePickerDialog, DateTimePickerDialog
@@ -250,7 +253,8 @@ class PinEntryDialog(Popup):
         Clock.schedule_once(lambda dt: error_popup.dismiss(), 2)
 
 class TimeRecordRow(BoxLayout):
-    def __init__(self, record: TimeRecord, employee_name: str, on_edit_callback, on_delete_callback, **kwargs):
+    def __init__(self, record: TimeRecord, employee_name: str, on_edit_callback, on_delete_callback,
+                 read_only: bool = False, **kwargs):
         super().__init__(**kwargs)
         self.orientation = 'horizontal'
         self.size_hint_y = None
@@ -332,8 +336,16 @@ class TimeRecordRow(BoxLayout):
         self.add_widget(clock_in_label)
         self.add_widget(clock_out_label)
         self.add_widget(duration_label)
-        self.add_widget(edit_btn)
-        self.add_widget(delete_btn)
+        if read_only:
+            # Archived records can't be changed; say so instead of offering buttons that fail
+            self.add_widget(Label(
+                text='Archived (read-only)',
+                size_hint_x=0.25,
+                color=[0.7, 0.7, 0.7, 1]
+            ))
+        else:
+            self.add_widget(edit_btn)
+            self.add_widget(delete_btn)
     
     def confirm_delete(self):
         popup = Popup(
@@ -508,12 +520,13 @@ class TimeEditDialog(Popup):
             Clock.schedule_once(lambda dt: error_popup.dismiss(), 3)
             return
         
+        # Save first; the dialog stays open if the change is rejected (e.g. it overlaps another session)
+        if not self.on_save_callback(self.working_record):
+            return
+        
         # Update the original record
         self.record.clock_in = self.working_record.clock_in
         self.record.clock_out = self.working_record.clock_out
-        
-        # Call the save callback
-        self.on_save_callback(self.record)
         self.dismiss()
 
 class TouchKeypad(BoxLayout):
@@ -669,7 +682,7 @@ class TouchDatePicker(BoxLayout):
         return self.current_date
 
 class AddEntryDialog(Popup):
-    def __init__(self, db_manager: 'DatabaseManager', config: 'Config', on_save_callback, **kwargs):
+    def __init__(self, db_manager: StorageBackend, config: Config, on_save_callback, **kwargs):
         super().__init__(**kwargs)
         self.db_manager = db_manager
         self.config = config
@@ -777,6 +790,8 @@ class AddEntryDialog(Popup):
             else:
                 self.show_error("Failed to add time entry")
                 
+        except OverlapError as e:
+            self.show_error(f"This entry {str(e)}")
         except ValueError as e:
             self.show_error(f"Invalid input: {str(e)}")
         except Exception as e:
@@ -784,27 +799,15 @@ class AddEntryDialog(Popup):
     
     def get_or_create_employee_id(self, employee_name: str) -> int:
         """Get employee ID from database, create if doesn't exist"""
-        # First try to find existing employee
-        employees = self.db_manager.get_employees(active_only=False)
-        for emp in employees:
-            if emp.name == employee_name:
-                return emp.id
-        
-        # If not found, create new employee
-        return self.db_manager.add_employee(employee_name)
+        return self.db_manager.get_or_create_employee(employee_name)
     
     def _add_complete_time_record(self, employee_id: int, clock_in: datetime.datetime, clock_out: datetime.datetime) -> bool:
         """Add a complete time record with both clock in and clock out times"""
-        import sqlite3
         try:
-            with sqlite3.connect(self.db_manager.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO time_records (employee_id, clock_in, clock_out, created_at) 
-                    VALUES (?, ?, ?, ?)
-                ''', (employee_id, clock_in, clock_out, datetime.datetime.now()))
-                conn.commit()
-                return cursor.rowcount > 0
+            # Go through the storage backend so the row is stored in the database's timestamp format
+            return self.db_manager.add_time_record(employee_id, clock_in, clock_out) is not None
+        except OverlapError:
+            raise
         except Exception:
             return False
     
@@ -827,13 +830,22 @@ class AddEntryDialog(Popup):
         Clock.schedule_once(lambda dt: success_popup.dismiss(), 2)
 
 class AdminUI(BoxLayout):
-    def __init__(self, db_manager: DatabaseManager, config: Config, **kwargs):
+    def __init__(self, db_manager: StorageBackend, config: Config, **kwargs):
         super().__init__(**kwargs)
         self.db_manager = db_manager
         self.config = config
         self.email_service = EmailService(config)
         self.report_generator = ReportGenerator(config, db_manager)
         
+        # Rows currently shown, keyed by record id, plus their display order
+        # (newest clock-in first) so single changes can be applied in place.
+        # Sort keys are kept separately because the edit dialog mutates row records.
+        self.record_rows: Dict[int, TimeRecordRow] = {}
+        self.record_keys: Dict[int, Tuple[float, int]] = {}
+        self.record_order: List[Tuple[float, int]] = []
+        self.window_start: Optional[datetime.date] = None
+        self.change_seq = 0
+        
         self.orientation = 'vertical'
         self.spacing = '10dp'
         self.padding = '10dp'
@@ -848,7 +860,7 @@ class AdminUI(BoxLayout):
         title_label = Label(
             text='Admin Panel - Time Records (Last 14 Days)',
             font_size='18sp',
-            size_hint_x=0.55
+            size_hint_x=0.4
         )
         
         add_entry_btn = Button(
@@ -863,7 +875,7 @@ class AdminUI(BoxLayout):
             size_hint_x=0.15,
             background_color=[0.3, 0.8, 0.3, 1]
         )
-        refresh_btn.bind(on_press=lambda x: self.load_time_records())
+        refresh_btn.bind(on_press=lambda x: self.refresh_time_records())
         
         email_btn = Button(
             text='Send Report',
@@ -872,7 +884,15 @@ class AdminUI(BoxLayout):
         )
         email_btn.bind(on_press=lambda x: self.send_email_report())
         
+        on_site_btn = Button(
+            text='On Site',
+            size_hint_x=0.15,
+            background_color=[0.6, 0.4, 0.8, 1]
+        )
+        on_site_btn.bind(on_press=lambda x: self.show_on_site_picker())
+        
         header_layout.add_widget(title_label)
+        header_layout.add_widget(on_site_btn)
         header_layout.add_widget(add_entry_btn)
         header_layout.add_widget(refresh_btn)
         header_layout.add_widget(email_btn)
@@ -908,28 +928,78 @@ class AdminUI(BoxLayout):
     
     def load_time_records(self):
         self.records_layout.clear_widgets()
+        self.record_rows = {}
+        self.record_keys = {}
+        self.record_order = []
         
         # Get records from last 14 days (including today)
         end_date = datetime.date.today()
         start_date = end_date - datetime.timedelta(days=13)  # 13 days ago + today = 14 days total
+        self.window_start = start_date
         
+        # Read the sequence first: a change racing with the query is replayed by the next refresh
+        self.change_seq = self.db_manager.get_change_seq()
         records = self.db_manager.get_time_records(
             start_date=start_date,
             end_date=end_date
         )
         
         # Get employee names
-        employees = {emp.id: emp.name for emp in self.db_manager.get_employees(active_only=False)}
+        self.employees = {emp.id: emp.name for emp in self.db_manager.get_employees(active_only=False)}
         
+        archived_ids = self.db_manager.get_archived_record_ids(record.id for record in records)
         for record in records:
-            employee_name = employees.get(record.employee_id, 'Unknown')
-            record_row = TimeRecordRow(
-                record=record,
-                employee_name=employee_name,
-                on_edit_callback=self.edit_record,
-                on_delete_callback=self.delete_record
-            )
-            self.records_layout.add_widget(record_row)
+            self._add_record_row(record, read_only=record.id in archived_ids)
+    
+    def refresh_time_records(self):
+        """Apply only the records changed since the last load or refresh"""
+        if self.window_start != datetime.date.today() - datetime.timedelta(days=13):
+            # The 14-day window moved on, so rows may have aged out
+            self.load_time_records()
+            return
+        
+        changes = self.db_manager.changes_since(self.change_seq)
+        if not changes:
+            return
+        self.change_seq = changes[-1].seq
+        
+        changed_ids = {change.record_id for change in changes}
+        for record_id in changed_ids:
+            self._remove_record_row(record_id)
+        
+        records = self.db_manager.get_time_records_by_ids(changed_ids)
+        for record in records:
+            if record.employee_id not in self.employees:
+                employee = self.db_manager.get_employee(record.employee_id)
+                self.employees[record.employee_id] = employee.name if employee else 'Unknown'
+        
+        window_start = datetime.datetime.combine(self.window_start, datetime.time.min)
+        for record in records:
+            if record.clock_in >= window_start:
+                self._add_record_row(record)
+    
+    def _add_record_row(self, record: TimeRecord, read_only: bool = False):
+        record_row = TimeRecordRow(
+            record=record,
+            employee_name=self.employees.get(record.employee_id, 'Unknown'),
+            on_edit_callback=self.edit_record,
+            on_delete_callback=self.delete_record,
+            read_only=read_only
+        )
+        key = (-record.clock_in.timestamp(), -record.id)
+        position = bisect.bisect(self.record_order, key)
+        self.record_order.insert(position, key)
+        self.record_keys[record.id] = key
+        self.record_rows[record.id] = record_row
+        # Kivy lists children last-displayed first, so count the index from the end
+        self.records_layout.add_widget(record_row, index=len(self.records_layout.children) - position)
+    
+    def _remove_record_row(self, record_id: int):
+        record_row = self.record_rows.pop(record_id, None)
+        if record_row is None:
+            return
+        self.record_order.remove(self.record_keys.pop(record_id))
+        self.records_layout.remove_widget(record_row)
     
     def edit_record(self, record: TimeRecord, employee_name: str):
         edit_dialog = TimeEditDialog(
@@ -939,7 +1009,8 @@ class AdminUI(BoxLayout):
         )
         edit_dialog.open()
     
-    def save_record_changes(self, record: TimeRecord):
+    def save_record_changes(self, record: TimeRecord) -> bool:
+        """Store an edited record; returns whether it was saved"""
         try:
             success = self.db_manager.update_time_record(
                 record_id=record.id,
@@ -949,12 +1020,18 @@ class AdminUI(BoxLayout):
             
             if success:
                 self.show_message("Time record updated successfully!")
-                self.load_time_records()  # Refresh the list
+                self.refresh_time_records()  # Refresh the changed row
             else:
                 self.show_message("Failed to update time record.")
-                
+            return success
+        
+        except OverlapError as e:
+            self.show_message(f"Not saved: this record {str(e)}")
+        except ArchivedRecordError:
+            self.show_message("Not saved: this record is archived and read-only.")
         except Exception as e:
             self.show_message(f"Error updating record: {str(e)}")
+        return False
     
     def delete_record(self, record: TimeRecord):
         try:
@@ -962,10 +1039,12 @@ class AdminUI(BoxLayout):
             
             if success:
                 self.show_message("Time record deleted successfully!")
-                self.load_time_records()  # Refresh the list
+                self.refresh_time_records()  # Drop the deleted row
             else:
                 self.show_message("Failed to delete time record.")
                 
+        except ArchivedRecordError:
+            self.show_message("Not deleted: this record is archived and read-only.")
         except Exception as e:
             self.show_message(f"Error deleting record: {str(e)}")
     
@@ -984,10 +1063,10 @@ class AdminUI(BoxLayout):
             records, employees, start_date, end_date = self.report_generator.get_report_data(2)
             
             # Create CSV report using shared generator
-            csv_data = self.report_generator.generate_csv_report(records, employees)
+            csv_data = self.report_generator.generate_csv_report(records, employees, start_date, end_date)
             
             # Generate HTML tables for email
-            html_tables = self.report_generator.generate_email_tables(records, employees)
+            html_tables = self.report_generator.generate_email_tables(records, employees, start_date, end_date)
             
             # Send email
             date_range = f"{start_date.strftime('%m/%d/%Y')} - {end_date.strftime('%m/%d/%Y')}"
@@ -1001,12 +1080,38 @@ class AdminUI(BoxLayout):
         except Exception as e:
             self.show_message(f"Error sending report: {str(e)}")
     
+    def show_on_site_picker(self):
+        picker = DateTimePickerDialog(
+            initial_datetime=datetime.datetime.now(),
+            title='Who Was On Site?',
+            on_save_callback=self.show_on_site
+        )
+        picker.open()
+    
+    def show_on_site(self, moment: datetime.datetime):
+        """List everyone clocked in at the given moment"""
+        sessions = self.db_manager.get_sessions_at(moment)
+        lines = [f"On site at {moment.strftime('%Y-%m-%d %H:%M')}:"]
+        for session in sessions:
+            employee = self.db_manager.get_employee(session.employee_id)
+            clock_out = session.clock_out.strftime('%H:%M') if session.clock_out else 'now'
+            lines.append(f"{employee.name if employee else 'Unknown'} ({session.clock_in.strftime('%H:%M')} - {clock_out})")
+        if not sessions:
+            lines.append("Nobody")
+        
+        popup = Popup(
+            title='On Site',
+            content=Label(text='\n'.join(lines)),
+            size_hint=(0.6, 0.6)
+        )
+        popup.open()
+    
     def show_add_entry_dialog(self):
         """Show dialog to add a new time entry"""
         add_dialog = AddEntryDialog(
             db_manager=self.db_manager,
             config=self.config,
-            on_save_callback=self.load_time_records
+            on_save_callback=self.refresh_time_records
         )
         add_dialog.open()
     
@@ -0,0 +1,112 @@
+"""
+asyncio-friendly facade over DatabaseManager.
+Every call runs on a bounded pool of worker threads, so SQLite is never
+touched from the event loop thread.
+"""
+
+import asyncio
+import datetime
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Optional
+
+from .database import DatabaseManager, TimeRecord
+
+
+class AsyncDatabaseManager:
+    """Awaitable equivalents of every public DatabaseManager method.
+
+    Each worker thread gets its own long-lived connection from DatabaseManager,
+    so reports can read concurrently while a write is in flight (WAL mode).
+    """
+
+    def __init__(self, db_manager: DatabaseManager, max_workers: int = 4, max_pending: int = 64):
+        self.db_manager = db_manager
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='spf-db')
+        # Bounds queued calls so a burst of callers cannot grow the executor queue without limit
+        self._pending = asyncio.Semaphore(max_pending)
+
+    async def run(self, func, *args, **kwargs):
+        """Run any callable on a database worker thread and await its result"""
+        async with self._pending:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def __getattr__(self, name):
+        attr = getattr(self.db_manager, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+        return call
+
+    async def iter_time_records(self, employee_id: Optional[int] = None,
+                                start_date: Optional[datetime.date] = None,
+                                end_date: Optional[datetime.date] = None,
+                                chunk_size: int = 500,
+                                descending: bool = True,
+                                overlapping: bool = False) -> AsyncIterator[TimeRecord]:
+        """Async counterpart of DatabaseManager.iter_time_records.
+
+        The underlying cursor lives on one worker thread for the whole scan and
+        hands chunks over through a small queue, so memory stays bounded and a
+        slow consumer applies backpressure to the reader.
+        """
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue(maxsize=2)
+        stopped = threading.Event()
+        done = object()
+
+        def produce():
+            chunk = []
+            try:
+                for record in self.db_manager.iter_time_records(
+                        employee_id, start_date, end_date, chunk_size, descending, overlapping):
+                    chunk.append(record)
+                    if len(chunk) >= chunk_size:
+                        asyncio.run_coroutine_threadsafe(chunks.put(chunk), loop).result()
+                        chunk = []
+                        if stopped.is_set():
+                            return
+                if chunk:
+                    asyncio.run_coroutine_threadsafe(chunks.put(chunk), loop).result()
+            except Exception as e:
+                asyncio.run_coroutine_threadsafe(chunks.put(e), loop).result()
+            finally:
+                if not stopped.is_set():
+                    asyncio.run_coroutine_threadsafe(chunks.put(done), loop).result()
+
+        async with self._pending:
+            producer = loop.run_in_executor(self._executor, produce)
+            try:
+                while True:
+                    chunk = await chunks.get()
+                    if chunk is done:
+                        break
+                    if isinstance(chunk, Exception):
+                        raise chunk
+                    for record in chunk:
+                        yield record
+            finally:
+                # Consumer stopped early: tell the producer and free queue space so it can exit
+                stopped.set()
+                while not producer.done():
+                    while not chunks.empty():
+                        chunks.get_nowait()
+                    await asyncio.sleep(0.01)
+
+    async def close(self, close_manager: bool = False):
+        """Wait for in-flight calls and stop the workers"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, functools.partial(self._executor.shutdown, wait=True))
+        if close_manager:
+            self.db_manager.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
@@ -1,10 +1,95 @@
 import datetime
-from typing import List, Optional, Tuple
-from .database import DatabaseManager, TimeRecord
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from .database import TimeRecord
+from .storage import StorageBackend
 from .config import Config
 
+@dataclass
+class EmployeeHours:
+    """Hours worked by one employee over a date range"""
+    employee_id: int
+    daily: Dict[datetime.date, float] = field(default_factory=dict)
+    # Keyed by payroll week start; weeks cut by the range only count the days inside it
+    weekly: Dict[datetime.date, float] = field(default_factory=dict)
+    total: float = 0.0
+
+@dataclass
+class SessionSlice:
+    """The part of one session that falls on a single calendar day"""
+    employee_id: int
+    record_id: Optional[int]
+    start: datetime.datetime
+    end: datetime.datetime
+    # The piece of a still-open session that runs up to now
+    ongoing: bool = False
+    
+    @property
+    def date(self) -> datetime.date:
+        return self.start.date()
+    
+    @property
+    def hours(self) -> float:
+        return (self.end - self.start).total_seconds() / 3600
+
+def payroll_week_start(date: datetime.date, start_day: int) -> datetime.date:
+    return date - datetime.timedelta(days=(date.weekday() - start_day) % 7)
+
+def split_session(record: TimeRecord, now: Optional[datetime.datetime] = None,
+                  range_start: Optional[datetime.datetime] = None,
+                  range_end: Optional[datetime.datetime] = None) -> Iterator[SessionSlice]:
+    """Cut a session at each midnight, which is also where payroll weeks begin.
+    
+    Open sessions run until now. With a range, pieces are clipped to
+    [range_start, range_end); without one, an empty session still yields a
+    single empty piece so it can be listed.
+    """
+    session_end = record.clock_out or now or datetime.datetime.now()
+    start = max(record.clock_in, range_start) if range_start else record.clock_in
+    end = min(session_end, range_end) if range_end else session_end
+    if start >= end:
+        if range_start is None and range_end is None:
+            yield SessionSlice(record.employee_id, record.id, start, start, record.clock_out is None)
+        return
+    
+    while start < end:
+        next_midnight = datetime.datetime.combine(start.date() + datetime.timedelta(days=1), datetime.time.min)
+        piece_end = min(end, next_midnight)
+        yield SessionSlice(record.employee_id, record.id, start, piece_end,
+                           record.clock_out is None and piece_end == session_end)
+        start = piece_end
+
+def sweep_hours(records: Iterable[TimeRecord], week_start_day: int,
+                start_date: Optional[datetime.date] = None, end_date: Optional[datetime.date] = None,
+                now: Optional[datetime.datetime] = None) -> Dict[int, EmployeeHours]:
+    """Exact daily, payroll-week and total hours per employee from raw sessions.
+    
+    Sessions are sorted by clock in once, O(n log n), then swept in order and
+    cut at every midnight they cross, so a 22:00-06:00 shift counts two hours
+    on its first day and six on the next. Week boundaries fall on a midnight,
+    so a shift crossing into the next payroll week is split there as well.
+    """
+    now = now or datetime.datetime.now()
+    range_start = datetime.datetime.combine(start_date, datetime.time.min) if start_date else None
+    range_end = datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min) if end_date else None
+    
+    results: Dict[int, EmployeeHours] = {}
+    for record in sorted(records, key=lambda r: r.clock_in):
+        for piece in split_session(record, now, range_start, range_end):
+            hours = piece.hours
+            if hours <= 0:
+                continue
+            totals = results.get(piece.employee_id)
+            if totals is None:
+                totals = results[piece.employee_id] = EmployeeHours(piece.employee_id)
+            week_start = payroll_week_start(piece.date, week_start_day)
+            totals.daily[piece.date] = totals.daily.get(piece.date, 0.0) + hours
+            totals.weekly[week_start] = totals.weekly.get(week_start, 0.0) + hours
+            totals.total += hours
+    return results
+
 class TimeTrackingRules:
-    def __init__(self, db_manager: DatabaseManager, config: Config):
+    def __init__(self, db_manager: StorageBackend, config: Config):
         self.db_manager = db_manager
         self.config = config
     
@@ -37,40 +122,60 @@ class TimeTrackingRules:
         return True, "OK"
     
     def _get_last_clock_out(self, employee_id: int) -> Optional[datetime.datetime]:
-        records = self.db_manager.get_time_records(employee_id=employee_id)
-        for record in records:
-            if record.clock_out:
-                return record.clock_out
-        return None
+        return self.db_manager.get_last_clock_out(employee_id)
     
     def calculate_daily_hours(self, employee_id: int, date: datetime.date) -> float:
-        start_of_day = datetime.datetime.combine(date, datetime.time.min)
-        end_of_day = datetime.datetime.combine(date, datetime.time.max)
+        return self._calculate_hours(employee_id, date, date)
+    
+    def calculate_weekly_hours(self, employee_id: int, week_start: datetime.date) -> float:
+        return self._calculate_hours(employee_id, week_start, week_start + datetime.timedelta(days=6))
+    
+    def _calculate_hours(self, employee_id: int, start_date: datetime.date, end_date: datetime.date) -> float:
+        return self.calculate_hours_by_employee(start_date, end_date, [employee_id])[employee_id].total
+    
+    def calculate_hours_by_employee(self, start_date: datetime.date, end_date: datetime.date,
+                                    employee_ids: Optional[Iterable[int]] = None) -> Dict[int, EmployeeHours]:
+        """Daily, payroll-week and range totals for many employees at once.
         
-        records = self.db_manager.get_time_records(
-            employee_id=employee_id,
-            start_date=date,
-            end_date=date
-        )
+        Closed hours come from one daily rollup query covering every employee;
+        open sessions are added from the in-memory session map through
+        sweep_hours. No time records are read. Without employee_ids, every
+        employee with hours in the range is included.
+        """
+        wanted = set(employee_ids) if employee_ids is not None else None
+        if wanted is not None and len(wanted) == 1:
+            (only_id,) = wanted
+            daily_hours = self.db_manager.get_daily_hours(start_date, end_date, employee_id=only_id)
+            session = self.db_manager.get_current_session(only_id)
+            open_sessions = {only_id: session} if session else {}
+        else:
+            daily_hours = self.db_manager.get_daily_hours(start_date, end_date)
+            open_sessions = self.db_manager.get_open_sessions()
         
-        total_hours = 0.0
-        for record in records:
-            if record.clock_in >= start_of_day and record.clock_in <= end_of_day:
-                end_time = record.clock_out or datetime.datetime.now()
-                if end_time > end_of_day:
-                    end_time = end_of_day
-                
-                duration = end_time - record.clock_in
-                total_hours += duration.total_seconds() / 3600
+        sessions = [session for employee_id, session in open_sessions.items()
+                    if wanted is None or employee_id in wanted]
+        for employee_id, open_hours in sweep_hours(sessions, self.config.payroll.start_day,
+                                                   start_date, end_date).items():
+            days = daily_hours.setdefault(employee_id, {})
+            for day, day_hours in open_hours.daily.items():
+                days[day] = days.get(day, 0.0) + day_hours
         
-        return total_hours
+        results = {}
+        for employee_id in (wanted if wanted is not None else daily_hours):
+            hours = EmployeeHours(employee_id)
+            for day, day_hours in sorted(daily_hours.get(employee_id, {}).items()):
+                week_start = payroll_week_start(day, self.config.payroll.start_day)
+                hours.daily[day] = day_hours
+                hours.weekly[week_start] = hours.weekly.get(week_start, 0.0) + day_hours
+                hours.total += day_hours
+            results[employee_id] = hours
+        return results
     
-    def calculate_weekly_hours(self, employee_id: int, week_start: datetime.date) -> float:
-        total_hours = 0.0
-        for i in range(7):
-            day = week_start + datetime.timedelta(days=i)
-            total_hours += self.calculate_daily_hours(employee_id, day)
-        return total_hours
+    def calculate_hours_from_records(self, records: Iterable[TimeRecord],
+                                     start_date: Optional[datetime.date] = None,
+                                     end_date: Optional[datetime.date] = None) -> Dict[int, EmployeeHours]:
+        """Like calculate_hours_by_employee, but from time records already in hand (e.g. a snapshot)"""
+        return sweep_hours(records, self.config.payroll.start_day, start_date, end_date)
     
     def is_overtime_approaching(self, employee_id: int, date: datetime.date) -> bool:
         daily_hours = self.calculate_daily_hours(employee_id, date)
@@ -87,11 +192,30 @@ class TimeTrackingRules:
         
         return time_worked.total_seconds() >= (break_reminder_hours * 3600)
     
+    def break_reminder_time(self, session: TimeRecord) -> datetime.datetime:
+        """The instant needs_break_reminder starts returning True for this open session"""
+        return session.clock_in + datetime.timedelta(hours=self.config.notifications.break_reminder_hours)
+    
+    def overtime_alert_time(self, employee_id: int) -> Optional[datetime.datetime]:
+        """The instant is_overtime_approaching becomes True for today if the open session keeps running.
+        
+        Today's hours only grow while the employee is clocked in, so this is
+        now plus the hours still missing. None when the employee is clocked
+        out or the instant would fall after midnight, when today's total resets.
+        """
+        if not self.db_manager.is_clocked_in(employee_id):
+            return None
+        
+        now = datetime.datetime.now()
+        alert_hours = self.config.notifications.overtime_threshold_hours - 1
+        remaining_hours = alert_hours - self.calculate_daily_hours(employee_id, now.date())
+        alert_time = now + datetime.timedelta(hours=max(remaining_hours, 0))
+        return alert_time if alert_time.date() == now.date() else None
+    
     def get_payroll_week_dates(self, date: datetime.date) -> Tuple[datetime.date, datetime.date]:
         start_day = self.config.payroll.start_day  # 0=Monday, 6=Sunday
         
-        days_since_start = (date.weekday() - start_day) % 7
-        week_start = date - datetime.timedelta(days=days_since_start)
+        week_start = payroll_week_start(date, start_day)
         week_end = week_start + datetime.timedelta(days=6)
         
         return week_start, week_end
@@ -119,7 +243,7 @@ class TimeTrackingRules:
         return True, "OK"
 
 class ReportGenerator:
-    def __init__(self, db_manager: DatabaseManager, rules: TimeTrackingRules):
+    def __init__(self, db_manager: StorageBackend, rules: TimeTrackingRules):
         self.db_manager = db_manager
         self.rules = rules
     
@@ -132,6 +256,9 @@ class ReportGenerator:
         
         total_hours = self.rules.calculate_daily_hours(employee_id, date)
         
+        return self._daily_report(date, total_hours, records)
+    
+    def _daily_report(self, date: datetime.date, total_hours: float, records: List[TimeRecord]) -> dict:
         return {
             'date': date.isoformat(),
             'total_hours': round(total_hours, 2),
@@ -149,18 +276,37 @@ class ReportGenerator:
         }
     
     def generate_weekly_report(self, employee_id: int, week_start: datetime.date) -> dict:
-        daily_reports = []
-        total_weekly_hours = 0.0
+        return self.generate_weekly_reports(week_start, [employee_id])[employee_id]
+    
+    def generate_weekly_reports(self, week_start: datetime.date,
+                                employee_ids: Optional[Iterable[int]] = None) -> Dict[int, dict]:
+        """Weekly reports for many employees (default: all active) from one records query and one rollup query"""
+        if employee_ids is None:
+            employee_ids = [employee.id for employee in self.db_manager.get_employees()]
+        employee_ids = list(employee_ids)
+        week_end = week_start + datetime.timedelta(days=6)
         
-        for i in range(7):
-            day = week_start + datetime.timedelta(days=i)
-            daily_report = self.generate_daily_report(employee_id, day)
-            daily_reports.append(daily_report)
-            total_weekly_hours += daily_report['total_hours']
+        hours = self.rules.calculate_hours_by_employee(week_start, week_end, employee_ids)
         
-        return {
-            'week_start': week_start.isoformat(),
-            'week_end': (week_start + datetime.timedelta(days=6)).isoformat(),
-            'total_weekly_hours': round(total_weekly_hours, 2),
-            'daily_reports': daily_reports
-        }
\ No newline at end of file
+        # One pass over the week's records, bucketed by employee and clock-in date
+        records_by_day: Dict[Tuple[int, datetime.date], List[TimeRecord]] = {}
+        only_id = employee_ids[0] if len(employee_ids) == 1 else None
+        for record in self.db_manager.iter_time_records(employee_id=only_id, start_date=week_start, end_date=week_end):
+            records_by_day.setdefault((record.employee_id, record.clock_in.date()), []).append(record)
+        
+        reports = {}
+        for employee_id in employee_ids:
+            daily_reports = []
+            for i in range(7):
+                day = week_start + datetime.timedelta(days=i)
+                daily_reports.append(self._daily_report(
+                    day, hours[employee_id].daily.get(day, 0.0), records_by_day.get((employee_id, day), [])
+                ))
+            
+            reports[employee_id] = {
+                'week_start': week_start.isoformat(),
+                'week_end': week_end.isoformat(),
+                'total_weekly_hours': round(hours[employee_id].total, 2),
+                'daily_reports': daily_reports
+            }
+        return reports
\ No newline at end of file
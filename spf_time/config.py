@@ -19,7 +19,24 @@ class EmployeeConfig:
 
 @dataclass
 class DatabaseConfig:
+    backend: str = "sqlite"
     db_path: str = "time_tracking.db"
+    pragma_profile: str = "balanced"
+    busy_timeout_ms: int = 5000
+    timestamp_storage: str = "text"
+    tap_journal_path: str = "time_tracking.journal"
+    group_commit_ms: int = 20
+    archive_dir: str = "archive"
+    archive_after_days: int = 0
+    compress_archives: bool = False
+
+@dataclass
+class SyncConfig:
+    enabled: bool = False
+    hub_url: str = "http://localhost:8765"
+    kiosk_id: str = "kiosk"
+    interval_seconds: int = 30
+    batch_size: int = 500
 
 @dataclass
 class UIConfig:
@@ -81,6 +98,7 @@ class Config:
         )
         
         self.database = DatabaseConfig(**config_data.get('database', {}))
+        self.sync = SyncConfig(**config_data.get('sync', {}))
         
         ui_data = config_data.get('ui', {})
         self.ui = UIConfig(
@@ -123,7 +141,25 @@ class Config:
             'employees': {
                 'names': ['John Smith', 'Jane Doe', 'Bob Johnson']
             },
-            'database': {'db_path': 'time_tracking.db'},
+            'database': {
+                'backend': 'sqlite',
+                'db_path': 'time_tracking.db',
+                'pragma_profile': 'balanced',
+                'busy_timeout_ms': 5000,
+                'timestamp_storage': 'text',
+                'tap_journal_path': 'time_tracking.journal',
+                'group_commit_ms': 20,
+                'archive_dir': 'archive',
+                'archive_after_days': 0,
+                'compress_archives': False
+            },
+            'sync': {
+                'enabled': False,
+                'hub_url': 'http://localhost:8765',
+                'kiosk_id': 'kiosk',
+                'interval_seconds': 30,
+                'batch_size': 500
+            },
             'ui': {
                 'window_title': 'Employee Time Tracking',
                 'window_width': 800,
@@ -1,7 +1,136 @@
 import sqlite3
+import threading
+import dataclasses
 import datetime
-from typing import List, Optional, Tuple
+import hashlib
+import heapq
+import json
+import lzma
+import os
+import queue
+import shutil
+import tempfile
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from dataclasses import dataclass
+from urllib.request import pathname2url
+
+from .interval_index import IntervalIndex
+
+# PRAGMA profiles selectable via [database] pragma_profile in settings.toml.
+# Every profile uses WAL so report readers never block kiosk writers.
+PRAGMA_PROFILES = {
+    # fsync on every commit, smallest memory footprint
+    'safe': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -2000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+    },
+    # WAL + NORMAL only risks the most recent commits on power loss
+    'balanced': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -8000,
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+    # Larger page cache and mmap window for report-heavy installs
+    'performance': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -32000,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+}
+
+# PRAGMA user_version layout: the low 16 bits count applied schema migrations,
+# EPOCH_TIMESTAMPS_FLAG is set once time_records timestamps are integer epoch seconds
+SCHEMA_VERSION_MASK = 0xFFFF
+EPOCH_TIMESTAMPS_FLAG = 1 << 16
+
+TIMESTAMP_STORAGE_FORMATS = ('text', 'epoch')
+
+# Longest closed session: entry validation and auto clock-out keep shifts within
+# it, so a session overlapping a moment clocked in at most this long before it
+MAX_SHIFT = datetime.timedelta(hours=24)
+
+# Schema of a per-year archive file. Rows keep their original ids, which
+# AUTOINCREMENT never reuses, so they stay unique across the hot table and archives.
+ARCHIVE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS time_records (
+        id INTEGER PRIMARY KEY,
+        employee_id INTEGER NOT NULL,
+        clock_in TIMESTAMP NOT NULL,
+        clock_out TIMESTAMP NULL,
+        created_at TIMESTAMP,
+        uid TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_clock_in ON time_records(clock_in);
+    CREATE INDEX IF NOT EXISTS idx_employee_clock_in ON time_records(employee_id, clock_in);
+'''
+
+# SQLite attaches at most 10 databases to a connection. Archives are read this
+# many years at a time, leaving room for ones an unfinished iterator still holds.
+ATTACH_BATCH_SIZE = 8
+
+# SQL expression for a new record uid: 128 random bits, unique across kiosks without coordination
+NEW_UID_SQL = 'lower(hex(randomblob(16)))'
+
+def _decode_timestamp(value) -> Optional[datetime.datetime]:
+    """Decode a stored timestamp, accepting both ISO text and epoch seconds"""
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return datetime.datetime.fromtimestamp(value)
+    return datetime.datetime.fromisoformat(value)
+
+def _text_to_epoch(value):
+    if isinstance(value, str):
+        return int(datetime.datetime.fromisoformat(value).timestamp())
+    return value
+
+def _split_by_day(clock_in: datetime.datetime, clock_out: datetime.datetime) -> Iterator[Tuple[datetime.date, float]]:
+    """Yield (calendar day, seconds) pieces of a session, split at each midnight"""
+    start = clock_in
+    while start < clock_out:
+        next_midnight = datetime.datetime.combine(start.date() + datetime.timedelta(days=1), datetime.time.min)
+        end = min(clock_out, next_midnight)
+        yield start.date(), (end - start).total_seconds()
+        start = end
+
+def _period_hash(start_date: datetime.date, end_date: datetime.date,
+                 rows: Iterable[Tuple[int, datetime.date, float]]) -> str:
+    """SHA-256 over a payroll period's (employee_id, work_date, seconds) rows, independent of row order"""
+    digest = hashlib.sha256(f'{start_date.isoformat()},{end_date.isoformat()}\n'.encode())
+    for employee_id, work_date, seconds in sorted(rows):
+        digest.update(f'{employee_id},{work_date.isoformat()},{seconds:.3f}\n'.encode())
+    return digest.hexdigest()
+
+class ArchivedRecordError(ValueError):
+    """The record was moved to an archive file, which is read-only"""
+    
+    def __init__(self, record_id: int):
+        self.record_id = record_id
+        super().__init__(f"time record {record_id} is archived and read-only")
+
+@dataclass
+class Change:
+    seq: int
+    record_id: int
+    operation: str
+    uid: Optional[str] = None
+
+@dataclass
+class ClockToggle:
+    """Outcome of toggle_clock: the session that was opened or closed"""
+    record_id: int
+    clocked_in: bool
+    clock_in: datetime.datetime
+    clock_out: Optional[datetime.datetime] = None
 
 @dataclass
 class Employee:
@@ -10,20 +139,272 @@ class Employee:
     is_active: bool = True
 
 @dataclass
+class PayrollPeriod:
+    """A closed payroll period; stale once a later change altered hours inside it"""
+    start_date: datetime.date
+    end_date: datetime.date
+    closed_at: datetime.datetime
+    content_hash: str
+    stale: bool = False
+    reopen_count: int = 0
+
 class TimeRecord:
-    id: Optional[int]
-    employee_id: int
-    clock_in: datetime.datetime
-    clock_out: Optional[datetime.datetime] = None
-    created_at: Optional[datetime.datetime] = None
+    """A time_records row.
+    
+    Uses __slots__ instead of a per-instance __dict__, and timestamps may be
+    given in their stored form (ISO text or epoch seconds): each one is decoded
+    to a datetime on first access, so callers that only read employee_id or a
+    single timestamp never pay for the others.
+    """
+    __slots__ = ('id', 'employee_id', '_clock_in', '_clock_out', '_created_at')
+    
+    def __init__(self, id: Optional[int], employee_id: int, clock_in: datetime.datetime,
+                 clock_out: Optional[datetime.datetime] = None,
+                 created_at: Optional[datetime.datetime] = None):
+        self.id = id
+        self.employee_id = employee_id
+        self._clock_in = clock_in
+        self._clock_out = clock_out
+        self._created_at = created_at
+    
+    @property
+    def clock_in(self) -> datetime.datetime:
+        value = self._clock_in
+        if isinstance(value, (str, int)):
+            value = self._clock_in = _decode_timestamp(value)
+        return value
+    
+    @clock_in.setter
+    def clock_in(self, value: datetime.datetime):
+        self._clock_in = value
+    
+    @property
+    def clock_out(self) -> Optional[datetime.datetime]:
+        value = self._clock_out
+        if isinstance(value, (str, int)):
+            value = self._clock_out = _decode_timestamp(value)
+        return value
+    
+    @clock_out.setter
+    def clock_out(self, value: Optional[datetime.datetime]):
+        self._clock_out = value
+    
+    @property
+    def created_at(self) -> Optional[datetime.datetime]:
+        value = self._created_at
+        if isinstance(value, (str, int)):
+            value = self._created_at = _decode_timestamp(value)
+        return value
+    
+    @created_at.setter
+    def created_at(self, value: Optional[datetime.datetime]):
+        self._created_at = value
+    
+    def copy(self) -> 'TimeRecord':
+        """A separate record with the same fields, left in whatever form they are stored in"""
+        return TimeRecord(self.id, self.employee_id, self._clock_in, self._clock_out, self._created_at)
+    
+    def _astuple(self):
+        return (self.id, self.employee_id, self.clock_in, self.clock_out, self.created_at)
+    
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._astuple() == other._astuple()
+    
+    # Mutable and compared by value, like the dataclass it replaced
+    __hash__ = None
+    
+    def __repr__(self):
+        return (f"TimeRecord(id={self.id!r}, employee_id={self.employee_id!r}, "
+                f"clock_in={self.clock_in!r}, clock_out={self.clock_out!r}, "
+                f"created_at={self.created_at!r})")
 
 class DatabaseManager:
-    def __init__(self, db_path: str = "time_tracking.db"):
+    def __init__(self, db_path: str = "time_tracking.db", pragma_profile: str = "balanced",
+                 busy_timeout_ms: int = 5000, timestamp_storage: str = "text",
+                 archive_dir: str = "archive", archive_after_days: int = 0,
+                 compress_archives: bool = False, read_only: bool = False):
+        if pragma_profile not in PRAGMA_PROFILES:
+            raise ValueError(f"Unknown database pragma profile: {pragma_profile}")
+        if timestamp_storage not in TIMESTAMP_STORAGE_FORMATS:
+            raise ValueError(f"Unknown timestamp storage format: {timestamp_storage}")
+        
         self.db_path = db_path
-        self.init_database()
+        self.pragma_profile = pragma_profile
+        self.busy_timeout_ms = busy_timeout_ms
+        self.timestamp_storage = timestamp_storage
+        self.archive_dir = archive_dir
+        self.archive_after_days = archive_after_days
+        self.compress_archives = compress_archives
+        self.read_only = read_only
+        
+        # Actual on-disk format, read from PRAGMA user_version by the migration runner
+        self._epoch_timestamps = False
+        
+        # One long-lived connection per thread, tracked so close() can release them all
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        
+        # Authoritative map of employee_id -> open TimeRecord, kept in step with every write
+        self._open_sessions: Dict[int, TimeRecord] = {}
+        self._open_sessions_lock = threading.RLock()
+        self._session_listeners: List[Callable[[int, Optional[TimeRecord]], None]] = []
+        
+        # Employee roster as (by id, by name), loaded on first use and dropped whenever employees change.
+        # The generation stops a load that raced with an invalidation from being cached.
+        self._roster: Optional[Tuple[Dict[int, Employee], Dict[str, Employee]]] = None
+        self._roster_generation = 0
+        self._roster_lock = threading.Lock()
+        
+        # Latest clock_out per employee for the break rule, filled on first lookup. Clock-outs
+        # raise cached entries in place; edits that may lower one drop it. Generation as above.
+        self._last_clock_outs: Dict[int, Optional[datetime.datetime]] = {}
+        self._last_clock_out_generation = 0
+        self._last_clock_out_lock = threading.Lock()
+        
+        # Interval index over time_records for overlap checks and stabbing queries,
+        # loaded on first use and brought up to date from change_log before each use.
+        # Archived years are added to it the first time a lookup reaches them.
+        self._intervals: Optional[IntervalIndex] = None
+        self._intervals_seq = 0
+        self._intervals_archive_years: Set[int] = set()
+        self._intervals_lock = threading.Lock()
+        
+        # Compressed archives are inflated once per process into a private temp directory
+        self._archive_cache: Dict[str, str] = {}
+        self._archive_cache_dir: Optional[str] = None
+        self._archive_lock = threading.Lock()
+        
+        if read_only:
+            # Snapshots are already migrated; only the timestamp format needs to be known
+            self._epoch_timestamps = bool(self._user_version() & EPOCH_TIMESTAMPS_FLAG)
+        else:
+            self.init_database()
+        self._load_open_sessions()
+    
+    @classmethod
+    def open_snapshot(cls, snapshot_path: str, pragma_profile: str = "balanced") -> 'DatabaseManager':
+        """Open a file written by backup_to for reading only.
+        
+        The snapshot is opened immutable, so reads take no locks and never
+        contend with the live database. Write methods raise sqlite3.OperationalError.
+        """
+        if not os.path.exists(snapshot_path):
+            raise FileNotFoundError(snapshot_path)
+        return cls(snapshot_path, pragma_profile=pragma_profile, read_only=True)
+    
+    @classmethod
+    def from_config(cls, database_config) -> 'DatabaseManager':
+        """Create a manager from the [database] section of settings.toml"""
+        return cls(
+            database_config.db_path,
+            pragma_profile=database_config.pragma_profile,
+            busy_timeout_ms=database_config.busy_timeout_ms,
+            timestamp_storage=database_config.timestamp_storage,
+            archive_dir=database_config.archive_dir,
+            archive_after_days=database_config.archive_after_days,
+            compress_archives=database_config.compress_archives
+        )
+    
+    def _get_connection(self) -> sqlite3.Connection:
+        """Return the calling thread's connection, opening and tuning it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # check_same_thread is disabled only so close() may run from any thread;
+            # each connection is still used exclusively by the thread that opened it
+            # uri=True lets archives be attached read-only; plain paths behave as before
+            database = self.db_path
+            if self.read_only:
+                database = 'file:' + pathname2url(os.path.abspath(self.db_path)) + '?mode=ro&immutable=1'
+            conn = sqlite3.connect(
+                database,
+                timeout=self.busy_timeout_ms / 1000,
+                check_same_thread=False,
+                uri=True
+            )
+            self._apply_pragmas(conn)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    def _apply_pragmas(self, conn: sqlite3.Connection):
+        profile = PRAGMA_PROFILES[self.pragma_profile]
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        if not self.read_only:
+            conn.execute(f"PRAGMA journal_mode = {profile['journal_mode']}")
+            conn.execute(f"PRAGMA synchronous = {profile['synchronous']}")
+        conn.execute(f"PRAGMA cache_size = {int(profile['cache_size'])}")
+        conn.execute(f"PRAGMA mmap_size = {int(profile['mmap_size'])}")
+        conn.execute(f"PRAGMA temp_store = {profile['temp_store']}")
+    
+    def backup_to(self, dest_path: str, pages_per_step: int = 256, step_sleep_ms: int = 10,
+                  progress: Optional[Callable[[int, int], None]] = None) -> str:
+        """Write a consistent copy of the database to dest_path while it stays in use.
+        
+        Pages are copied pages_per_step at a time with a step_sleep_ms pause in
+        between, so kiosk taps keep committing during the copy. The source is
+        read inside one WAL read transaction: the copy is a single point-in-time
+        snapshot, and commits made meanwhile cannot force the backup to restart.
+        The file is written beside dest_path and renamed into place, in rollback
+        journal mode so it can be opened with open_snapshot.
+        progress(pages_copied, total_pages) is called after every step.
+        """
+        tmp_path = dest_path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        
+        # A dedicated connection, so the pinned read transaction cannot
+        # interfere with anything else running on this thread
+        source = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000)
+        dest = sqlite3.connect(tmp_path)
+        try:
+            source.execute('BEGIN')
+            source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+            
+            def on_step(status, remaining, total):
+                if progress:
+                    progress(total - remaining, total)
+                if remaining:
+                    time.sleep(step_sleep_ms / 1000)
+            
+            source.backup(dest, pages=pages_per_step, progress=on_step)
+            source.rollback()
+            dest.execute('PRAGMA journal_mode = DELETE')
+        finally:
+            source.close()
+            dest.close()
+        
+        os.replace(tmp_path, dest_path)
+        return dest_path
+    
+    def close_thread_connection(self):
+        """Close the calling thread's connection; short-lived worker threads call this before exiting"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._connections_lock:
+            self._connections.remove(conn)
+        conn.close()
+    
+    def close(self):
+        """Close every connection opened by this manager"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+        
+        with self._archive_lock:
+            if self._archive_cache_dir:
+                shutil.rmtree(self._archive_cache_dir, ignore_errors=True)
+            self._archive_cache, self._archive_cache_dir = {}, None
     
     def init_database(self):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -46,172 +427,1946 @@ class DatabaseManager:
                 )
             ''')
             
+            conn.commit()
+        
+        self._run_migrations()
+    
+    def _schema_migrations(self):
+        """Ordered (version, migration) pairs; append new ones, never renumber"""
+        return [
+            (1, self._migrate_indexes),
+            (2, self._migrate_tap_journal_state),
+            (3, self._migrate_daily_hours),
+            (4, self._migrate_archives),
+            (5, self._migrate_change_log),
+            (6, self._migrate_record_uids),
+            (7, self._migrate_single_open_session),
+            (8, self._migrate_last_clock_out_index),
+            (9, self._migrate_payroll_periods),
+        ]
+    
+    def _user_version(self) -> int:
+        return self._get_connection().execute('PRAGMA user_version').fetchone()[0]
+    
+    def _set_user_version(self, version: int):
+        self._get_connection().execute(f'PRAGMA user_version = {int(version)}')
+    
+    def _run_migrations(self):
+        """Apply pending schema migrations, then convert timestamp storage if opted in"""
+        conn = self._get_connection()
+        
+        for target, migration in self._schema_migrations():
+            if self._user_version() & SCHEMA_VERSION_MASK >= target:
+                continue
+            
+            # IMMEDIATE takes the write lock up front; re-check in case another
+            # process applied this migration while we were waiting for it
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                version = self._user_version()
+                if version & SCHEMA_VERSION_MASK < target:
+                    migration(conn.cursor())
+                    self._set_user_version((version & ~SCHEMA_VERSION_MASK) | target)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        
+        if self.timestamp_storage == 'epoch' and not self._user_version() & EPOCH_TIMESTAMPS_FLAG:
+            self._migrate_timestamps_to_epoch()
+        
+        # Conversion is one-way: an epoch database stays epoch even if the setting is reverted
+        self._epoch_timestamps = bool(self._user_version() & EPOCH_TIMESTAMPS_FLAG)
+        
+        if self._epoch_timestamps:
+            self._convert_archives_to_epoch()
+    
+    def _migrate_timestamps_to_epoch(self, batch_size: int = 500):
+        """Rewrite TEXT timestamps as epoch seconds in place, one short transaction per batch.
+        
+        Committing between batches lets other connections write while a large
+        table converts. Interrupted runs simply resume; rows already holding
+        integers are skipped. Readers accept both formats throughout.
+        """
+        conn = self._get_connection()
+        last_id = 0
+        while True:
+            rows = conn.execute('''
+                SELECT id, clock_in, clock_out, created_at
+                FROM time_records WHERE id > ?
+                ORDER BY id LIMIT ?
+            ''', (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            
+            self._convert_rows_to_epoch(conn, rows)
+            conn.commit()
+        
+        # Final sweep under the write lock catches rows written mid-conversion,
+        # then the flag flips atomically with it
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute('''
+                SELECT id, clock_in, clock_out, created_at
+                FROM time_records
+                WHERE typeof(clock_in) = 'text' OR typeof(clock_out) = 'text'
+                   OR typeof(created_at) = 'text'
+            ''').fetchall()
+            self._convert_rows_to_epoch(conn, rows)
+            # The conversion drops sub-second parts, so recount the rollup as now
+            # stored; archives count as _convert_archives_to_epoch will store them
+            self._rebuild_daily_hours(conn.cursor(), self._get_archives(), as_epoch=True)
+            self._set_user_version(self._user_version() | EPOCH_TIMESTAMPS_FLAG)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    
+    def _convert_rows_to_epoch(self, conn: sqlite3.Connection, rows):
+        updates = [
+            (_text_to_epoch(clock_in), _text_to_epoch(clock_out), _text_to_epoch(created_at), record_id)
+            for record_id, clock_in, clock_out, created_at in rows
+            if isinstance(clock_in, str) or isinstance(clock_out, str) or isinstance(created_at, str)
+        ]
+        if updates:
+            conn.executemany(
+                'UPDATE time_records SET clock_in = ?, clock_out = ?, created_at = ? WHERE id = ?',
+                updates
+            )
+    
+    def _to_db_timestamp(self, value: Optional[datetime.datetime]):
+        """Encode a timestamp parameter in the database's storage format"""
+        if value is None or not self._epoch_timestamps:
+            return value
+        return int(value.timestamp())
+    
+    def _created_at_value(self):
+        # Text databases keep the column's CURRENT_TIMESTAMP default via COALESCE
+        return self._to_db_timestamp(datetime.datetime.now()) if self._epoch_timestamps else None
+    
+    def _migrate_indexes(self, cursor: sqlite3.Cursor):
+        """Bring time_records indexes up to date; safe to run more than once"""
+        # Range scans across all employees (reports, admin list)
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_clock_in 
+            ON time_records(clock_in)
+        ''')
+        
+        # Per-employee history in clock-in order; also serves plain employee_id lookups
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_employee_clock_in 
+            ON time_records(employee_id, clock_in)
+        ''')
+        
+        # Open sessions only, so status checks never touch closed history
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_open_sessions 
+            ON time_records(employee_id, clock_in) WHERE clock_out IS NULL
+        ''')
+        
+        # Superseded by the composite index above
+        cursor.execute('DROP INDEX IF EXISTS idx_employee_id')
+    
+    def _migrate_tap_journal_state(self, cursor: sqlite3.Cursor):
+        """Single-row table holding the last tap journal sequence applied by TapWriter"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tap_journal_state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                last_seq INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute('INSERT OR IGNORE INTO tap_journal_state (id, last_seq) VALUES (1, 0)')
+    
+    def _migrate_daily_hours(self, cursor: sqlite3.Cursor):
+        """Per-employee, per-calendar-day rollup of closed session seconds"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS daily_hours (
+                employee_id INTEGER NOT NULL,
+                work_date TEXT NOT NULL,
+                seconds REAL NOT NULL,
+                PRIMARY KEY (employee_id, work_date)
+            ) WITHOUT ROWID
+        ''')
+        self._rebuild_daily_hours(cursor)
+    
+    def _migrate_archives(self, cursor: sqlite3.Cursor):
+        """Catalog of per-year archive files holding closed records moved out of time_records"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS archives (
+                year INTEGER PRIMARY KEY,
+                path TEXT NOT NULL,
+                compressed BOOLEAN NOT NULL DEFAULT 0,
+                epoch_timestamps BOOLEAN NOT NULL DEFAULT 0,
+                record_count INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+    
+    def _migrate_change_log(self, cursor: sqlite3.Cursor):
+        """Append-only feed of time_records changes; AUTOINCREMENT keeps seq monotonic"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                record_id INTEGER NOT NULL,
+                operation TEXT NOT NULL CHECK (operation IN ('insert', 'update', 'delete'))
+            )
+        ''')
+    
+    def _migrate_record_uids(self, cursor: sqlite3.Cursor):
+        """Globally unique record ids for multi-kiosk sync, and per-hub sync progress"""
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(time_records)')}
+        if 'uid' not in columns:
+            cursor.execute('ALTER TABLE time_records ADD COLUMN uid TEXT')
+        cursor.execute(f'UPDATE time_records SET uid = {NEW_UID_SQL} WHERE uid IS NULL')
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_record_uid ON time_records(uid)')
+        
+        # Deleted rows can only be identified to other kiosks by uid
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(change_log)')}
+        if 'uid' not in columns:
+            cursor.execute('ALTER TABLE change_log ADD COLUMN uid TEXT')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_state (
+                hub_url TEXT PRIMARY KEY,
+                last_seq INTEGER NOT NULL
+            )
+        ''')
+    
+    def _migrate_single_open_session(self, cursor: sqlite3.Cursor):
+        """Enforce at most one open session per employee.
+        
+        Where an employee already has several, each is closed when the next one
+        started (they evidently forgot to clock out) and the latest stays open.
+        """
+        cursor.execute('''
+            SELECT id, employee_id, clock_in FROM time_records
+            WHERE clock_out IS NULL ORDER BY employee_id, clock_in, id
+        ''')
+        latest = {}
+        closes = []
+        totals = {}
+        for record_id, employee_id, clock_in in cursor.fetchall():
+            previous = latest.get(employee_id)
+            if previous:
+                # Copy the stored value, so this works in either timestamp format
+                closes.append((clock_in, previous[0]))
+                self._session_daily_hours(totals, employee_id,
+                                          _decode_timestamp(previous[1]), _decode_timestamp(clock_in))
+            latest[employee_id] = (record_id, clock_in)
+        
+        cursor.executemany('UPDATE time_records SET clock_out = ? WHERE id = ?', closes)
+        self._log_changes(cursor, 'update', [record_id for _, record_id in closes])
+        # payroll_periods doesn't exist yet at this point of an upgrade, and nothing can be closed
+        self._add_daily_hours(cursor, totals, reopen=False)
+        
+        # The unique index serves every lookup the old open-session index did
+        cursor.execute('DROP INDEX IF EXISTS idx_open_sessions')
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_one_open_session
+            ON time_records(employee_id) WHERE clock_out IS NULL
+        ''')
+    
+    def _migrate_last_clock_out_index(self, cursor: sqlite3.Cursor):
+        """Closed sessions by employee and clock_out, so an employee's last clock-out is one index probe"""
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_employee_clock_out
+            ON time_records(employee_id, clock_out) WHERE clock_out IS NOT NULL
+        ''')
+    
+    def _migrate_payroll_periods(self, cursor: sqlite3.Cursor):
+        """Frozen per-employee, per-day hours of closed payroll periods, and a log of reopened ones"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS payroll_periods (
+                start_date TEXT PRIMARY KEY,
+                end_date TEXT NOT NULL,
+                closed_at TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                stale BOOLEAN NOT NULL DEFAULT 0,
+                reopen_count INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        # Periods never overlap, so each day's rows belong to exactly one period
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS period_hours (
+                work_date TEXT NOT NULL,
+                employee_id INTEGER NOT NULL,
+                seconds REAL NOT NULL,
+                PRIMARY KEY (work_date, employee_id)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS period_reopens (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                start_date TEXT NOT NULL,
+                employee_id INTEGER NOT NULL,
+                reopened_at TEXT NOT NULL,
+                content_hash TEXT NOT NULL
+            )
+        ''')
+    
+    def _log_changes(self, cursor: sqlite3.Cursor, operation: str, record_ids: Iterable[int]):
+        """Stamp changes in the caller's transaction, so they commit or roll back with the write.
+        
+        The uid is copied from the record, so deletes must be logged before the row is removed.
+        """
+        cursor.executemany(
+            'INSERT INTO change_log (record_id, operation, uid) SELECT id, ?, uid FROM time_records WHERE id = ?',
+            ((operation, record_id) for record_id in record_ids)
+        )
+    
+    def get_change_seq(self) -> int:
+        """Sequence number of the latest change; pass it to changes_since later"""
+        return self._get_connection().execute('SELECT COALESCE(MAX(seq), 0) FROM change_log').fetchone()[0]
+    
+    def changes_since(self, seq: int, limit: Optional[int] = None) -> List[Change]:
+        """Time record inserts, updates and deletes committed after seq, oldest first.
+        
+        Moving records into archives is not a change: they remain readable
+        through get_time_records.
+        """
+        query = 'SELECT seq, record_id, operation, uid FROM change_log WHERE seq > ? ORDER BY seq'
+        params = [seq]
+        if limit:
+            query += ' LIMIT ?'
+            params.append(limit)
+        
+        rows = self._get_connection().execute(query, params).fetchall()
+        return [Change(*row) for row in rows]
+    
+    def get_record_uids(self, record_ids: Iterable[int]) -> Dict[int, str]:
+        """record id -> uid for records still in the main database"""
+        record_ids = list(record_ids)
+        cursor = self._get_connection().cursor()
+        uids = {}
+        for i in range(0, len(record_ids), 500):
+            chunk = record_ids[i:i + 500]
+            cursor.execute(f'SELECT id, uid FROM time_records WHERE id IN ({", ".join("?" * len(chunk))})', chunk)
+            uids.update(cursor.fetchall())
+        return uids
+    
+    def get_sync_seq(self, hub_url: str) -> int:
+        """Last change_log seq acknowledged by the given hub"""
+        row = self._get_connection().execute(
+            'SELECT last_seq FROM sync_state WHERE hub_url = ?', (hub_url,)
+        ).fetchone()
+        return row[0] if row else 0
+    
+    def set_sync_seq(self, hub_url: str, seq: int):
+        with self._get_connection() as conn:
+            conn.execute(
+                'INSERT INTO sync_state (hub_url, last_seq) VALUES (?, ?) '
+                'ON CONFLICT (hub_url) DO UPDATE SET last_seq = excluded.last_seq',
+                (hub_url, seq)
+            )
+    
+    def merge_records(self, records: Iterable[Tuple[str, int, Optional[datetime.datetime], Optional[datetime.datetime], bool]]) -> int:
+        """Upsert (uid, employee_id, clock_in, clock_out, deleted) rows from another kiosk in one transaction.
+        
+        Rows are matched by uid, so merging the same batch twice is harmless.
+        The daily_hours rollup and change feed are updated like any local edit.
+        Returns the number of records inserted, updated or deleted.
+        """
+        changed = 0
+        totals = {}
+        employee_ids = set()
+        
+        conn = self._get_connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = conn.cursor()
+            for uid, employee_id, clock_in, clock_out, deleted in records:
+                cursor.execute(
+                    'SELECT id, employee_id, clock_in, clock_out, created_at FROM time_records WHERE uid = ?',
+                    (uid,)
+                )
+                row = cursor.fetchone()
+                old = self._row_to_record(row) if row else None
+                
+                if deleted:
+                    if old:
+                        self._log_changes(cursor, 'delete', [old.id])
+                        cursor.execute('DELETE FROM time_records WHERE id = ?', (old.id,))
+                        self._session_daily_hours(totals, old.employee_id, old.clock_in, old.clock_out, sign=-1)
+                        employee_ids.add(old.employee_id)
+                        changed += 1
+                    continue
+                
+                if clock_out is None:
+                    clock_out = self._resolve_open_session(cursor, old.id if old else None, employee_id, clock_in, totals)
+                
+                if old:
+                    if (old.employee_id, old.clock_in, old.clock_out) == (employee_id, clock_in, clock_out):
+                        continue
+                    cursor.execute(
+                        'UPDATE time_records SET employee_id = ?, clock_in = ?, clock_out = ? WHERE id = ?',
+                        (employee_id, self._to_db_timestamp(clock_in), self._to_db_timestamp(clock_out), old.id)
+                    )
+                    self._log_changes(cursor, 'update', [old.id])
+                    self._session_daily_hours(totals, old.employee_id, old.clock_in, old.clock_out, sign=-1)
+                    employee_ids.add(old.employee_id)
+                else:
+                    cursor.execute(
+                        'INSERT INTO time_records (employee_id, clock_in, clock_out, created_at, uid) '
+                        'VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?)',
+                        (employee_id, self._to_db_timestamp(clock_in), self._to_db_timestamp(clock_out),
+                         self._created_at_value(), uid)
+                    )
+                    self._log_changes(cursor, 'insert', [cursor.lastrowid])
+                
+                self._session_daily_hours(totals, employee_id, clock_in, clock_out)
+                employee_ids.add(employee_id)
+                changed += 1
+            
+            self._add_daily_hours(cursor, totals)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        
+        self._forget_last_clock_outs(employee_ids)
+        for employee_id in employee_ids:
+            self._refresh_open_session(employee_id)
+        return changed
+    
+    def _resolve_open_session(self, cursor: sqlite3.Cursor, record_id: Optional[int], employee_id: int,
+                              clock_in: datetime.datetime, totals: Dict[Tuple[int, str], float]) -> Optional[datetime.datetime]:
+        """Keep one open session per employee when merging an open record from another kiosk.
+        
+        The later clock-in stays open and the earlier session is closed when it
+        started. Returns the clock_out to store for the incoming record.
+        """
+        cursor.execute(
+            'SELECT id, clock_in FROM time_records WHERE employee_id = ? AND clock_out IS NULL AND id IS NOT ?',
+            (employee_id, record_id)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        
+        other_clock_in = _decode_timestamp(row[1])
+        if other_clock_in > clock_in:
+            return other_clock_in
+        
+        cursor.execute('UPDATE time_records SET clock_out = ? WHERE id = ?', (self._to_db_timestamp(clock_in), row[0]))
+        self._log_changes(cursor, 'update', [row[0]])
+        self._session_daily_hours(totals, employee_id, other_clock_in, clock_in)
+        return None
+    
+    def get_time_records_by_ids(self, record_ids: Iterable[int]) -> List[TimeRecord]:
+        """Fetch records from the main database by id; ids that no longer exist are skipped"""
+        record_ids = list(record_ids)
+        cursor = self._get_connection().cursor()
+        records = []
+        # Stay well below SQLite's bound-parameter limit
+        for i in range(0, len(record_ids), 500):
+            chunk = record_ids[i:i + 500]
+            cursor.execute(
+                'SELECT id, employee_id, clock_in, clock_out, created_at FROM time_records '
+                f'WHERE id IN ({", ".join("?" * len(chunk))})',
+                chunk
+            )
+            records.extend(map(self._row_to_record, cursor.fetchall()))
+        return records
+    
+    def rebuild_daily_hours(self) -> int:
+        """Recompute the daily_hours rollup from time_records and every archive, returning the number of day rows"""
+        conn = self._get_connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            count = self._rebuild_daily_hours(conn.cursor(), self._get_archives())
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return count
+    
+    def _rebuild_daily_hours(self, cursor: sqlite3.Cursor, archives: Optional[Dict[int, Tuple[str, bool, bool]]] = None,
+                             as_epoch: bool = False) -> int:
+        """Recount daily_hours from the hot table and the given archives.
+        
+        as_epoch counts text timestamps as the epoch conversion stores them.
+        Archives are read through their own connections, since ATTACH is not
+        allowed inside the caller's write transaction; archiving needs that
+        write lock too, so no rows move between tiers meanwhile.
+        """
+        archives = archives or {}
+        decode = (lambda value: _decode_timestamp(_text_to_epoch(value))) if as_epoch else _decode_timestamp
+        query = 'SELECT employee_id, clock_in, clock_out FROM time_records WHERE clock_out IS NOT NULL'
+        totals = {}
+        sources = [cursor.execute(query)]
+        sources += (self._read_archive(archives[year], query) for year in sorted(archives))
+        for rows in sources:
+            for employee_id, clock_in, clock_out in rows:
+                for day, seconds in _split_by_day(decode(clock_in), decode(clock_out)):
+                    key = (employee_id, day.isoformat())
+                    totals[key] = totals.get(key, 0.0) + seconds
+        
+        cursor.execute('DELETE FROM daily_hours')
+        cursor.executemany(
+            'INSERT INTO daily_hours (employee_id, work_date, seconds) VALUES (?, ?, ?)',
+            ((employee_id, work_date, seconds) for (employee_id, work_date), seconds in totals.items())
+        )
+        return len(totals)
+    
+    def _add_daily_hours(self, cursor: sqlite3.Cursor, totals: Dict[Tuple[int, str], float], reopen: bool = True):
+        """Add signed per-day seconds to the rollup, dropping days that fall back to zero.
+        
+        Every time_records write passes its hours through here, which also
+        reopens any closed payroll period they fall in. Migrations that run
+        before payroll periods exist pass reopen=False.
+        """
+        if reopen:
+            self._reopen_periods(cursor, totals)
+        cursor.executemany('''
+            INSERT INTO daily_hours (employee_id, work_date, seconds) VALUES (?, ?, ?)
+            ON CONFLICT (employee_id, work_date) DO UPDATE SET seconds = seconds + excluded.seconds
+        ''', ((employee_id, work_date, seconds) for (employee_id, work_date), seconds in totals.items()))
+        cursor.executemany(
+            'DELETE FROM daily_hours WHERE employee_id = ? AND work_date = ? AND seconds < 0.001',
+            [key for key, seconds in totals.items() if seconds < 0]
+        )
+    
+    def _session_daily_hours(self, totals: Dict[Tuple[int, str], float], employee_id: int,
+                             clock_in: Optional[datetime.datetime], clock_out: Optional[datetime.datetime],
+                             sign: int = 1):
+        """Accumulate a closed session into totals; sign=-1 removes it. Open sessions contribute nothing."""
+        if clock_in is None or clock_out is None:
+            return totals
+        if self._epoch_timestamps:
+            # Count what is stored: epoch columns drop the sub-second part
+            clock_in, clock_out = clock_in.replace(microsecond=0), clock_out.replace(microsecond=0)
+        for day, seconds in _split_by_day(clock_in, clock_out):
+            key = (employee_id, day.isoformat())
+            totals[key] = totals.get(key, 0.0) + sign * seconds
+        return totals
+    
+    def get_daily_hours(self, start_date: datetime.date, end_date: datetime.date,
+                        employee_id: Optional[int] = None) -> Dict[int, Dict[datetime.date, float]]:
+        """Closed-session hours per employee per calendar day, start_date to end_date inclusive.
+        
+        Read from the daily_hours rollup, so the cost depends on the number of
+        days in the range rather than the number of time records.
+        """
+        cursor = self._get_connection().cursor()
+        query = 'SELECT employee_id, work_date, seconds FROM daily_hours WHERE work_date >= ? AND work_date <= ?'
+        params = [start_date.isoformat(), end_date.isoformat()]
+        
+        if employee_id:
+            query += ' AND employee_id = ?'
+            params.append(employee_id)
+        
+        cursor.execute(query, params)
+        hours = {}
+        for emp_id, work_date, seconds in cursor.fetchall():
+            hours.setdefault(emp_id, {})[datetime.date.fromisoformat(work_date)] = seconds / 3600
+        return hours
+    
+    def close_payroll_period(self, start_date: datetime.date, end_date: datetime.date) -> PayrollPeriod:
+        """Freeze each employee's hours per day from start_date to end_date inclusive.
+        
+        The snapshot is copied from the daily_hours rollup and hashed. Closing
+        a period that is already closed returns it unchanged; closing a stale
+        one replaces its snapshot with the current hours.
+        """
+        if end_date < start_date:
+            raise ValueError("Payroll period ends before it starts")
+        if end_date >= datetime.date.today():
+            raise ValueError(f"Payroll period ending {end_date.isoformat()} has not finished yet")
+        
+        start, end = start_date.isoformat(), end_date.isoformat()
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
             cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_employee_id 
-                ON time_records(employee_id)
-            ''')
+                SELECT start_date, end_date, stale FROM payroll_periods
+                WHERE start_date <= ? AND end_date >= ?
+            ''', (end, start))
+            for other_start, other_end, stale in cursor.fetchall():
+                if (other_start, other_end) != (start, end):
+                    raise ValueError(f"Overlaps the payroll period {other_start} to {other_end}")
+                if not stale:
+                    conn.commit()
+                    return self._get_payroll_period(start_date)
             
+            # Open sessions are not in the rollup yet, so their hours would be missing
+            period_end = datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min)
             cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_clock_in 
-                ON time_records(clock_in)
-            ''')
+                SELECT employee_id, clock_in FROM time_records
+                WHERE clock_out IS NULL AND clock_in < ? ORDER BY clock_in LIMIT 1
+            ''', (self._to_db_timestamp(period_end),))
+            row = cursor.fetchone()
+            if row:
+                raise ValueError(f"Employee {row[0]} is still clocked in since "
+                                 f"{_decode_timestamp(row[1]).strftime('%Y-%m-%d %H:%M')}")
             
+            cursor.execute('DELETE FROM period_hours WHERE work_date >= ? AND work_date <= ?', (start, end))
+            cursor.execute('''
+                INSERT INTO period_hours (work_date, employee_id, seconds)
+                SELECT work_date, employee_id, seconds FROM daily_hours
+                WHERE work_date >= ? AND work_date <= ?
+            ''', (start, end))
+            cursor.execute('SELECT employee_id, work_date, seconds FROM period_hours WHERE work_date >= ? AND work_date <= ?',
+                           (start, end))
+            content_hash = _period_hash(start_date, end_date, [
+                (employee_id, datetime.date.fromisoformat(work_date), seconds)
+                for employee_id, work_date, seconds in cursor.fetchall()
+            ])
+            # Re-closing keeps the reopen count; the log keeps the hashes of earlier snapshots
+            cursor.execute('''
+                INSERT INTO payroll_periods (start_date, end_date, closed_at, content_hash, stale)
+                VALUES (?, ?, ?, ?, 0)
+                ON CONFLICT (start_date) DO UPDATE SET
+                    closed_at = excluded.closed_at, content_hash = excluded.content_hash, stale = 0
+            ''', (start, end, datetime.datetime.now().isoformat(sep=' ', timespec='seconds'), content_hash))
             conn.commit()
+        
+        return self._get_payroll_period(start_date)
+    
+    def get_payroll_periods(self, start_date: Optional[datetime.date] = None,
+                            end_date: Optional[datetime.date] = None) -> List[PayrollPeriod]:
+        """Closed payroll periods overlapping start_date to end_date, oldest first"""
+        query = 'SELECT start_date, end_date, closed_at, content_hash, stale, reopen_count FROM payroll_periods WHERE 1=1'
+        params = []
+        
+        if start_date:
+            query += ' AND end_date >= ?'
+            params.append(start_date.isoformat())
+        if end_date:
+            query += ' AND start_date <= ?'
+            params.append(end_date.isoformat())
+        
+        rows = self._get_connection().execute(query + ' ORDER BY start_date', params).fetchall()
+        return [PayrollPeriod(datetime.date.fromisoformat(start), datetime.date.fromisoformat(end),
+                              datetime.datetime.fromisoformat(closed_at), content_hash, bool(stale), reopen_count)
+                for start, end, closed_at, content_hash, stale, reopen_count in rows]
+    
+    def _get_payroll_period(self, start_date: datetime.date) -> PayrollPeriod:
+        return next(period for period in self.get_payroll_periods(start_date, start_date)
+                    if period.start_date == start_date)
+    
+    def get_period_hours(self, start_date: datetime.date,
+                         end_date: datetime.date) -> Optional[Dict[int, Dict[datetime.date, float]]]:
+        """Hours per employee per day like get_daily_hours, read from closed payroll period snapshots.
+        
+        Returns None unless every day from start_date to end_date lies in a
+        closed period that has not gone stale.
+        """
+        covered = start_date
+        for period in self.get_payroll_periods(start_date, end_date):
+            if period.stale or period.start_date > covered:
+                return None
+            covered = max(covered, period.end_date + datetime.timedelta(days=1))
+        if covered <= end_date:
+            return None
+        
+        cursor = self._get_connection().cursor()
+        cursor.execute('SELECT employee_id, work_date, seconds FROM period_hours WHERE work_date >= ? AND work_date <= ?',
+                       (start_date.isoformat(), end_date.isoformat()))
+        hours = {}
+        for emp_id, work_date, seconds in cursor.fetchall():
+            hours.setdefault(emp_id, {})[datetime.date.fromisoformat(work_date)] = seconds / 3600
+        return hours
+    
+    def _reopen_periods(self, cursor: sqlite3.Cursor, totals: Dict[Tuple[int, str], float]):
+        """Mark closed payroll periods holding any of these employee-days stale, logging who reopened them.
+        
+        Days whose hours net out to no change (a save with unchanged times) reopen nothing.
+        """
+        changed = [key for key, seconds in totals.items() if abs(seconds) >= 0.001]
+        if not changed:
+            return
+        days = sorted(work_date for _, work_date in changed)
+        cursor.execute('''
+            SELECT start_date, end_date, content_hash FROM payroll_periods
+            WHERE stale = 0 AND start_date <= ? AND end_date >= ?
+        ''', (days[-1], days[0]))
+        
+        now = datetime.datetime.now().isoformat(sep=' ', timespec='seconds')
+        reopens = []
+        for start, end, content_hash in cursor.fetchall():
+            employee_ids = sorted({employee_id for employee_id, work_date in changed if start <= work_date <= end})
+            reopens.extend((start, employee_id, now, content_hash) for employee_id in employee_ids)
+        if not reopens:
+            return
+        
+        cursor.executemany('UPDATE payroll_periods SET stale = 1, reopen_count = reopen_count + 1 WHERE start_date = ?',
+                           sorted({(start,) for start, _, _, _ in reopens}))
+        cursor.executemany(
+            'INSERT INTO period_reopens (start_date, employee_id, reopened_at, content_hash) VALUES (?, ?, ?, ?)',
+            reopens
+        )
+    
+    def _row_to_record(self, row) -> TimeRecord:
+        # Raw stored timestamps are handed over as-is; TimeRecord decodes them lazily
+        return TimeRecord(row[0], row[1], row[2], row[3], row[4])
+    
+    def _query_open_sessions(self) -> Dict[int, TimeRecord]:
+        cursor = self._get_connection().cursor()
+        # Ascending order so the latest session wins if an employee somehow has two
+        cursor.execute('''
+            SELECT id, employee_id, clock_in, clock_out, created_at
+            FROM time_records 
+            WHERE clock_out IS NULL
+            ORDER BY clock_in
+        ''')
+        return {record.employee_id: record for record in map(self._row_to_record, cursor.fetchall())}
+    
+    def _load_open_sessions(self):
+        sessions = self._query_open_sessions()
+        with self._open_sessions_lock:
+            self._update_open_sessions(sessions, replace=True)
+            self._local.data_version_seen = self._data_version()
+    
+    def add_session_listener(self, listener: Callable[[int, Optional[TimeRecord]], None]):
+        """Call listener(employee_id, open_session_or_None) whenever an employee's open session changes.
+        
+        Listeners run on whichever thread made the change, possibly while the
+        open-session lock is held, so they must be quick and must not wait on
+        other threads that use this manager.
+        """
+        self._session_listeners.append(listener)
+    
+    def _update_open_sessions(self, sessions: Dict[int, Optional[TimeRecord]], replace: bool = False) -> bool:
+        """Apply fresh open-session state and notify listeners of employees whose session changed.
+        
+        With replace=True, employees missing from sessions are treated as clocked
+        out. Returns True if nothing changed.
+        """
+        changed = []
+        with self._open_sessions_lock:
+            if replace:
+                sessions = {**{employee_id: None for employee_id in self._open_sessions}, **sessions}
+            
+            for employee_id, session in sessions.items():
+                current = self._open_sessions.get(employee_id)
+                if session is None:
+                    if current is not None:
+                        del self._open_sessions[employee_id]
+                        changed.append((employee_id, None))
+                else:
+                    self._open_sessions[employee_id] = session
+                    if current is None or current.id != session.id:
+                        changed.append((employee_id, session))
+            
+            # The cached records stay private; every caller gets its own copy
+            for employee_id, session in changed:
+                for listener in self._session_listeners:
+                    listener(employee_id, session.copy() if session else None)
+        
+        return not changed
+    
+    def get_open_sessions(self) -> Dict[int, TimeRecord]:
+        """Snapshot of employee_id -> open session for everyone currently clocked in"""
+        with self._open_sessions_lock:
+            return {employee_id: session.copy() for employee_id, session in self._open_sessions.items()}
+    
+    def _refresh_open_session(self, employee_id: int):
+        """Re-read one employee's open session after a write that may have changed it"""
+        cursor = self._get_connection().cursor()
+        cursor.execute('''
+            SELECT id, employee_id, clock_in, clock_out, created_at
+            FROM time_records 
+            WHERE employee_id = ? AND clock_out IS NULL
+            ORDER BY clock_in DESC LIMIT 1
+        ''', (employee_id,))
+        
+        row = cursor.fetchone()
+        self._update_open_sessions({employee_id: self._row_to_record(row) if row else None})
+    
+    def _data_version(self) -> int:
+        return self._get_connection().execute('PRAGMA data_version').fetchone()[0]
+    
+    def check_open_sessions(self) -> bool:
+        """Detect writes made outside this manager and resync the open-session map.
+        
+        Returns True if the map was already consistent. PRAGMA data_version only
+        changes when another connection commits, so the common case reads no table.
+        """
+        with self._open_sessions_lock:
+            data_version = self._data_version()
+            if data_version == getattr(self._local, 'data_version_seen', None):
+                return True
+            
+            sessions = self._query_open_sessions()
+            self._local.data_version_seen = data_version
+            # Another process may have changed employees and closed history too
+            self.invalidate_roster()
+            self._forget_last_clock_outs()
+            return self._update_open_sessions(sessions, replace=True)
+    
+    def _get_roster(self) -> Tuple[Dict[int, Employee], Dict[str, Employee]]:
+        roster = self._roster
+        if roster is None:
+            generation = self._roster_generation
+            cursor = self._get_connection().execute('SELECT id, name, is_active FROM employees ORDER BY id')
+            by_id = {row[0]: Employee(id=row[0], name=row[1], is_active=bool(row[2])) for row in cursor.fetchall()}
+            roster = (by_id, {employee.name: employee for employee in by_id.values()})
+            with self._roster_lock:
+                if self._roster_generation == generation:
+                    self._roster = roster
+        return roster
+    
+    def invalidate_roster(self):
+        """Drop the cached roster so the next lookup rereads employees, e.g. after another process added some"""
+        with self._roster_lock:
+            self._roster_generation += 1
+            self._roster = None
     
     def add_employee(self, name: str) -> int:
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('INSERT INTO employees (name) VALUES (?)', (name,))
             conn.commit()
-            return cursor.lastrowid
+        
+        self.invalidate_roster()
+        return cursor.lastrowid
+    
+    def get_or_create_employee(self, name: str) -> int:
+        """Id of the employee with this name, creating them if needed.
+        
+        Safe against another process creating the same name at the same time:
+        the insert and the lookup run in one transaction.
+        """
+        employee = self._get_roster()[1].get(name)
+        if employee:
+            return employee.id
+        
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('INSERT OR IGNORE INTO employees (name) VALUES (?)', (name,))
+            cursor.execute('SELECT id FROM employees WHERE name = ?', (name,))
+            employee_id = cursor.fetchone()[0]
+            conn.commit()
+        
+        self.invalidate_roster()
+        return employee_id
+    
+    def set_employee_active(self, employee_id: int, is_active: bool) -> bool:
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('UPDATE employees SET is_active = ? WHERE id = ?', (int(is_active), employee_id))
+            success = cursor.rowcount > 0
+            conn.commit()
+        
+        self.invalidate_roster()
+        return success
+    
+    def get_employee(self, employee_id: int) -> Optional[Employee]:
+        employee = self._get_roster()[0].get(employee_id)
+        if employee is None:
+            # An unknown id most likely means another process added the employee
+            self.invalidate_roster()
+            employee = self._get_roster()[0].get(employee_id)
+        # Copies, so callers can't change the cached roster
+        return dataclasses.replace(employee) if employee else None
+    
+    def get_employee_by_name(self, name: str) -> Optional[Employee]:
+        employee = self._get_roster()[1].get(name)
+        if employee is None:
+            self.invalidate_roster()
+            employee = self._get_roster()[1].get(name)
+        return dataclasses.replace(employee) if employee else None
+    
+    def get_employee_ids_by_name(self, names: Iterable[str], create_missing: bool = False) -> Dict[str, int]:
+        """Resolve many employee names at once, optionally creating the missing ones"""
+        names = set(names)
+        by_name = self._get_roster()[1]
+        missing = names - by_name.keys()
+        if missing:
+            if create_missing:
+                with self._get_connection() as conn:
+                    conn.executemany('INSERT OR IGNORE INTO employees (name) VALUES (?)',
+                                     [(name,) for name in missing])
+                    conn.commit()
+            # Reload either way, in case another process created them
+            self.invalidate_roster()
+            by_name = self._get_roster()[1]
+        return {name: by_name[name].id for name in names if name in by_name}
     
     def get_employees(self, active_only: bool = True) -> List[Employee]:
-        with sqlite3.connect(self.db_path) as conn:
+        """Employees in id order, copied from the cached roster"""
+        return [dataclasses.replace(employee) for employee in self._get_roster()[0].values() if employee.is_active or not active_only]
+    
+    def get_employee_sessions(self, active_only: bool = True) -> List[Tuple[Employee, Optional[TimeRecord]]]:
+        """Return every employee with their open session (or None) in a single query"""
+        with self._get_connection() as conn:
             cursor = conn.cursor()
+            query = '''
+                SELECT e.id, e.name, e.is_active,
+                       t.id, t.employee_id, t.clock_in, t.clock_out, t.created_at
+                FROM employees e
+                LEFT JOIN time_records t
+                    ON t.employee_id = e.id AND t.clock_out IS NULL
+            '''
             if active_only:
-                cursor.execute('SELECT id, name, is_active FROM employees WHERE is_active = 1')
-            else:
-                cursor.execute('SELECT id, name, is_active FROM employees')
+                query += ' WHERE e.is_active = 1'
+            # Ascending clock_in so the latest session wins if an employee somehow has two
+            query += ' ORDER BY e.id, t.clock_in'
+            cursor.execute(query)
             
-            return [Employee(id=row[0], name=row[1], is_active=bool(row[2])) 
-                   for row in cursor.fetchall()]
+            employees: Dict[int, Employee] = {}
+            sessions: Dict[int, Optional[TimeRecord]] = {}
+            for row in cursor.fetchall():
+                employee_id = row[0]
+                if employee_id not in employees:
+                    employees[employee_id] = Employee(id=employee_id, name=row[1], is_active=bool(row[2]))
+                    sessions[employee_id] = None
+                if row[3] is not None:
+                    sessions[employee_id] = self._row_to_record(row[3:])
+        
+        # The result is fresh from disk, so use it to resync the open-session map
+        self._update_open_sessions(sessions)
+        
+        return [(employee, sessions[employee_id]) for employee_id, employee in employees.items()]
     
-    def clock_in(self, employee_id: int) -> int:
-        with sqlite3.connect(self.db_path) as conn:
+    def clock_in(self, employee_id: int, clock_in_time: Optional[datetime.datetime] = None) -> int:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
-            clock_in_time = datetime.datetime.now()
-            cursor.execute(
-                'INSERT INTO time_records (employee_id, clock_in) VALUES (?, ?)',
-                (employee_id, clock_in_time)
-            )
+            record_id = self._insert_clock_in(cursor, employee_id, clock_in_time or datetime.datetime.now())
             conn.commit()
-            return cursor.lastrowid
+        
+        self._refresh_open_session(employee_id)
+        return record_id
     
-    def clock_out(self, employee_id: int) -> bool:
-        with sqlite3.connect(self.db_path) as conn:
+    def clock_out(self, employee_id: int, clock_out_time: Optional[datetime.datetime] = None) -> bool:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
-            clock_out_time = datetime.datetime.now()
-            
-            # First, find the most recent clock-in record without a clock-out
-            cursor.execute('''
-                SELECT id FROM time_records 
-                WHERE employee_id = ? AND clock_out IS NULL
-                ORDER BY clock_in DESC LIMIT 1
-            ''', (employee_id,))
-            
-            result = cursor.fetchone()
-            if result:
-                record_id = result[0]
-                cursor.execute('''
-                    UPDATE time_records 
-                    SET clock_out = ? 
-                    WHERE id = ?
-                ''', (clock_out_time, record_id))
-                conn.commit()
-                return cursor.rowcount > 0
-            
+            # Hold the write lock from the lookup on so the rollup sees the row it updates
+            cursor.execute('BEGIN IMMEDIATE')
+            clock_out_time = clock_out_time or datetime.datetime.now()
+            success = self._close_open_session(cursor, employee_id, clock_out_time)
+            conn.commit()
+        
+        if success:
+            self._raise_last_clock_outs([(employee_id, clock_out_time)])
+        self._refresh_open_session(employee_id)
+        return success
+    
+    def toggle_clock(self, employee_id: int, tap_time: Optional[datetime.datetime] = None) -> ClockToggle:
+        """Clock out if the employee has an open session, otherwise clock in, in one transaction.
+        
+        The decision is made under the write lock, so two quick taps can never
+        both clock in. The open-session map is updated from the result without
+        reading the row back.
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            result = self._toggle_clock(cursor, employee_id, tap_time or datetime.datetime.now())
+            conn.commit()
+        
+        if not result.clocked_in:
+            self._raise_last_clock_outs([(employee_id, result.clock_out)])
+        self._update_open_sessions({employee_id: self._toggle_session(employee_id, result)})
+        return result
+    
+    def _toggle_clock(self, cursor: sqlite3.Cursor, employee_id: int, tap_time: datetime.datetime) -> ClockToggle:
+        cursor.execute(
+            'SELECT id, clock_in FROM time_records WHERE employee_id = ? AND clock_out IS NULL',
+            (employee_id,)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return ClockToggle(self._insert_clock_in(cursor, employee_id, tap_time), True, tap_time)
+        
+        record_id, clock_in = row[0], _decode_timestamp(row[1])
+        cursor.execute('UPDATE time_records SET clock_out = ? WHERE id = ?',
+                       (self._to_db_timestamp(tap_time), record_id))
+        self._log_changes(cursor, 'update', [record_id])
+        self._add_daily_hours(cursor, self._session_daily_hours({}, employee_id, clock_in, tap_time))
+        return ClockToggle(record_id, False, clock_in, tap_time)
+    
+    def _toggle_session(self, employee_id: int, result: ClockToggle) -> Optional[TimeRecord]:
+        return TimeRecord(result.record_id, employee_id, result.clock_in) if result.clocked_in else None
+    
+    def _insert_clock_in(self, cursor: sqlite3.Cursor, employee_id: int,
+                         clock_in_time: datetime.datetime) -> int:
+        cursor.execute(
+            'INSERT INTO time_records (employee_id, clock_in, created_at, uid) '
+            f'VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP), {NEW_UID_SQL})',
+            (employee_id, self._to_db_timestamp(clock_in_time), self._created_at_value())
+        )
+        record_id = cursor.lastrowid
+        self._log_changes(cursor, 'insert', [record_id])
+        return record_id
+    
+    def _close_open_session(self, cursor: sqlite3.Cursor, employee_id: int,
+                            clock_out_time: datetime.datetime) -> bool:
+        # First, find the most recent clock-in record without a clock-out
+        cursor.execute('''
+            SELECT id, clock_in FROM time_records 
+            WHERE employee_id = ? AND clock_out IS NULL
+            ORDER BY clock_in DESC LIMIT 1
+        ''', (employee_id,))
+        
+        result = cursor.fetchone()
+        if not result:
+            return False
+        
+        cursor.execute('''
+            UPDATE time_records 
+            SET clock_out = ? 
+            WHERE id = ?
+        ''', (self._to_db_timestamp(clock_out_time), result[0]))
+        if cursor.rowcount == 0:
             return False
+        
+        self._log_changes(cursor, 'update', [result[0]])
+        self._add_daily_hours(cursor, self._session_daily_hours(
+            {}, employee_id, _decode_timestamp(result[1]), clock_out_time
+        ))
+        return True
     
     def is_clocked_in(self, employee_id: int) -> bool:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT COUNT(*) FROM time_records 
-                WHERE employee_id = ? AND clock_out IS NULL
-            ''', (employee_id,))
-            return cursor.fetchone()[0] > 0
+        return employee_id in self._open_sessions
     
     def get_current_session(self, employee_id: int) -> Optional[TimeRecord]:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, employee_id, clock_in, clock_out, created_at
-                FROM time_records 
-                WHERE employee_id = ? AND clock_out IS NULL
-                ORDER BY clock_in DESC LIMIT 1
-            ''', (employee_id,))
-            
-            row = cursor.fetchone()
-            if row:
-                return TimeRecord(
-                    id=row[0],
-                    employee_id=row[1],
-                    clock_in=datetime.datetime.fromisoformat(row[2]),
-                    clock_out=datetime.datetime.fromisoformat(row[3]) if row[3] else None,
-                    created_at=datetime.datetime.fromisoformat(row[4]) if row[4] else None
-                )
-            return None
+        session = self._open_sessions.get(employee_id)
+        return session.copy() if session else None
+    
+    def get_last_clock_out(self, employee_id: int) -> Optional[datetime.datetime]:
+        """When the employee last clocked out, or None if they never have.
+        
+        Answered from memory after the first lookup; a miss is one probe of
+        idx_employee_clock_out however long the history. Archived records are
+        not consulted, being far older than any break.
+        """
+        with self._last_clock_out_lock:
+            if employee_id in self._last_clock_outs:
+                return self._last_clock_outs[employee_id]
+            generation = self._last_clock_out_generation
+        
+        row = self._get_connection().execute(
+            'SELECT MAX(clock_out) FROM time_records WHERE employee_id = ? AND clock_out IS NOT NULL',
+            (employee_id,)
+        ).fetchone()
+        last_clock_out = _decode_timestamp(row[0])
+        with self._last_clock_out_lock:
+            if self._last_clock_out_generation == generation:
+                self._last_clock_outs[employee_id] = last_clock_out
+        return last_clock_out
+    
+    def _raise_last_clock_outs(self, clock_outs: Iterable[Tuple[int, datetime.datetime]]):
+        """Fold committed clock-outs into the cache; employees not cached yet stay unknown"""
+        with self._last_clock_out_lock:
+            self._last_clock_out_generation += 1
+            for employee_id, clock_out in clock_outs:
+                if employee_id in self._last_clock_outs:
+                    cached = self._last_clock_outs[employee_id]
+                    if cached is None or clock_out > cached:
+                        self._last_clock_outs[employee_id] = clock_out
+    
+    def _forget_last_clock_outs(self, employee_ids: Optional[Iterable[int]] = None):
+        """Drop cached clock-outs after a commit that may have lowered them; all of them by default"""
+        with self._last_clock_out_lock:
+            self._last_clock_out_generation += 1
+            if employee_ids is None:
+                self._last_clock_outs.clear()
+            else:
+                for employee_id in employee_ids:
+                    self._last_clock_outs.pop(employee_id, None)
     
     def get_time_records(self, employee_id: Optional[int] = None, 
                         start_date: Optional[datetime.date] = None,
-                        end_date: Optional[datetime.date] = None) -> List[TimeRecord]:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            query = '''
-                SELECT id, employee_id, clock_in, clock_out, created_at
-                FROM time_records WHERE 1=1
-            '''
-            params = []
-            
-            if employee_id:
-                query += ' AND employee_id = ?'
-                params.append(employee_id)
-            
-            if start_date:
-                query += ' AND DATE(clock_in) >= ?'
-                params.append(start_date.isoformat())
-            
-            if end_date:
-                query += ' AND DATE(clock_in) <= ?'
-                params.append(end_date.isoformat())
-            
-            query += ' ORDER BY clock_in DESC'
-            
+                        end_date: Optional[datetime.date] = None,
+                        overlapping: bool = False) -> List[TimeRecord]:
+        return list(self.iter_time_records(employee_id, start_date, end_date, overlapping=overlapping))
+    
+    def iter_time_records(self, employee_id: Optional[int] = None,
+                          start_date: Optional[datetime.date] = None,
+                          end_date: Optional[datetime.date] = None,
+                          chunk_size: int = 500,
+                          descending: bool = True,
+                          overlapping: bool = False) -> Iterator[TimeRecord]:
+        """Yield matching records in clock_in order, fetching chunk_size rows at a time.
+        
+        Records are those clocked in within the range, or with overlapping=True
+        every session that overlaps it, including shifts that started up to
+        MAX_SHIFT earlier.
+        Memory stays bounded by chunk_size however large the range is. Consume the
+        iterator on the thread that created it, since it reads that thread's connection.
+        """
+        conn = self._get_connection()
+        
+        where = ''
+        params = []
+        
+        if employee_id:
+            where += ' AND employee_id = ?'
+            params.append(employee_id)
+        
+        # Half-open [start, end + 1 day) on the raw column keeps the clock_in indexes usable
+        end_where = ''
+        end_params = []
+        if end_date:
+            end_where = ' AND clock_in < ?'
+            end_params = [self._to_db_timestamp(
+                datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min)
+            )]
+        
+        range_where = ''
+        range_params = []
+        if start_date:
+            start = datetime.datetime.combine(start_date, datetime.time.min)
+            if overlapping:
+                # Closed sessions reaching into the range started at most MAX_SHIFT before it,
+                # so the clock_in index still bounds the scan; open ones are read separately
+                range_where = ' AND clock_in >= ? AND clock_out > ?'
+                range_params = [self._to_db_timestamp(start - MAX_SHIFT), self._to_db_timestamp(start)]
+            else:
+                range_where = ' AND clock_in >= ?'
+                range_params = [self._to_db_timestamp(start)]
+        
+        # Archived years overlapping the range are read alongside the hot table;
+        # a shift overlapping the first day may have started in the previous year
+        first_year = (start - MAX_SHIFT if overlapping else start).year if start_date else None
+        archives = {
+            year: archive for year, archive in self._get_archives().items()
+            if (not start_date or year >= first_year) and (not end_date or year <= end_date.year)
+        }
+        select = 'SELECT id, employee_id, clock_in, clock_out, created_at FROM {} WHERE 1=1'
+        order = ' ORDER BY clock_in DESC' if descending else ' ORDER BY clock_in'
+        
+        selects = [select.format('main.time_records') + range_where + where + end_where]
+        select_params = range_params + params + end_params
+        if start_date and overlapping:
+            # Only the hot table holds open sessions. Left to itself the planner walks
+            # idx_clock_in through all history to feed the ORDER BY, so name the index
+            selects.append(select.format('main.time_records INDEXED BY idx_one_open_session')
+                           + ' AND clock_out IS NULL' + where + end_where)
+            select_params += params + end_params
+        hot = self._stream_records(conn, ' UNION ALL '.join(selects) + order, select_params, chunk_size)
+        if not archives:
+            yield from hot
+            return
+        
+        def archived():
+            # Each archive holds one year of clock-ins, so batches in year order stay sorted end to end
+            for schemas in self._attach_archive_batches(conn, archives, descending):
+                selects = [
+                    # A crash mid-archive can leave a row in both tiers until the next run; the hot copy wins
+                    select.format(f'{schema}.time_records') + range_where + where + end_where
+                    + ' AND id NOT IN (SELECT id FROM main.time_records)'
+                    for schema in schemas
+                ]
+                yield from self._stream_records(conn, ' UNION ALL '.join(selects) + order,
+                                                (range_params + params + end_params) * len(selects), chunk_size)
+        
+        yield from heapq.merge(hot, archived(), key=lambda record: record.clock_in, reverse=descending)
+    
+    def _stream_records(self, conn: sqlite3.Connection, query: str, params: List,
+                        chunk_size: int) -> Iterator[TimeRecord]:
+        cursor = conn.cursor()
+        
+        try:
             cursor.execute(query, params)
-            
-            records = []
-            for row in cursor.fetchall():
-                records.append(TimeRecord(
-                    id=row[0],
-                    employee_id=row[1],
-                    clock_in=datetime.datetime.fromisoformat(row[2]),
-                    clock_out=datetime.datetime.fromisoformat(row[3]) if row[3] else None,
-                    created_at=datetime.datetime.fromisoformat(row[4]) if row[4] else None
-                ))
-            
-            return records
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self._row_to_record(row)
+        finally:
+            cursor.close()
     
     def auto_clock_out_expired_sessions(self, max_hours: int = 12):
-        cutoff_time = datetime.datetime.now() - datetime.timedelta(hours=max_hours)
+        now = datetime.datetime.now()
+        cutoff_time = now - datetime.timedelta(hours=max_hours)
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
             cursor.execute('''
+                SELECT id, employee_id, clock_in FROM time_records
+                WHERE clock_out IS NULL AND clock_in < ?
+            ''', (self._to_db_timestamp(cutoff_time),))
+            expired = cursor.fetchall()
+            
+            cursor.executemany('''
                 UPDATE time_records 
                 SET clock_out = ? 
-                WHERE clock_out IS NULL AND clock_in < ?
-            ''', (datetime.datetime.now(), cutoff_time))
+                WHERE id = ?
+            ''', [(self._to_db_timestamp(now), record_id) for record_id, _, _ in expired])
+            
+            self._log_changes(cursor, 'update', (record_id for record_id, _, _ in expired))
+            
+            totals = {}
+            for _, employee_id, clock_in in expired:
+                self._session_daily_hours(totals, employee_id, _decode_timestamp(clock_in), now)
+            self._add_daily_hours(cursor, totals)
+            
+            conn.commit()
+            count = len(expired)
+        
+        if count > 0:
+            self._raise_last_clock_outs((employee_id, now) for _, employee_id, _ in expired)
+            self._load_open_sessions()
+        return count
+    
+    def auto_clock_out_sessions(self, record_ids: Iterable[int], max_hours: int = 12) -> List[TimeRecord]:
+        """Close the given sessions at their clock_in + max_hours deadline, returning the closed records.
+        
+        Only records that are still open and already past the deadline are
+        touched, so a caller firing late, or for a session that was closed in
+        the meantime, does no harm.
+        """
+        now = datetime.datetime.now()
+        max_duration = datetime.timedelta(hours=max_hours)
+        closed = []
+        totals = {}
+        
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            for record_id in record_ids:
+                cursor.execute('''
+                    SELECT id, employee_id, clock_in, clock_out, created_at
+                    FROM time_records WHERE id = ? AND clock_out IS NULL
+                ''', (record_id,))
+                row = cursor.fetchone()
+                if not row:
+                    continue
+                
+                record = self._row_to_record(row)
+                deadline = record.clock_in + max_duration
+                if deadline > now:
+                    continue
+                
+                cursor.execute('UPDATE time_records SET clock_out = ? WHERE id = ?',
+                               (self._to_db_timestamp(deadline), record_id))
+                record.clock_out = deadline
+                self._session_daily_hours(totals, record.employee_id, record.clock_in, deadline)
+                closed.append(record)
             
+            self._log_changes(cursor, 'update', (record.id for record in closed))
+            self._add_daily_hours(cursor, totals)
+            conn.commit()
+        
+        self._raise_last_clock_outs((record.employee_id, record.clock_out) for record in closed)
+        for employee_id in {record.employee_id for record in closed}:
+            self._refresh_open_session(employee_id)
+        return closed
+    
+    def add_time_record(self, employee_id: int, clock_in: datetime.datetime,
+                        clock_out: Optional[datetime.datetime] = None) -> int:
+        """Insert a record with explicit times (admin entry), returning its id.
+        
+        Raises OverlapError if it would overlap another session of the employee.
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            # Hold the write lock from the overlap check on, so nothing can slip in between
+            cursor.execute('BEGIN IMMEDIATE')
+            self._check_overlap(employee_id, clock_in, clock_out)
+            cursor.execute(
+                'INSERT INTO time_records (employee_id, clock_in, clock_out, created_at, uid) '
+                f'VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), {NEW_UID_SQL})',
+                (employee_id, self._to_db_timestamp(clock_in), self._to_db_timestamp(clock_out),
+                 self._created_at_value())
+            )
+            record_id = cursor.lastrowid
+            self._log_changes(cursor, 'insert', [record_id])
+            self._add_daily_hours(cursor, self._session_daily_hours({}, employee_id, clock_in, clock_out))
+            conn.commit()
+        
+        if clock_out is None:
+            self._refresh_open_session(employee_id)
+        else:
+            self._raise_last_clock_outs([(employee_id, clock_out)])
+        return record_id
+    
+    def bulk_insert_time_records(self, records: Iterable[Tuple[int, datetime.datetime, Optional[datetime.datetime]]]) -> int:
+        """Insert (employee_id, clock_in, clock_out) tuples in one transaction.
+        
+        Rows are streamed into a single executemany, so the input can be a
+        generator of any length. Either every row is stored or, on error, none;
+        a row overlapping a stored session or an earlier row of the same
+        employee raises OverlapError. Returns the number of rows inserted.
+        """
+        open_employee_ids = set()
+        closed_employee_ids = set()
+        daily_totals = {}
+        created_at = self._created_at_value()
+        # Rows already streamed are indexed under placeholder ids, so the batch can't overlap itself either
+        staged_ids = []
+        
+        def encoded_rows(intervals, archives):
+            for employee_id, clock_in, clock_out in records:
+                self._load_archived_intervals(archives, clock_in, clock_out)
+                intervals.check(employee_id, clock_in, clock_out)
+                staged_ids.append(-len(staged_ids) - 1)
+                intervals.add(TimeRecord(staged_ids[-1], employee_id, clock_in, clock_out))
+                if clock_out is None:
+                    open_employee_ids.add(employee_id)
+                else:
+                    closed_employee_ids.add(employee_id)
+                self._session_daily_hours(daily_totals, employee_id, clock_in, clock_out)
+                yield (employee_id, self._to_db_timestamp(clock_in),
+                       self._to_db_timestamp(clock_out), created_at)
+        
+        conn = self._get_connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            changes_before = conn.total_changes
+            # The write lock is held, so the new rows are exactly those above the current maximum id
+            last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM time_records').fetchone()[0]
+            # Caught up once: nothing else can commit until this transaction does
+            with self._intervals_lock:
+                intervals = self._get_intervals()
+                archives = self._get_archives()
+                try:
+                    conn.executemany(
+                        'INSERT INTO time_records (employee_id, clock_in, clock_out, created_at, uid) '
+                        f'VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), {NEW_UID_SQL})',
+                        encoded_rows(intervals, archives)
+                    )
+                finally:
+                    # Committed rows come back under their real ids when change_log is replayed
+                    for record_id in staged_ids:
+                        intervals.remove(record_id)
+            inserted = conn.total_changes - changes_before
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO change_log (record_id, operation, uid) SELECT id, 'insert', uid FROM time_records WHERE id > ? ORDER BY id",
+                (last_id,)
+            )
+            self._add_daily_hours(cursor, daily_totals)
             conn.commit()
-            return cursor.rowcount
+        except Exception:
+            conn.rollback()
+            raise
+        
+        self._forget_last_clock_outs(closed_employee_ids)
+        for employee_id in open_employee_ids:
+            self._refresh_open_session(employee_id)
+        return inserted
     
     def update_time_record(self, record_id: int, clock_in: datetime.datetime, 
                           clock_out: Optional[datetime.datetime] = None) -> bool:
-        with sqlite3.connect(self.db_path) as conn:
+        """Change a record's times; raises OverlapError if it would overlap another session of the employee.
+        
+        Archived records are read-only and raise ArchivedRecordError.
+        """
+        with self._get_connection() as conn:
             cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            old = self._get_record(cursor, record_id)
+            if old:
+                self._check_overlap(old.employee_id, clock_in, clock_out, record_id)
             cursor.execute('''
                 UPDATE time_records 
                 SET clock_in = ?, clock_out = ?
                 WHERE id = ?
-            ''', (clock_in, clock_out, record_id))
+            ''', (self._to_db_timestamp(clock_in), self._to_db_timestamp(clock_out), record_id))
+            success = cursor.rowcount > 0
+            
+            if success:
+                self._log_changes(cursor, 'update', [record_id])
+                totals = self._session_daily_hours({}, old.employee_id, old.clock_in, old.clock_out, sign=-1)
+                self._session_daily_hours(totals, old.employee_id, clock_in, clock_out)
+                self._add_daily_hours(cursor, totals)
             
             conn.commit()
-            return cursor.rowcount > 0
+        
+        if success:
+            self._forget_last_clock_outs([old.employee_id])
+            self._refresh_open_session(old.employee_id)
+        elif self._is_archived(record_id):
+            raise ArchivedRecordError(record_id)
+        return success
     
     def delete_time_record(self, record_id: int) -> bool:
-        with sqlite3.connect(self.db_path) as conn:
+        """Delete a record; archived records are read-only and raise ArchivedRecordError"""
+        with self._get_connection() as conn:
             cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            old = self._get_record(cursor, record_id)
+            self._log_changes(cursor, 'delete', [record_id])
             cursor.execute('DELETE FROM time_records WHERE id = ?', (record_id,))
+            success = cursor.rowcount > 0
+            
+            if success:
+                self._add_daily_hours(cursor, self._session_daily_hours(
+                    {}, old.employee_id, old.clock_in, old.clock_out, sign=-1
+                ))
+            
+            conn.commit()
+        
+        if success:
+            self._forget_last_clock_outs([old.employee_id])
+            self._refresh_open_session(old.employee_id)
+        elif self._is_archived(record_id):
+            raise ArchivedRecordError(record_id)
+        return success
+    
+    def get_archived_record_ids(self, record_ids: Iterable[int]) -> Set[int]:
+        """Those of these ids (from get_time_records) that were moved to an archive and can't be changed"""
+        record_ids = set(record_ids)
+        return record_ids - self.get_record_uids(record_ids).keys()
+    
+    def _is_archived(self, record_id: int) -> bool:
+        # Archives are attached outside the write transaction; SQLite can't ATTACH inside one
+        conn = self._get_connection()
+        for schemas in self._attach_archive_batches(conn, self._get_archives()):
+            for schema in schemas:
+                if conn.execute(f'SELECT 1 FROM {schema}.time_records WHERE id = ?', (record_id,)).fetchone():
+                    return True
+        return False
+    
+    def _get_intervals(self) -> IntervalIndex:
+        """The interval index, caught up with every write logged since its last use.
+        
+        Callers hold _intervals_lock. Every time_records write from any process
+        goes through change_log, so replaying the changes since the last call
+        keeps the index exact without rereading the table. Inside a write
+        transaction nobody else can commit, so checks made there hold until it
+        commits. Archived records are only indexed for the years that
+        _load_archived_intervals has been asked for.
+        """
+        if self._intervals is None:
+            # Read the sequence first: a write racing with the load is replayed below on the next call
+            self._intervals_seq = self.get_change_seq()
+            cursor = self._get_connection().execute(
+                'SELECT id, employee_id, clock_in, clock_out, created_at FROM time_records'
+            )
+            self._intervals = IntervalIndex(map(self._row_to_record, cursor.fetchall()))
+            self._intervals_archive_years = set()
+        
+        changes = self.changes_since(self._intervals_seq)
+        if changes:
+            changed_ids = {change.record_id for change in changes}
+            current = {record.id: record for record in self.get_time_records_by_ids(changed_ids)}
+            for record_id in changed_ids:
+                if record_id in current:
+                    self._intervals.add(current[record_id])
+                else:
+                    self._intervals.remove(record_id)
+            self._intervals_seq = changes[-1].seq
+        return self._intervals
+    
+    def _load_archived_intervals(self, archives: Dict[int, Tuple[str, bool, bool]],
+                                 start: datetime.datetime, end: Optional[datetime.datetime]):
+        """Index the archived years holding sessions that could overlap [start, end); end None means open-ended.
+        
+        Callers hold _intervals_lock and have called _get_intervals. Archives
+        are read through their own connections, so this also works inside a
+        write transaction. The hot copy of a row left in both tiers wins.
+        """
+        first_year = (start - MAX_SHIFT).year
+        for year, archive in archives.items():
+            if year < first_year or (end is not None and year > end.year) or year in self._intervals_archive_years:
+                continue
+            for row in self._read_archive(archive, 'SELECT id, employee_id, clock_in, clock_out, created_at FROM time_records'):
+                if row[0] not in self._intervals:
+                    self._intervals.add(self._row_to_record(row))
+            self._intervals_archive_years.add(year)
+    
+    def _check_overlap(self, employee_id: int, clock_in: datetime.datetime,
+                       clock_out: Optional[datetime.datetime], record_id: Optional[int] = None):
+        with self._intervals_lock:
+            intervals = self._get_intervals()
+            # Archived shifts count too, or an edit could double an archived day's hours
+            self._load_archived_intervals(self._get_archives(), clock_in, clock_out)
+            intervals.check(employee_id, clock_in, clock_out, record_id)
+    
+    def get_sessions_at(self, moment: datetime.datetime) -> List[TimeRecord]:
+        """Sessions in progress at moment across all employees ("who was on site at 14:30?")"""
+        with self._intervals_lock:
+            intervals = self._get_intervals()
+            self._load_archived_intervals(self._get_archives(), moment, moment)
+            return intervals.at(moment)
+    
+    def get_sessions_between(self, start: datetime.datetime, end: datetime.datetime,
+                             employee_id: Optional[int] = None) -> List[TimeRecord]:
+        """Sessions overlapping [start, end), including those that began before start"""
+        with self._intervals_lock:
+            intervals = self._get_intervals()
+            self._load_archived_intervals(self._get_archives(), start, end)
+            return intervals.between(start, end, employee_id)
+    
+    def _get_record(self, cursor: sqlite3.Cursor, record_id: int) -> Optional[TimeRecord]:
+        cursor.execute(
+            'SELECT id, employee_id, clock_in, clock_out, created_at FROM time_records WHERE id = ?',
+            (record_id,)
+        )
+        row = cursor.fetchone()
+        return self._row_to_record(row) if row else None
+    
+    def archive_expired_records(self) -> int:
+        """Archive closed records older than archive_after_days; a no-op when retention is disabled"""
+        if self.archive_after_days <= 0:
+            return 0
+        return self.archive_closed_records(datetime.date.today() - datetime.timedelta(days=self.archive_after_days))
+    
+    def archive_closed_records(self, before: datetime.date) -> int:
+        """Move closed records clocked in before the given date into per-year archive files.
+        
+        Each year is copied into archive_dir/time_records_<year>.db and committed
+        there before the rows are deleted from the hot table, so a crash can
+        leave a row in both places but never in neither. Years that end before
+        the cutoff are lzma-compressed when compress_archives is set. The
+        daily_hours rollup is unaffected. Returns the number of records moved.
+        """
+        cutoff = datetime.datetime.combine(before, datetime.time.min)
+        row = self._get_connection().execute(
+            'SELECT MIN(clock_in) FROM time_records WHERE clock_out IS NOT NULL AND clock_in < ?',
+            (self._to_db_timestamp(cutoff),)
+        ).fetchone()
+        if row[0] is None:
+            return 0
+        
+        moved = 0
+        for year in range(_decode_timestamp(row[0]).year, before.year + 1):
+            year_end = datetime.datetime(year + 1, 1, 1)
+            moved += self._archive_year(year, datetime.datetime(year, 1, 1), min(year_end, cutoff))
+            
+            # Nothing newer than the cutoff is ever added, so a fully archived year is cold
+            if self.compress_archives and year_end <= cutoff:
+                self._compress_archive(year)
+        
+        if moved:
+            # Moving records is not logged as a change, so reload rather than replay
+            with self._intervals_lock:
+                self._intervals = None
+        return moved
+    
+    def _archive_year(self, year: int, start: datetime.datetime, end: datetime.datetime) -> int:
+        conn = self._get_connection()
+        range_params = (self._to_db_timestamp(start), self._to_db_timestamp(end))
+        if not conn.execute(
+            'SELECT 1 FROM time_records WHERE clock_out IS NOT NULL AND clock_in >= ? AND clock_in < ? LIMIT 1',
+            range_params
+        ).fetchone():
+            return 0
+        
+        # An attachment on this connection would join the write transaction below and lock the file
+        self._detach_archive(conn, year)
+        path = self._writable_archive(year)
+        archive_conn = sqlite3.connect(path, timeout=self.busy_timeout_ms / 1000)
+        try:
+            archive_conn.executescript(ARCHIVE_SCHEMA)
+            # Archives written before records had uids
+            if 'uid' not in {row[1] for row in archive_conn.execute('PRAGMA table_info(time_records)')}:
+                archive_conn.execute('ALTER TABLE time_records ADD COLUMN uid TEXT')
+            
+            # The hot table stays write-locked until its rows are gone, so nothing
+            # can change between the copy and the delete
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                cursor = conn.execute('''
+                    SELECT id, employee_id, clock_in, clock_out, created_at, uid FROM time_records
+                    WHERE clock_out IS NOT NULL AND clock_in >= ? AND clock_in < ?
+                ''', range_params)
+                record_ids = []
+                
+                def copied_rows():
+                    for row in cursor:
+                        record_ids.append(row[0])
+                        yield row
+                
+                archive_conn.executemany(
+                    'INSERT OR REPLACE INTO time_records (id, employee_id, clock_in, clock_out, created_at, uid) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    copied_rows()
+                )
+                record_count = archive_conn.execute('SELECT COUNT(*) FROM time_records').fetchone()[0]
+                archive_conn.commit()
+                
+                conn.executemany('DELETE FROM time_records WHERE id = ?', ((record_id,) for record_id in record_ids))
+                conn.execute('''
+                    INSERT INTO archives (year, path, compressed, epoch_timestamps, record_count)
+                    VALUES (?, ?, 0, ?, ?)
+                    ON CONFLICT (year) DO UPDATE SET
+                        path = excluded.path, compressed = 0,
+                        epoch_timestamps = excluded.epoch_timestamps, record_count = excluded.record_count
+                ''', (year, path, self._epoch_timestamps, record_count))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        finally:
+            archive_conn.close()
+        
+        return len(record_ids)
+    
+    def _archive_path(self, year: int) -> str:
+        return os.path.join(self.archive_dir, f"time_records_{year}.db")
+    
+    def _get_archives(self) -> Dict[int, Tuple[str, bool, bool]]:
+        """year -> (path, compressed, epoch_timestamps) for every archive file"""
+        rows = self._get_connection().execute(
+            'SELECT year, path, compressed, epoch_timestamps FROM archives'
+        ).fetchall()
+        return {year: (path, bool(compressed), bool(epoch)) for year, path, compressed, epoch in rows}
+    
+    def _set_archive_path(self, year: int, path: str, compressed: bool):
+        conn = self._get_connection()
+        conn.execute('UPDATE archives SET path = ?, compressed = ? WHERE year = ?', (path, compressed, year))
+        conn.commit()
+    
+    def _writable_archive(self, year: int) -> str:
+        """Path of the year's uncompressed archive file, inflating a compressed one first"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = self._archive_path(year)
+        archive = self._get_archives().get(year)
+        if archive and archive[1]:
+            with lzma.open(archive[0], 'rb') as src, open(path + '.tmp', 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(path + '.tmp', path)
+            self._set_archive_path(year, path, False)
+            os.remove(archive[0])
+        return path
+    
+    def _compress_archive(self, year: int):
+        path = self._archive_path(year)
+        archive = self._get_archives().get(year)
+        if not archive or archive[1]:
+            return
+        
+        with open(path, 'rb') as src, lzma.open(path + '.xz.tmp', 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(path + '.xz.tmp', path + '.xz')
+        # Catalog first: until it points at the .xz file the original is still the live copy
+        self._set_archive_path(year, path + '.xz', True)
+        os.remove(path)
+    
+    def _convert_archives_to_epoch(self):
+        """Bring archives written before the epoch conversion into the same format as the hot table"""
+        for year, (path, compressed, epoch) in self._get_archives().items():
+            if epoch:
+                continue
+            
+            path = self._writable_archive(year)
+            archive_conn = sqlite3.connect(path, timeout=self.busy_timeout_ms / 1000)
+            try:
+                rows = archive_conn.execute('SELECT id, clock_in, clock_out, created_at FROM time_records').fetchall()
+                self._convert_rows_to_epoch(archive_conn, rows)
+                archive_conn.commit()
+            finally:
+                archive_conn.close()
+            
+            conn = self._get_connection()
+            conn.execute('UPDATE archives SET epoch_timestamps = 1 WHERE year = ?', (year,))
             conn.commit()
-            return cursor.rowcount > 0
\ No newline at end of file
+            if compressed:
+                self._compress_archive(year)
+    
+    def _readable_archive(self, path: str, compressed: bool) -> str:
+        if not compressed:
+            return path
+        
+        with self._archive_lock:
+            cached = self._archive_cache.get(path)
+            if cached is None:
+                if self._archive_cache_dir is None:
+                    self._archive_cache_dir = tempfile.mkdtemp(prefix='spf-archive-')
+                cached = os.path.join(self._archive_cache_dir, os.path.basename(path)[:-len('.xz')])
+                with lzma.open(path, 'rb') as src, open(cached, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                self._archive_cache[path] = cached
+            return cached
+    
+    def _read_archive(self, archive: Tuple[str, bool, bool], query: str, params: tuple = ()) -> Iterator[tuple]:
+        """Stream the rows of a query against one archive file through a connection of its own"""
+        path, compressed, _ = archive
+        uri = 'file:' + pathname2url(os.path.abspath(self._readable_archive(path, compressed))) + '?mode=ro'
+        archive_conn = sqlite3.connect(uri, uri=True, timeout=self.busy_timeout_ms / 1000)
+        try:
+            cursor = archive_conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(500)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            archive_conn.close()
+    
+    def _attach_archive_batches(self, conn: sqlite3.Connection, archives: Dict[int, Tuple[str, bool, bool]],
+                                descending: bool = False) -> Iterator[List[str]]:
+        """Attach the archives ATTACH_BATCH_SIZE at a time in year order, yielding each batch's schema names.
+        
+        Attaching the next batch detaches the previous one, so finish with a
+        batch's cursors before advancing.
+        """
+        years = sorted(archives, reverse=descending)
+        for i in range(0, len(years), ATTACH_BATCH_SIZE):
+            batch = years[i:i + ATTACH_BATCH_SIZE]
+            yield self._attach_archives(conn, {year: archives[year] for year in batch})
+    
+    def _attach_archives(self, conn: sqlite3.Connection, archives: Dict[int, Tuple[str, bool, bool]]) -> List[str]:
+        """Attach the given archives read-only to conn, returning their schema names.
+        
+        Attachments persist on the thread's connection and are reused; ones that
+        are no longer wanted or whose file has moved are detached first so the
+        SQLite limit on attached databases is not reached.
+        """
+        attached = getattr(self._local, 'attached_archives', None)
+        if attached is None:
+            attached = self._local.attached_archives = {}
+        
+        wanted = {year: self._readable_archive(path, compressed) for year, (path, compressed, _) in archives.items()}
+        for year, path in list(attached.items()):
+            if wanted.get(year) != path:
+                self._detach_archive(conn, year)
+        
+        for year, path in wanted.items():
+            if year not in attached:
+                uri = 'file:' + pathname2url(os.path.abspath(path)) + '?mode=ro'
+                conn.execute(f'ATTACH DATABASE ? AS archive_{int(year)}', (uri,))
+                attached[year] = path
+        
+        return [f'archive_{year}' for year in sorted(wanted)]
+    
+    def _detach_archive(self, conn: sqlite3.Connection, year: int):
+        attached = getattr(self._local, 'attached_archives', {})
+        if year not in attached:
+            return
+        try:
+            conn.execute(f'DETACH DATABASE archive_{int(year)}')
+            del attached[year]
+        except sqlite3.OperationalError:
+            # Still in use by an open iterator on this thread; leave it for next time
+            pass
+    
+    def get_last_applied_tap_seq(self) -> int:
+        cursor = self._get_connection().cursor()
+        cursor.execute('SELECT last_seq FROM tap_journal_state WHERE id = 1')
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    
+    def _apply_taps(self, taps: List['Tap'], last_seq: int) -> list:
+        """Apply journaled taps in one transaction and record last_seq alongside them.
+        
+        Returns one result per tap: the new record id for a clock-in, whether
+        an open session was closed for a clock-out, or a ClockToggle for a toggle.
+        """
+        conn = self._get_connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = conn.cursor()
+            results = []
+            sessions = {}
+            clock_outs = []
+            for tap in taps:
+                if tap.action == 'toggle':
+                    result = self._toggle_clock(cursor, tap.employee_id, tap.timestamp)
+                    sessions[tap.employee_id] = self._toggle_session(tap.employee_id, result)
+                    if not result.clocked_in:
+                        clock_outs.append((tap.employee_id, tap.timestamp))
+                    results.append(result)
+                    continue
+                
+                # Anything else may leave the session in a state only the database knows
+                sessions.pop(tap.employee_id, None)
+                if tap.action == 'clock_in':
+                    results.append(self._insert_clock_in(cursor, tap.employee_id, tap.timestamp))
+                else:
+                    closed = self._close_open_session(cursor, tap.employee_id, tap.timestamp)
+                    if closed:
+                        clock_outs.append((tap.employee_id, tap.timestamp))
+                    results.append(closed)
+            cursor.execute('UPDATE tap_journal_state SET last_seq = ? WHERE id = 1', (last_seq,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        
+        self._raise_last_clock_outs(clock_outs)
+        # Toggles already know the resulting session; only other taps need a read back
+        self._update_open_sessions(sessions)
+        for employee_id in {tap.employee_id for tap in taps} - sessions.keys():
+            self._refresh_open_session(employee_id)
+        return results
+
+TAP_ACTIONS = ('clock_in', 'clock_out', 'toggle')
+
+@dataclass
+class Tap:
+    seq: int
+    action: str
+    employee_id: int
+    timestamp: datetime.datetime
+
+_STOP = object()
+
+def _is_busy_error(error: sqlite3.OperationalError) -> bool:
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+class TapWriter:
+    """Single writer thread for kiosk taps, with group commit and a crash-safe journal.
+    
+    A tap is appended to a small fsync'd journal file before it is queued, so it
+    survives a crash or a database held locked by a report or backup. The writer
+    thread drains whatever has queued up and commits it as one transaction; while
+    SQLite is busy it keeps retrying with backoff and the taps wait in the journal.
+    The last applied sequence number is committed with each batch, so replaying
+    the journal after a crash never applies a tap twice.
+    """
+    
+    def __init__(self, db_manager: DatabaseManager, journal_path: str,
+                 group_window_ms: int = 20, max_batch: int = 100):
+        self.db_manager = db_manager
+        self.journal_path = journal_path
+        self.group_window = group_window_ms / 1000
+        self.max_batch = max_batch
+        
+        self._queue: queue.Queue = queue.Queue()
+        self._journal = None
+        self._journal_lock = threading.Lock()
+        self._applied = threading.Condition(self._journal_lock)
+        self._journaled_seq = 0
+        self._applied_seq = 0
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        """Queue any taps left in the journal by a previous run, then start the writer thread"""
+        self._applied_seq = self.db_manager.get_last_applied_tap_seq()
+        pending = [tap for tap in self._read_journal() if tap.seq > self._applied_seq]
+        
+        self._journaled_seq = max([self._applied_seq] + [tap.seq for tap in pending])
+        for tap in pending:
+            self._queue.put((tap, None))
+        
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        if not pending:
+            self._truncate_journal()
+        
+        self._thread = threading.Thread(target=self._run, name='spf-tap-writer', daemon=True)
+        self._thread.start()
+    
+    def clock_in(self, employee_id: int) -> Future:
+        return self.submit('clock_in', employee_id)
+    
+    def clock_out(self, employee_id: int) -> Future:
+        return self.submit('clock_out', employee_id)
+    
+    def toggle(self, employee_id: int) -> Future:
+        """Clock in or out, whichever applies when the tap is committed; resolves to a ClockToggle"""
+        return self.submit('toggle', employee_id)
+    
+    def submit(self, action: str, employee_id: int) -> Future:
+        """Durably record a tap and queue it; the Future resolves once it is in SQLite"""
+        if action not in TAP_ACTIONS:
+            raise ValueError(f"Unknown tap action: {action}")
+        
+        future = Future()
+        with self._journal_lock:
+            self._journaled_seq += 1
+            tap = Tap(self._journaled_seq, action, employee_id, datetime.datetime.now())
+            self._journal.write(json.dumps({
+                'seq': tap.seq,
+                'action': tap.action,
+                'employee_id': tap.employee_id,
+                'timestamp': tap.timestamp.isoformat()
+            }) + '\n')
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            # Enqueued under the lock so the queue stays in journal order
+            self._queue.put((tap, future))
+        return future
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every tap submitted so far has been committed"""
+        with self._applied:
+            return self._applied.wait_for(lambda: self._applied_seq >= self._journaled_seq, timeout)
+    
+    def stop(self, timeout: Optional[float] = None):
+        """Finish writing queued taps and stop the writer thread"""
+        if self._thread:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+    
+    def _read_journal(self) -> List[Tap]:
+        if not os.path.exists(self.journal_path):
+            return []
+        
+        taps = []
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    taps.append(Tap(
+                        entry['seq'],
+                        entry['action'],
+                        entry['employee_id'],
+                        datetime.datetime.fromisoformat(entry['timestamp'])
+                    ))
+                except (ValueError, KeyError):
+                    # A torn final line from a crash mid-write; that tap was never acknowledged
+                    continue
+        return taps
+    
+    def _truncate_journal(self):
+        self._journal.truncate(0)
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+    
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            
+            # Group commit: take everything that arrives within the window
+            batch = [item]
+            deadline = time.monotonic() + self.group_window
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            self._write_batch(batch)
+    
+    def _write_batch(self, batch):
+        taps = [tap for tap, _ in batch]
+        try:
+            results = self._apply_with_retry(taps, taps[-1].seq)
+        except sqlite3.Error:
+            # Something other than lock contention: isolate the bad tap(s)
+            for tap, future in batch:
+                try:
+                    result = self._apply_with_retry([tap], tap.seq)[0]
+                except sqlite3.Error as e:
+                    print(f"Failed to apply {tap.action} tap for employee {tap.employee_id}: {e}")
+                    # Record it as consumed so it is not replayed forever
+                    self._apply_with_retry([], tap.seq)
+                    if future:
+                        future.set_exception(e)
+                else:
+                    if future:
+                        future.set_result(result)
+        else:
+            for (tap, future), result in zip(batch, results):
+                if future:
+                    future.set_result(result)
+        
+        self._mark_applied(taps[-1].seq)
+    
+    def _apply_with_retry(self, taps: List[Tap], last_seq: int) -> list:
+        delay = 0.05
+        while True:
+            try:
+                return self.db_manager._apply_taps(taps, last_seq)
+            except sqlite3.OperationalError as e:
+                if not _is_busy_error(e):
+                    raise
+                time.sleep(delay)
+                delay = min(delay * 2, 2.0)
+    
+    def _mark_applied(self, seq: int):
+        with self._applied:
+            self._applied_seq = seq
+            if self._applied_seq >= self._journaled_seq:
+                self._truncate_journal()
+            self._applied.notify_all()
@@ -1,10 +1,11 @@
 import sendgrid
 from sendgrid.helpers.mail import Mail, Attachment, FileContent, FileName, FileType, Disposition
 import base64
-from typing import List, Dict
+from typing import List, Dict, Optional
 import datetime
 from .config import Config
 from .database import TimeRecord
+from .business_rules import sweep_hours
 
 class EmailService:
     def __init__(self, config: Config):
@@ -19,8 +20,12 @@ class EmailService:
         days_since_start = (date.weekday() - work_week_start_day) % 7
         return date - datetime.timedelta(days=days_since_start)
     
-    def generate_weekly_table(self, records: List[TimeRecord], employees: Dict[int, str], week_start: datetime.date) -> str:
-        """Generate HTML table for a single week"""
+    def generate_weekly_table(self, records: List[TimeRecord], employees: Dict[int, str], week_start: datetime.date,
+                              daily_hours: Optional[Dict[int, Dict[datetime.date, float]]] = None) -> str:
+        """Generate HTML table for a single week.
+        
+        daily_hours (from DatabaseManager.get_daily_hours) is used instead of summing records when given.
+        """
         week_end = week_start + datetime.timedelta(days=6)
         
         # Create date range for the work week (starts on configured payroll start day)
@@ -30,27 +35,19 @@ class EmailService:
         
         # Aggregate hours by employee and day for this week
         employee_hours = {}
-        for record in records:
-            if record.clock_out is None:
-                continue  # Skip incomplete records
-            
-            record_date = record.clock_in.date()
-            
-            # Only include records from this week
-            if not (week_start <= record_date <= week_end):
-                continue
-            
-            employee_id = record.employee_id
-            
-            if employee_id not in employee_hours:
-                employee_hours[employee_id] = {}
-            
-            if record_date not in employee_hours[employee_id]:
-                employee_hours[employee_id][record_date] = 0.0
-            
-            duration = record.clock_out - record.clock_in
-            hours = duration.total_seconds() / 3600
-            employee_hours[employee_id][record_date] += hours
+        if daily_hours is not None:
+            for employee_id, days in daily_hours.items():
+                week_days = {date: hours for date, hours in days.items() if week_start <= date <= week_end}
+                if week_days:
+                    employee_hours[employee_id] = week_days
+            records = []
+        
+        closed_records = [record for record in records if record.clock_out is not None]  # Skip incomplete records
+        
+        # Shifts crossing midnight are split so each day gets the hours worked on it
+        for employee_id, hours in sweep_hours(closed_records, self.config.payroll.start_day,
+                                              week_start, week_end).items():
+            employee_hours[employee_id] = hours.daily
         
         # Generate HTML table
         html = f'<h4>Week of {week_start.strftime("%B %d, %Y")} - {week_end.strftime("%B %d, %Y")}</h4>\n'
@@ -103,7 +100,8 @@ class EmailService:
         
         return html
     
-    def generate_hours_table(self, records: List[TimeRecord], employees: Dict[int, str], start_date: datetime.date, end_date: datetime.date) -> str:
+    def generate_hours_table(self, records: List[TimeRecord], employees: Dict[int, str], start_date: datetime.date, end_date: datetime.date,
+                             daily_hours: Optional[Dict[int, Dict[datetime.date, float]]] = None) -> str:
         """Generate HTML tables showing hours worked by each employee per day, organized by week"""
         # Find all weeks in the date range
         weeks = []
@@ -116,12 +114,12 @@ class EmailService:
         # Generate a table for each week
         html_tables = []
         for week_start in weeks:
-            weekly_table = self.generate_weekly_table(records, employees, week_start)
+            weekly_table = self.generate_weekly_table(records, employees, week_start, daily_hours)
             html_tables.append(weekly_table)
         
         return '\n'.join(html_tables)
     
-    def send_report_email(self, csv_data: str, date_range: str, records: List[TimeRecord] = None, employees: Dict[int, str] = None, start_date: datetime.date = None, end_date: datetime.date = None, html_tables: str = None) -> bool:
+    def send_report_email(self, csv_data: str, date_range: str, records: List[TimeRecord] = None, employees: Dict[int, str] = None, start_date: datetime.date = None, end_date: datetime.date = None, html_tables: str = None, daily_hours: Dict[int, Dict[datetime.date, float]] = None) -> bool:
         try:
             sg = sendgrid.SendGridAPIClient(api_key=self.config.email.sendgrid_api_key)
             
@@ -131,7 +129,7 @@ class EmailService:
             # Use provided HTML tables or generate hours table
             hours_table = html_tables if html_tables else ""
             if not hours_table and records and employees and start_date and end_date:
-                hours_table = self.generate_hours_table(records, employees, start_date, end_date)
+                hours_table = self.generate_hours_table(records, employees, start_date, end_date, daily_hours)
             
             html_content = f"""
             <html>
@@ -0,0 +1,129 @@
+"""
+Per-employee interval index over time records.
+
+Answers "would this session overlap another of the same employee?" and
+"who was clocked in at T, or during [start, end)?" without scanning every
+record: sessions are kept per employee in clock-in order, and the longest
+closed session an employee has bounds how far back a probe has to look.
+"""
+
+import bisect
+import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+ONE_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+class OverlapError(ValueError):
+    """A session would overlap another session of the same employee"""
+
+    def __init__(self, employee_id: int, conflict):
+        self.employee_id = employee_id
+        self.conflict = conflict
+        end = conflict.clock_out.strftime('%Y-%m-%d %H:%M') if conflict.clock_out else 'still clocked in'
+        super().__init__(f"overlaps the session from {conflict.clock_in.strftime('%Y-%m-%d %H:%M')} to {end}")
+
+
+class IntervalIndex:
+    """Time records per employee in (clock_in, id) order, with overlap and stabbing queries.
+
+    Sessions are half-open, [clock_in, clock_out), so back-to-back sessions
+    do not overlap; an open session runs on indefinitely. Only sessions that
+    clocked in at most the employee's longest closed session before a probe
+    can reach it, so every probe is a bisect plus the few sessions in that
+    window, O(log n + k). Records that already overlap (entered before the
+    index existed, or merged from other kiosks) are indexed and reported
+    like any other. Stored and returned records are copies. Not thread-safe;
+    owners lock around it.
+    """
+
+    def __init__(self, records: Iterable = ()):
+        self._records: Dict[int, object] = {}
+        self._keys: Dict[int, List[Tuple[datetime.datetime, int]]] = {}
+        # Never shrinks on removal, which only widens the window probes look back over
+        self._longest: Dict[int, datetime.timedelta] = {}
+        self._open: Dict[int, Set[int]] = {}
+        for record in records:
+            self.add(record)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, record_id: int) -> bool:
+        return record_id in self._records
+
+    def add(self, record):
+        """Index a record, replacing any earlier version with the same id"""
+        self.remove(record.id)
+        record = self._copy(record)
+        self._records[record.id] = record
+        bisect.insort(self._keys.setdefault(record.employee_id, []), (record.clock_in, record.id))
+        if record.clock_out is None:
+            self._open.setdefault(record.employee_id, set()).add(record.id)
+        else:
+            duration = record.clock_out - record.clock_in
+            if duration > self._longest.get(record.employee_id, datetime.timedelta(0)):
+                self._longest[record.employee_id] = duration
+
+    def remove(self, record_id: int):
+        """Drop a record; returns it, or None if it was not indexed"""
+        record = self._records.pop(record_id, None)
+        if record is None:
+            return None
+        keys = self._keys[record.employee_id]
+        del keys[bisect.bisect_left(keys, (record.clock_in, record.id))]
+        self._open.get(record.employee_id, set()).discard(record.id)
+        return record
+
+    def find_overlap(self, employee_id: int, clock_in: datetime.datetime,
+                     clock_out: Optional[datetime.datetime], record_id: Optional[int] = None):
+        """The first session of employee_id overlapping [clock_in, clock_out), ignoring record_id itself"""
+        for record in self._overlapping(employee_id, clock_in, clock_out or datetime.datetime.max):
+            if record.id != record_id:
+                return self._copy(record)
+        return None
+
+    def check(self, employee_id: int, clock_in: datetime.datetime,
+              clock_out: Optional[datetime.datetime], record_id: Optional[int] = None):
+        """Raise OverlapError if the session would overlap another of the same employee"""
+        conflict = self.find_overlap(employee_id, clock_in, clock_out, record_id)
+        if conflict is not None:
+            raise OverlapError(employee_id, conflict)
+
+    def at(self, moment: datetime.datetime, employee_id: Optional[int] = None) -> List:
+        """Sessions in progress at moment (point stabbing query), in clock-in order"""
+        return self.between(moment, moment + ONE_MICROSECOND, employee_id)
+
+    def between(self, start: datetime.datetime, end: datetime.datetime,
+                employee_id: Optional[int] = None) -> List:
+        """Sessions overlapping [start, end) (range stabbing query), in clock-in order"""
+        employee_ids = [employee_id] if employee_id is not None else list(self._keys)
+        found = [self._copy(record)
+                 for employee in employee_ids
+                 for record in self._overlapping(employee, start, end)]
+        found.sort(key=lambda record: (record.clock_in, record.id))
+        return found
+
+    def _overlapping(self, employee_id: int, start: datetime.datetime, end: datetime.datetime) -> Iterator:
+        keys = self._keys.get(employee_id)
+        if not keys or start >= end:
+            return
+
+        seen = set()
+        # A closed session reaching start clocked in no earlier than start minus the longest one
+        position = bisect.bisect_left(keys, (start - self._longest.get(employee_id, datetime.timedelta(0)),))
+        while position < len(keys) and keys[position][0] < end:
+            record = self._records[keys[position][1]]
+            if record.clock_out is None or record.clock_out > start:
+                seen.add(record.id)
+                yield record
+            position += 1
+
+        # Open sessions may have started before the window above
+        for record_id in self._open.get(employee_id, ()):
+            record = self._records[record_id]
+            if record_id not in seen and record.clock_in < end:
+                yield record
+
+    def _copy(self, record):
+        return type(record)(record.id, record.employee_id, record.clock_in, record.clock_out, record.created_at)
@@ -17,12 +17,20 @@ import threading
 import datetime
 from typing import Dict
 
-from .database import DatabaseManager
+from .database import TapWriter, TimeRecord
+from .storage import create_backend
+from .scheduler import DeadlineScheduler
+from .business_rules import TimeTrackingRules
+from .notifications import NotificationEngine
+from .sync import SyncClient
 from .config import Config
 from .admin_ui import PinEntryDialog, AdminUI
 
+# Status text color while a break reminder or overtime alert is showing
+ALERT_COLOR = [1.0, 0.6, 0.1, 1.0]
+
 class EmployeeRow(BoxLayout):
-    def __init__(self, employee, database_manager, config, **kwargs):
+    def __init__(self, employee, database_manager, config, tap_writer, **kwargs):
         super().__init__(**kwargs)
         self.orientation = 'horizontal'
         self.size_hint_y = None
@@ -33,6 +41,10 @@ class EmployeeRow(BoxLayout):
         self.employee = employee
         self.db_manager = database_manager
         self.config = config
+        self.tap_writer = tap_writer
+        self.is_clocked_in = False
+        self.pending_taps = 0
+        self.alerts = []
         
         self.name_label = Label(
             text=employee.name,
@@ -67,48 +79,67 @@ class EmployeeRow(BoxLayout):
         self.update_status()
     
     def update_status(self):
-        is_clocked_in = self.db_manager.is_clocked_in(self.employee.id)
+        self.render_status(self.db_manager.get_current_session(self.employee.id))
+    
+    def render_status(self, current_session):
+        """Render the row from an already-fetched open session (None when clocked out)"""
+        self.is_clocked_in = current_session is not None
         
-        if is_clocked_in:
-            self.status_label.text = 'Clocked In'
+        if current_session:
             self.clock_button.text = 'Clock Out'
             self.clock_button.background_color = self.config.ui.clock_out_color
             
-            current_session = self.db_manager.get_current_session(self.employee.id)
-            if current_session:
-                duration = datetime.datetime.now() - current_session.clock_in
-                hours, remainder = divmod(duration.total_seconds(), 3600)
-                minutes, _ = divmod(remainder, 60)
-                self.status_label.text = f'Clocked In ({int(hours):02d}:{int(minutes):02d})'
+            duration = datetime.datetime.now() - current_session.clock_in
+            hours, remainder = divmod(duration.total_seconds(), 3600)
+            minutes, _ = divmod(remainder, 60)
+            self.status_label.text = f'Clocked In ({int(hours):02d}:{int(minutes):02d})'
+            if self.alerts:
+                self.status_label.text += '\n' + ', '.join(alert.message for alert in self.alerts)
         else:
             self.status_label.text = 'Clocked Out'
             self.clock_button.text = 'Clock In'
             self.clock_button.background_color = self.config.ui.clock_in_color
-    
-    def toggle_clock(self, instance):
-        if self.db_manager.is_clocked_in(self.employee.id):
-            self.clock_out()
-        else:
-            self.clock_in()
         
-        self.update_status()
+        self.status_label.color = ALERT_COLOR if current_session and self.alerts else [1, 1, 1, 1]
     
-    def clock_in(self):
-        try:
-            record_id = self.db_manager.clock_in(self.employee.id)
-            print(f"{self.employee.name} clocked in at {datetime.datetime.now().strftime('%H:%M:%S')}")
-        except Exception as e:
-            self.show_error_popup(f"Failed to clock in: {str(e)}")
+    def render_alerts(self, alerts):
+        """Show the employee's current break reminder / overtime alerts (an empty list clears them)"""
+        self.alerts = alerts
+        if self.pending_taps == 0:
+            self.update_status()
     
-    def clock_out(self):
+    def toggle_clock(self, instance):
+        tap_time = datetime.datetime.now()
         try:
-            success = self.db_manager.clock_out(self.employee.id)
-            if success:
-                print(f"{self.employee.name} clocked out at {datetime.datetime.now().strftime('%H:%M:%S')}")
-            else:
-                self.show_error_popup("No active clock-in session found")
+            future = self.tap_writer.toggle(self.employee.id)
         except Exception as e:
-            self.show_error_popup(f"Failed to clock out: {str(e)}")
+            self.show_error_popup(f"Failed to record tap: {str(e)}")
+            return
+        
+        # The tap is journaled, so show the expected state right away from the row's own
+        # state; the writer decides in/out inside its transaction and the result is rendered
+        clocking_in = not self.is_clocked_in
+        print(f"{self.employee.name} clocked {'in' if clocking_in else 'out'} at {tap_time.strftime('%H:%M:%S')}")
+        self.pending_taps += 1
+        self.render_status(TimeRecord(None, self.employee.id, tap_time) if clocking_in else None)
+        future.add_done_callback(lambda f: Clock.schedule_once(lambda dt: self.on_tap_applied(f)))
+    
+    def on_tap_applied(self, future):
+        """Runs on the UI thread once the writer has committed (or rejected) a tap"""
+        self.pending_taps -= 1
+        error = future.exception()
+        if error:
+            self.show_error_popup(f"Failed to clock in/out: {str(error)}")
+        
+        # A later tap still in the queue already rendered its own optimistic state
+        if self.pending_taps > 0:
+            return
+        if error:
+            self.update_status()
+            return
+        
+        result = future.result()
+        self.render_status(TimeRecord(result.record_id, self.employee.id, result.clock_in) if result.clocked_in else None)
     
     def show_error_popup(self, message):
         popup = Popup(
@@ -122,9 +153,31 @@ class TimeTrackingApp(App):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.config_manager = Config()
-        self.db_manager = DatabaseManager(self.config_manager.database.db_path)
+        self.db_manager = create_backend(self.config_manager.database)
+        self.tap_writer = TapWriter(
+            self.db_manager,
+            self.config_manager.database.tap_journal_path,
+            group_window_ms=self.config_manager.database.group_commit_ms
+        )
+        self.tap_writer.start()
         self.employee_rows = {}
         
+        self.sync_client = None
+        if self.config_manager.sync.enabled:
+            self.sync_client = SyncClient.from_config(self.db_manager, self.config_manager.sync)
+            self.sync_client.start()
+        
+        # Each open session is closed when it reaches auto_clock_out_hours, keyed by employee
+        self.auto_clock_out = DeadlineScheduler(self.expire_sessions, name='auto-clock-out')
+        # Break reminders and overtime alerts fire from their own deadlines, without polling
+        self.rules = TimeTrackingRules(self.db_manager, self.config_manager)
+        self.notifications = NotificationEngine(self.rules, self.config_manager.notifications, self.on_alerts_changed)
+        self.db_manager.add_session_listener(self.on_session_changed)
+        for employee_id, session in self.db_manager.get_open_sessions().items():
+            self.on_session_changed(employee_id, session)
+        self.auto_clock_out.start()
+        self.notifications.start()
+        
         self.title = self.config_manager.ui.window_title
         
         # Set up fullscreen mode
@@ -180,44 +233,97 @@ class TimeTrackingApp(App):
         
         Clock.schedule_interval(self.update_employee_statuses, 60)
         
-        Clock.schedule_interval(self.auto_clock_out_check, 3600)
+        Clock.schedule_interval(self.archive_check, 3600)
         
         return main_layout
     
     def load_employees(self):
-        employees = self.db_manager.get_employees()
-        
         configured_names = set(self.config_manager.get_employee_names())
-        existing_names = set(emp.name for emp in employees)
-        
-        for name in configured_names - existing_names:
-            self.db_manager.add_employee(name)
+        # Creates any configured employee not yet in the database
+        self.db_manager.get_employee_ids_by_name(configured_names, create_missing=True)
         
-        employees = self.db_manager.get_employees()
-        
-        for employee in employees:
+        for employee, current_session in self.db_manager.get_employee_sessions():
             if employee.name in configured_names:
                 employee_row = EmployeeRow(
                     employee, 
                     self.db_manager, 
-                    self.config_manager
+                    self.config_manager,
+                    self.tap_writer
                 )
+                employee_row.alerts = self.notifications.get_alerts(employee.id)
+                employee_row.render_status(current_session)
                 self.employee_rows[employee.id] = employee_row
                 self.employee_grid.add_widget(employee_row)
     
     def update_employee_statuses(self, dt):
-        for employee_row in self.employee_rows.values():
-            employee_row.update_status()
+        # Pick up writes from other processes (report tools, imports, sync): reloads
+        # the open sessions and reschedules auto clock-outs and alerts through the
+        # session listeners. PRAGMA data_version makes this free when nothing changed.
+        self.db_manager.check_open_sessions()
+        
+        # One query for the whole board
+        for employee, current_session in self.db_manager.get_employee_sessions():
+            employee_row = self.employee_rows.get(employee.id)
+            if employee_row:
+                employee_row.render_status(current_session)
     
-    def auto_clock_out_check(self, dt):
-        def run_auto_clock_out():
-            count = self.db_manager.auto_clock_out_expired_sessions(
-                self.config_manager.time_tracking.auto_clock_out_hours
-            )
-            if count > 0:
-                print(f"Auto-clocked out {count} expired sessions")
+    def on_session_changed(self, employee_id, session):
+        if session:
+            max_duration = datetime.timedelta(hours=self.config_manager.time_tracking.auto_clock_out_hours)
+            self.auto_clock_out.schedule(employee_id, session.clock_in + max_duration)
+        else:
+            self.auto_clock_out.cancel(employee_id)
+        self.notifications.on_session_changed(employee_id, session)
         
-        threading.Thread(target=run_auto_clock_out, daemon=True).start()
+        if self.sync_client:
+            self.sync_client.push_soon()
+    
+    def on_alerts_changed(self, employee_id, alerts):
+        """Runs on the notification or session-changing thread; rows are only touched on the UI thread"""
+        Clock.schedule_once(lambda dt: self.show_alerts(employee_id, alerts))
+    
+    def show_alerts(self, employee_id, alerts):
+        employee_row = self.employee_rows.get(employee_id)
+        if employee_row:
+            employee_row.render_alerts(alerts)
+    
+    def expire_sessions(self, employee_ids):
+        """Runs on the scheduler thread when sessions reach auto_clock_out_hours"""
+        sessions = [self.db_manager.get_current_session(employee_id) for employee_id in employee_ids]
+        closed = self.db_manager.auto_clock_out_sessions(
+            [session.id for session in sessions if session],
+            self.config_manager.time_tracking.auto_clock_out_hours
+        )
+        if closed:
+            print(f"Auto-clocked out {len(closed)} expired sessions: records {[record.id for record in closed]}")
+            affected = {record.employee_id for record in closed}
+            Clock.schedule_once(lambda dt: self.refresh_employee_rows(affected))
+    
+    def refresh_employee_rows(self, employee_ids):
+        for employee_id in employee_ids:
+            employee_row = self.employee_rows.get(employee_id)
+            if employee_row:
+                employee_row.update_status()
+    
+    def archive_check(self, dt):
+        def run_archive():
+            try:
+                archived = self.db_manager.archive_expired_records()
+                if archived > 0:
+                    print(f"Archived {archived} closed time records")
+            finally:
+                # A new thread runs every hour; don't leave its connection open
+                self.db_manager.close_thread_connection()
+        
+        threading.Thread(target=run_archive, daemon=True).start()
+    
+    def on_stop(self):
+        if self.sync_client:
+            self.sync_client.stop(timeout=5)
+        self.auto_clock_out.stop(timeout=5)
+        self.notifications.stop(timeout=5)
+        self.tap_writer.stop(timeout=5)
+        self.db_manager.close()
     
     def show_admin_login(self, instance):
         pin_dialog = PinEntryDialog(
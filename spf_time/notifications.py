@@ -0,0 +1,117 @@
+"""
+Break reminders and overtime alerts for open sessions.
+
+Each alert kind gets one deadline per open session, worked out from the
+session and today's hours, and is raised when that deadline passes. Nothing
+is polled in between: hours are read when a session opens and when an
+overtime deadline comes due, never while waiting.
+"""
+
+import datetime
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, List, Optional
+
+from .business_rules import TimeTrackingRules
+from .database import TimeRecord
+from .scheduler import DeadlineScheduler
+
+BREAK_REMINDER = 'break'
+OVERTIME_ALERT = 'overtime'
+
+
+@dataclass
+class Alert:
+    employee_id: int
+    kind: str
+    message: str
+    raised_at: datetime.datetime
+
+
+class NotificationEngine:
+    """Raises alerts for open sessions at the instant they become due.
+
+    Deadlines are kept in a DeadlineScheduler keyed by (employee_id, kind),
+    so arming or cancelling one is O(log n). A deadline is checked again when
+    it comes due, since an admin edit may have moved it; an overtime
+    deadline that would fall after midnight is replaced by a check at
+    midnight, when today's total starts over. listener(employee_id, alerts)
+    receives the employee's current alerts whenever they change, on the
+    scheduler thread or on the thread that changed the session.
+    """
+
+    def __init__(self, rules: TimeTrackingRules, notifications_config,
+                 listener: Callable[[int, List[Alert]], None]):
+        self.rules = rules
+        self.config = notifications_config
+        self._listener = listener
+        # employee_id -> id of the open session the deadlines belong to
+        self._sessions: Dict[int, int] = {}
+        self._alerts: Dict[int, Dict[str, Alert]] = {}
+        self._lock = threading.Lock()
+        self._scheduler = DeadlineScheduler(self._on_due, name='notifications')
+
+    def start(self):
+        self._scheduler.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._scheduler.stop(timeout)
+
+    def get_alerts(self, employee_id: int) -> List[Alert]:
+        with self._lock:
+            return list(self._alerts.get(employee_id, {}).values())
+
+    def on_session_changed(self, employee_id: int, session: Optional[TimeRecord]):
+        """Session listener: arm the deadlines of a new session, or drop everything once clocked out"""
+        with self._lock:
+            cleared = self._alerts.pop(employee_id, None)
+            if session is None:
+                self._sessions.pop(employee_id, None)
+            else:
+                self._sessions[employee_id] = session.id
+
+        for kind in (BREAK_REMINDER, OVERTIME_ALERT):
+            self._scheduler.cancel((employee_id, kind))
+        if session is not None:
+            if self.config.enable_break_reminders:
+                self._scheduler.schedule((employee_id, BREAK_REMINDER), self.rules.break_reminder_time(session))
+            if self.config.enable_overtime_alerts:
+                # Due at once, so today's hours are read on the scheduler thread rather than here
+                self._scheduler.schedule((employee_id, OVERTIME_ALERT), datetime.datetime.now())
+
+        if cleared:
+            self._listener(employee_id, [])
+
+    def _on_due(self, keys: List[Hashable]):
+        """Runs on the scheduler thread with the (employee_id, kind) keys whose deadline passed"""
+        now = datetime.datetime.now()
+        for employee_id, kind in keys:
+            session = self.rules.db_manager.get_current_session(employee_id)
+            with self._lock:
+                if session is None or self._sessions.get(employee_id) != session.id:
+                    continue
+
+            if kind == BREAK_REMINDER:
+                due = self.rules.break_reminder_time(session)
+                message = 'Break due'
+            else:
+                due = self.rules.overtime_alert_time(employee_id)
+                if due is None:
+                    due = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time.min)
+                message = 'Approaching overtime'
+
+            if due > now:
+                self._scheduler.schedule((employee_id, kind), due)
+                continue
+            self._raise(Alert(employee_id, kind, message, now), session.id)
+
+    def _raise(self, alert: Alert, session_id: int):
+        with self._lock:
+            # The session may have closed while the deadline was being checked
+            if self._sessions.get(alert.employee_id) != session_id:
+                return
+            self._alerts.setdefault(alert.employee_id, {})[alert.kind] = alert
+            alerts = list(self._alerts[alert.employee_id].values())
+
+        print(f"{alert.message} for employee {alert.employee_id} at {alert.raised_at.strftime('%H:%M:%S')}")
+        self._listener(alert.employee_id, alerts)
@@ -6,14 +6,16 @@ Used by both email reports and command-line reporting tool.
 import datetime
 import csv
 import io
-from typing import List, Dict, Tuple
+from typing import List, Dict, Iterable, Iterator, Optional, TextIO, Tuple
 
 from .database import DatabaseManager, TimeRecord
+from .business_rules import SessionSlice, payroll_week_start, split_session
+from .storage import StorageBackend
 from .config import Config
 
 
 class ReportGenerator:
-    def __init__(self, config: Config, db_manager: DatabaseManager):
+    def __init__(self, config: Config, db_manager: StorageBackend):
         self.config = config
         self.db_manager = db_manager
     
@@ -41,10 +43,11 @@ class ReportGenerator:
         """Generate report data for the specified number of complete weeks"""
         start_date, end_date = self.get_previous_complete_weeks_range(num_weeks)
         
-        # Get time records
+        # Get time records, including shifts that started before the period
         records = self.db_manager.get_time_records(
             start_date=start_date,
-            end_date=end_date
+            end_date=end_date,
+            overlapping=True
         )
         
         # Get employee names
@@ -52,50 +55,113 @@ class ReportGenerator:
         
         return records, employees, start_date, end_date
     
-    def generate_csv_report(self, records: List[TimeRecord], employees: Dict[int, str]) -> str:
+    def iter_report_data(self, num_weeks: int) -> Tuple[Iterator[TimeRecord], Dict[int, str], datetime.date, datetime.date]:
+        """Like get_report_data, but records are streamed from the database instead of loaded"""
+        start_date, end_date = self.get_previous_complete_weeks_range(num_weeks)
+        
+        records = self.db_manager.iter_time_records(
+            start_date=start_date,
+            end_date=end_date,
+            overlapping=True
+        )
+        
+        employees = {emp.id: emp.name for emp in self.db_manager.get_employees(active_only=False)}
+        
+        return records, employees, start_date, end_date
+    
+    def get_hours_by_day(self, start_date: datetime.date, end_date: datetime.date) -> Dict[int, Dict[datetime.date, float]]:
+        """Hours per employee per day, from closed payroll period snapshots when they cover the range.
+        
+        Falls back to the live daily_hours rollup while any day of the range is
+        in a period that is not closed yet or was reopened by a later edit.
+        """
+        hours = self.db_manager.get_period_hours(start_date, end_date)
+        if hours is None:
+            hours = self.db_manager.get_daily_hours(start_date, end_date)
+        return hours
+    
+    def generate_csv_report(self, records: Iterable[TimeRecord], employees: Dict[int, str],
+                            start_date: Optional[datetime.date] = None,
+                            end_date: Optional[datetime.date] = None) -> str:
         """Generate CSV report"""
         output = io.StringIO()
+        self.write_csv_report(records, employees, output, start_date, end_date)
+        return output.getvalue()
+    
+    def write_csv_report(self, records: Iterable[TimeRecord], employees: Dict[int, str], output: TextIO,
+                         start_date: Optional[datetime.date] = None,
+                         end_date: Optional[datetime.date] = None):
+        """Write CSV report rows to output as records arrive, without buffering them"""
         writer = csv.writer(output)
         
         # Write header
         writer.writerow(['Employee', 'Date', 'Clock In', 'Clock Out', 'Duration (Hours)'])
         
+        for row in self._session_rows(records, employees, start_date, end_date):
+            writer.writerow(row)
+    
+    def _split_in_range(self, record: TimeRecord, start_date: Optional[datetime.date],
+                        end_date: Optional[datetime.date]) -> Iterator[SessionSlice]:
+        """split_session clipped to start_date through end_date, so rows add up to the range's totals.
+        
+        Totals only count closed sessions, so every piece of an open one is listed as ongoing.
+        """
+        range_start = datetime.datetime.combine(start_date, datetime.time.min) if start_date else None
+        range_end = datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min) if end_date else None
+        for piece in split_session(record, range_start=range_start, range_end=range_end):
+            piece.ongoing = piece.ongoing or record.clock_out is None
+            yield piece
+    
+    def _session_rows(self, records: Iterable[TimeRecord], employees: Dict[int, str],
+                      start_date: Optional[datetime.date] = None,
+                      end_date: Optional[datetime.date] = None) -> Iterator[list]:
+        """Employee, date, clock in, clock out and hours for each record.
+        
+        A shift that crosses midnight gets one row per day, so its hours land
+        on the day they were worked rather than all on the start date. With a
+        range, only the days inside it are listed.
+        """
         for record in records:
             employee_name = employees.get(record.employee_id, 'Unknown')
-            date = record.clock_in.strftime('%Y-%m-%d')
-            clock_in = record.clock_in.strftime('%H:%M:%S')
-            clock_out = record.clock_out.strftime('%H:%M:%S') if record.clock_out else 'Still Clocked In'
-            
-            if record.clock_out:
-                duration = record.clock_out - record.clock_in
-                duration_hours = round(duration.total_seconds() / 3600, 2)
-            else:
-                duration_hours = 'Ongoing'
-            
-            writer.writerow([employee_name, date, clock_in, clock_out, duration_hours])
+            for piece in self._split_in_range(record, start_date, end_date):
+                date = piece.date.strftime('%Y-%m-%d')
+                clock_in = piece.start.strftime('%H:%M:%S')
+                
+                if piece.ongoing:
+                    clock_out = 'Still Clocked In'
+                    duration_hours = 'Ongoing'
+                else:
+                    clock_out = piece.end.strftime('%H:%M:%S')
+                    duration_hours = round(piece.hours, 2)
+                
+                yield [employee_name, date, clock_in, clock_out, duration_hours]
+    
+    def generate_on_site_report(self, moment: datetime.datetime, employees: Dict[int, str]) -> str:
+        """List who was clocked in at a moment, answered from the interval index"""
+        sessions = self.db_manager.get_sessions_at(moment)
+        if not sessions:
+            return f"Nobody was clocked in at {moment.strftime('%Y-%m-%d %H:%M')}."
         
-        return output.getvalue()
+        lines = [f"Clocked in at {moment.strftime('%Y-%m-%d %H:%M')}:"]
+        for session in sessions:
+            employee_name = employees.get(session.employee_id, 'Unknown')
+            clock_out = session.clock_out.strftime('%Y-%m-%d %H:%M') if session.clock_out else 'Still Clocked In'
+            lines.append(f"  {employee_name}: {session.clock_in.strftime('%Y-%m-%d %H:%M')} - {clock_out}")
+        return '\n'.join(lines)
     
-    def generate_ascii_table(self, records: List[TimeRecord], employees: Dict[int, str]) -> str:
+    def generate_ascii_table(self, records: List[TimeRecord], employees: Dict[int, str],
+                             start_date: Optional[datetime.date] = None,
+                             end_date: Optional[datetime.date] = None) -> str:
         """Generate ASCII table report for console output"""
         if not records:
             return "No time records found for the specified period."
         
         # Prepare data rows
         rows = []
-        for record in records:
-            employee_name = employees.get(record.employee_id, 'Unknown')
-            date = record.clock_in.strftime('%Y-%m-%d')
-            clock_in = record.clock_in.strftime('%H:%M:%S')
-            clock_out = record.clock_out.strftime('%H:%M:%S') if record.clock_out else 'Still Clocked In'
-            
-            if record.clock_out:
-                duration = record.clock_out - record.clock_in
-                duration_hours = f"{round(duration.total_seconds() / 3600, 2):.2f}"
-            else:
-                duration_hours = 'Ongoing'
-            
-            rows.append([employee_name, date, clock_in, clock_out, duration_hours])
+        for row in self._session_rows(records, employees, start_date, end_date):
+            if not isinstance(row[4], str):
+                row[4] = f"{row[4]:.2f}"
+            rows.append(row)
         
         # Calculate column widths
         headers = ['Employee', 'Date', 'Clock In', 'Clock Out', 'Duration (Hours)']
@@ -127,7 +193,7 @@ class ReportGenerator:
         result.append(separator)
         
         # Calculate totals by employee
-        employee_totals = self.calculate_employee_totals(records, employees)
+        employee_totals = self.calculate_employee_totals(records, employees, start_date, end_date)
         
         # Add summary
         result.append("")
@@ -141,9 +207,20 @@ class ReportGenerator:
         
         return '\n'.join(result)
     
-    def calculate_employee_totals(self, records: List[TimeRecord], employees: Dict[int, str]) -> Dict[str, float]:
-        """Calculate total hours worked by each employee"""
+    def calculate_employee_totals(self, records: List[TimeRecord], employees: Dict[int, str],
+                                  start_date: Optional[datetime.date] = None,
+                                  end_date: Optional[datetime.date] = None) -> Dict[str, float]:
+        """Calculate total hours worked by each employee.
+        
+        With a date range the totals come from get_hours_by_day instead of the records.
+        """
         employee_totals = {}
+        if start_date and end_date:
+            for employee_id, days in self.get_hours_by_day(start_date, end_date).items():
+                employee_name = employees.get(employee_id, 'Unknown')
+                employee_totals[employee_name] = employee_totals.get(employee_name, 0) + sum(days.values())
+            return employee_totals
+        
         for record in records:
             employee_name = employees.get(record.employee_id, 'Unknown')
             if record.clock_out:
@@ -152,27 +229,29 @@ class ReportGenerator:
                 employee_totals[employee_name] = employee_totals.get(employee_name, 0) + hours
         return employee_totals
     
-    def generate_email_tables(self, records: List[TimeRecord], employees: Dict[int, str]) -> str:
+    def generate_email_tables(self, records: List[TimeRecord], employees: Dict[int, str],
+                              start_date: Optional[datetime.date] = None,
+                              end_date: Optional[datetime.date] = None) -> str:
         """Generate HTML tables for email reports (grouped by employee and week)"""
         if not records:
             return "<p>No time records found for the specified period.</p>"
         
-        # Group records by employee and week
+        # Group records by employee and week; shifts crossing midnight are split per day,
+        # so hours past a payroll week boundary count toward the following week
         employee_weeks = {}
         for record in records:
             employee_name = employees.get(record.employee_id, 'Unknown')
-            # Calculate week start based on work week start day
-            record_date = record.clock_in.date()
-            days_since_start = (record_date.weekday() - self.config.payroll.start_day) % 7
-            week_start = record_date - datetime.timedelta(days=days_since_start)
-            
-            if employee_name not in employee_weeks:
-                employee_weeks[employee_name] = {}
-            
-            if week_start not in employee_weeks[employee_name]:
-                employee_weeks[employee_name][week_start] = []
-            
-            employee_weeks[employee_name][week_start].append(record)
+            for piece in self._split_in_range(record, start_date, end_date):
+                # Calculate week start based on work week start day
+                week_start = payroll_week_start(piece.date, self.config.payroll.start_day)
+                
+                if employee_name not in employee_weeks:
+                    employee_weeks[employee_name] = {}
+                
+                if week_start not in employee_weeks[employee_name]:
+                    employee_weeks[employee_name][week_start] = []
+                
+                employee_weeks[employee_name][week_start].append(piece)
         
         # Generate HTML tables
         html_parts = []
@@ -182,24 +261,24 @@ class ReportGenerator:
             
             for week_start in sorted(employee_weeks[employee_name].keys()):
                 week_end = week_start + datetime.timedelta(days=6)
-                week_records = employee_weeks[employee_name][week_start]
+                week_pieces = employee_weeks[employee_name][week_start]
                 
                 html_parts.append(f"<h4>Week: {week_start.strftime('%Y-%m-%d')} to {week_end.strftime('%Y-%m-%d')}</h4>")
                 html_parts.append("<table border='1' cellpadding='5' cellspacing='0'>")
                 html_parts.append("<tr><th>Date</th><th>Clock In</th><th>Clock Out</th><th>Duration (Hours)</th></tr>")
                 
                 week_total = 0
-                for record in sorted(week_records, key=lambda r: r.clock_in):
-                    date = record.clock_in.strftime('%Y-%m-%d')
-                    clock_in = record.clock_in.strftime('%H:%M:%S')
-                    clock_out = record.clock_out.strftime('%H:%M:%S') if record.clock_out else 'Still Clocked In'
+                for piece in sorted(week_pieces, key=lambda p: p.start):
+                    date = piece.date.strftime('%Y-%m-%d')
+                    clock_in = piece.start.strftime('%H:%M:%S')
                     
-                    if record.clock_out:
-                        duration = record.clock_out - record.clock_in
-                        duration_hours = round(duration.total_seconds() / 3600, 2)
-                        week_total += duration_hours
-                    else:
+                    if piece.ongoing:
+                        clock_out = 'Still Clocked In'
                         duration_hours = 'Ongoing'
+                    else:
+                        clock_out = piece.end.strftime('%H:%M:%S')
+                        duration_hours = round(piece.hours, 2)
+                        week_total += duration_hours
                     
                     html_parts.append(f"<tr><td>{date}</td><td>{clock_in}</td><td>{clock_out}</td><td>{duration_hours}</td></tr>")
                 
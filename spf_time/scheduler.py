@@ -0,0 +1,107 @@
+"""
+Deadline scheduler: runs a handler when keyed deadlines pass.
+Used by the kiosk to auto clock-out each open session exactly when it expires.
+"""
+
+import datetime
+import heapq
+import itertools
+import threading
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class DeadlineScheduler:
+    """One background thread sleeping until the earliest pending deadline.
+
+    Deadlines are kept in a heap. Rescheduling or cancelling a key only
+    updates its entry in a dict; superseded heap entries are dropped when they
+    reach the top, so every operation is O(log n) and nothing is scanned while
+    nobody is due. Keys that come due together are handed to the handler in
+    one call, on the scheduler thread.
+    """
+
+    # Upper bound on a single sleep, so a wall-clock correction (NTP on a Pi
+    # without an RTC) is noticed within this many seconds
+    MAX_SLEEP_SECONDS = 60
+
+    def __init__(self, handler: Callable[[List[Hashable]], None], name: str = 'deadline-scheduler'):
+        self._handler = handler
+        self._heap: List[Tuple[datetime.datetime, int, Hashable]] = []
+        self._pending: Dict[Hashable, Tuple[datetime.datetime, int]] = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def schedule(self, key: Hashable, deadline: datetime.datetime):
+        """Run the handler for key at deadline, replacing any earlier deadline for it"""
+        with self._condition:
+            seq = next(self._sequence)
+            self._pending[key] = (deadline, seq)
+            heapq.heappush(self._heap, (deadline, seq, key))
+            # Only wake the thread if this is now the earliest deadline
+            if self._heap[0][1] == seq:
+                self._condition.notify()
+
+    def cancel(self, key: Hashable):
+        with self._condition:
+            self._pending.pop(key, None)
+
+    def get_deadline(self, key: Hashable) -> Optional[datetime.datetime]:
+        with self._condition:
+            entry = self._pending.get(key)
+            return entry[0] if entry else None
+
+    def stop(self, timeout: Optional[float] = None):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                due = self._wait_for_due()
+                if due is None:
+                    return
+
+            # The handler runs without the lock so it may schedule or cancel keys
+            try:
+                self._handler(due)
+            except Exception as e:
+                print(f"Deadline handler failed for {due}: {e}")
+
+    def _wait_for_due(self) -> Optional[List[Hashable]]:
+        """Block until at least one key is due and pop all due keys; None once stopped"""
+        while not self._stopped:
+            self._drop_superseded()
+            if not self._heap:
+                self._condition.wait()
+                continue
+
+            now = datetime.datetime.now()
+            delay = (self._heap[0][0] - now).total_seconds()
+            if delay > 0:
+                self._condition.wait(min(delay, self.MAX_SLEEP_SECONDS))
+                continue
+
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                deadline, seq, key = heapq.heappop(self._heap)
+                if self._pending.get(key) == (deadline, seq):
+                    del self._pending[key]
+                    due.append(key)
+            if due:
+                return due
+        return None
+
+    def _drop_superseded(self):
+        while self._heap:
+            deadline, seq, key = self._heap[0]
+            if self._pending.get(key) == (deadline, seq):
+                return
+            heapq.heappop(self._heap)
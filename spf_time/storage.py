@@ -0,0 +1,677 @@
+"""
+Storage backends.
+
+StorageBackend is the interface the kiosk, admin panel, reports, rules and
+sync code use. DatabaseManager (SQLite) is the production backend;
+MemoryBackend keeps everything in dicts and sorted lists for benchmarks,
+simulations and tests, so millions of clock events are not bound by disk I/O.
+Select one with [database] backend in settings.toml.
+"""
+
+import bisect
+import dataclasses
+import datetime
+import itertools
+import sqlite3
+import threading
+import uuid
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Protocol, Set, Tuple, runtime_checkable
+
+from .database import (Change, ClockToggle, DatabaseManager, Employee, PayrollPeriod, TimeRecord,
+                       _period_hash, _split_by_day)
+from .interval_index import IntervalIndex
+
+
+@runtime_checkable
+class StorageBackend(Protocol):
+    """Everything the application needs from storage.
+
+    Returned records are fresh objects: callers may modify them without
+    affecting stored data. Backend-specific maintenance (backups, snapshots,
+    archiving to files) stays on DatabaseManager.
+    """
+
+    def close(self): ...
+    def close_thread_connection(self): ...
+
+    # Employees
+    def add_employee(self, name: str) -> int: ...
+    def get_employees(self, active_only: bool = True) -> List[Employee]: ...
+    def get_employee(self, employee_id: int) -> Optional[Employee]: ...
+    def get_employee_by_name(self, name: str) -> Optional[Employee]: ...
+    def get_or_create_employee(self, name: str) -> int: ...
+    def set_employee_active(self, employee_id: int, is_active: bool) -> bool: ...
+    def get_employee_ids_by_name(self, names: Iterable[str], create_missing: bool = False) -> Dict[str, int]: ...
+    def get_employee_sessions(self, active_only: bool = True) -> List[Tuple[Employee, Optional[TimeRecord]]]: ...
+
+    # Clocking and open sessions
+    def clock_in(self, employee_id: int, clock_in_time: Optional[datetime.datetime] = None) -> int: ...
+    def clock_out(self, employee_id: int, clock_out_time: Optional[datetime.datetime] = None) -> bool: ...
+    def toggle_clock(self, employee_id: int, tap_time: Optional[datetime.datetime] = None) -> ClockToggle: ...
+    def is_clocked_in(self, employee_id: int) -> bool: ...
+    def get_current_session(self, employee_id: int) -> Optional[TimeRecord]: ...
+    def get_open_sessions(self) -> Dict[int, TimeRecord]: ...
+    def get_last_clock_out(self, employee_id: int) -> Optional[datetime.datetime]: ...
+    def check_open_sessions(self) -> bool: ...
+    def add_session_listener(self, listener: Callable[[int, Optional[TimeRecord]], None]): ...
+    def auto_clock_out_sessions(self, record_ids: Iterable[int], max_hours: int = 12) -> List[TimeRecord]: ...
+    def get_last_applied_tap_seq(self) -> int: ...
+    def _apply_taps(self, taps: list, last_seq: int) -> list: ...
+
+    # Time records
+    def get_time_records(self, employee_id: Optional[int] = None,
+                         start_date: Optional[datetime.date] = None,
+                         end_date: Optional[datetime.date] = None,
+                         overlapping: bool = False) -> List[TimeRecord]: ...
+    def iter_time_records(self, employee_id: Optional[int] = None,
+                          start_date: Optional[datetime.date] = None,
+                          end_date: Optional[datetime.date] = None,
+                          chunk_size: int = 500,
+                          descending: bool = True,
+                          overlapping: bool = False) -> Iterator[TimeRecord]: ...
+    def get_time_records_by_ids(self, record_ids: Iterable[int]) -> List[TimeRecord]: ...
+    def add_time_record(self, employee_id: int, clock_in: datetime.datetime,
+                        clock_out: Optional[datetime.datetime] = None) -> int: ...
+    def bulk_insert_time_records(self, records: Iterable[Tuple[int, datetime.datetime, Optional[datetime.datetime]]]) -> int: ...
+    def update_time_record(self, record_id: int, clock_in: datetime.datetime,
+                           clock_out: Optional[datetime.datetime] = None) -> bool: ...
+    def delete_time_record(self, record_id: int) -> bool: ...
+    def archive_expired_records(self) -> int: ...
+    def get_archived_record_ids(self, record_ids: Iterable[int]) -> Set[int]: ...
+    def get_sessions_at(self, moment: datetime.datetime) -> List[TimeRecord]: ...
+    def get_sessions_between(self, start: datetime.datetime, end: datetime.datetime,
+                             employee_id: Optional[int] = None) -> List[TimeRecord]: ...
+
+    # Daily hours rollup
+    def get_daily_hours(self, start_date: datetime.date, end_date: datetime.date,
+                        employee_id: Optional[int] = None) -> Dict[int, Dict[datetime.date, float]]: ...
+    def rebuild_daily_hours(self) -> int: ...
+
+    # Payroll periods
+    def close_payroll_period(self, start_date: datetime.date, end_date: datetime.date) -> PayrollPeriod: ...
+    def get_payroll_periods(self, start_date: Optional[datetime.date] = None,
+                            end_date: Optional[datetime.date] = None) -> List[PayrollPeriod]: ...
+    def get_period_hours(self, start_date: datetime.date,
+                         end_date: datetime.date) -> Optional[Dict[int, Dict[datetime.date, float]]]: ...
+
+    # Change feed and sync
+    def get_change_seq(self) -> int: ...
+    def changes_since(self, seq: int, limit: Optional[int] = None) -> List[Change]: ...
+    def get_record_uids(self, record_ids: Iterable[int]) -> Dict[int, str]: ...
+    def get_sync_seq(self, hub_url: str) -> int: ...
+    def set_sync_seq(self, hub_url: str, seq: int): ...
+    def merge_records(self, records: Iterable[Tuple[str, int, Optional[datetime.datetime], Optional[datetime.datetime], bool]]) -> int: ...
+
+
+class MemoryBackend:
+    """Non-persistent StorageBackend held entirely in memory.
+
+    Records live in a dict by id, with (clock_in, id) keys kept in sorted lists
+    overall and per employee, so range scans are two bisects plus a slice.
+    Daily hours, the change feed and open sessions are maintained the same way
+    as in SQLite. One lock serializes all access. Constraint violations raise
+    sqlite3.IntegrityError, as they would from SQLite, so callers such as
+    TapWriter handle both backends alike.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._employees: Dict[int, Employee] = {}
+        self._employee_ids_by_name: Dict[str, int] = {}
+        self._employee_seq = itertools.count(1)
+
+        self._records: Dict[int, TimeRecord] = {}
+        self._record_seq = itertools.count(1)
+        self._uids: Dict[int, str] = {}
+        self._ids_by_uid: Dict[str, int] = {}
+        self._index: List[Tuple[datetime.datetime, int]] = []
+        self._employee_index: Dict[int, List[Tuple[datetime.datetime, int]]] = {}
+        self._intervals = IntervalIndex()
+
+        self._open_ids: Dict[int, Set[int]] = {}
+        self._open_sessions: Dict[int, TimeRecord] = {}
+        # Latest clock_out per employee, filled on first lookup and kept exact on every write
+        self._last_clock_outs: Dict[int, Optional[datetime.datetime]] = {}
+        self._session_listeners: List[Callable[[int, Optional[TimeRecord]], None]] = []
+
+        self._daily_seconds: Dict[datetime.date, Dict[int, float]] = {}
+        self._periods: Dict[datetime.date, PayrollPeriod] = {}
+        # Each day of a closed period -> the period's start date, and its frozen seconds per employee
+        self._period_starts: Dict[datetime.date, datetime.date] = {}
+        self._period_seconds: Dict[datetime.date, Dict[int, float]] = {}
+        self._period_reopens: List[Tuple[datetime.date, int, datetime.datetime, str]] = []
+        self._changes: List[Change] = []
+        self._sync_seqs: Dict[str, int] = {}
+        self._last_tap_seq = 0
+
+    def close(self):
+        pass
+
+    def close_thread_connection(self):
+        pass
+
+    # Employees
+
+    def add_employee(self, name: str) -> int:
+        with self._lock:
+            if name in self._employee_ids_by_name:
+                raise ValueError(f"Employee already exists: {name}")
+            employee_id = next(self._employee_seq)
+            self._employees[employee_id] = Employee(id=employee_id, name=name, is_active=True)
+            self._employee_ids_by_name[name] = employee_id
+            return employee_id
+
+    def get_employees(self, active_only: bool = True) -> List[Employee]:
+        with self._lock:
+            return [dataclasses.replace(e) for e in self._employees.values() if e.is_active or not active_only]
+
+    def get_employee(self, employee_id: int) -> Optional[Employee]:
+        with self._lock:
+            employee = self._employees.get(employee_id)
+            return dataclasses.replace(employee) if employee else None
+
+    def get_employee_by_name(self, name: str) -> Optional[Employee]:
+        with self._lock:
+            employee_id = self._employee_ids_by_name.get(name)
+            return dataclasses.replace(self._employees[employee_id]) if employee_id else None
+
+    def get_or_create_employee(self, name: str) -> int:
+        with self._lock:
+            return self._employee_ids_by_name.get(name) or self.add_employee(name)
+
+    def set_employee_active(self, employee_id: int, is_active: bool) -> bool:
+        with self._lock:
+            employee = self._employees.get(employee_id)
+            if employee is None:
+                return False
+            employee.is_active = is_active
+            return True
+
+    def get_employee_ids_by_name(self, names: Iterable[str], create_missing: bool = False) -> Dict[str, int]:
+        with self._lock:
+            ids = {}
+            for name in set(names):
+                if name not in self._employee_ids_by_name and create_missing:
+                    self.add_employee(name)
+                if name in self._employee_ids_by_name:
+                    ids[name] = self._employee_ids_by_name[name]
+            return ids
+
+    def get_employee_sessions(self, active_only: bool = True) -> List[Tuple[Employee, Optional[TimeRecord]]]:
+        with self._lock:
+            return [(employee, self.get_current_session(employee.id)) for employee in self.get_employees(active_only)]
+
+    # Clocking and open sessions
+
+    def clock_in(self, employee_id: int, clock_in_time: Optional[datetime.datetime] = None) -> int:
+        with self._lock:
+            return self._insert(employee_id, clock_in_time or datetime.datetime.now(), None)
+
+    def clock_out(self, employee_id: int, clock_out_time: Optional[datetime.datetime] = None) -> bool:
+        with self._lock:
+            session = self._open_sessions.get(employee_id)
+            if session is None:
+                return False
+            self._set_times(session.id, session.clock_in, clock_out_time or datetime.datetime.now())
+            return True
+
+    def toggle_clock(self, employee_id: int, tap_time: Optional[datetime.datetime] = None) -> ClockToggle:
+        tap_time = tap_time or datetime.datetime.now()
+        with self._lock:
+            session = self._open_sessions.get(employee_id)
+            if session is None:
+                return ClockToggle(self._insert(employee_id, tap_time, None), True, tap_time)
+            self._set_times(session.id, session.clock_in, tap_time)
+            return ClockToggle(session.id, False, session.clock_in, tap_time)
+
+    def is_clocked_in(self, employee_id: int) -> bool:
+        return employee_id in self._open_sessions
+
+    def get_current_session(self, employee_id: int) -> Optional[TimeRecord]:
+        with self._lock:
+            session = self._open_sessions.get(employee_id)
+            return self._copy(session) if session else None
+
+    def get_open_sessions(self) -> Dict[int, TimeRecord]:
+        with self._lock:
+            return {employee_id: self._copy(session) for employee_id, session in self._open_sessions.items()}
+
+    def get_last_clock_out(self, employee_id: int) -> Optional[datetime.datetime]:
+        with self._lock:
+            if employee_id not in self._last_clock_outs:
+                self._last_clock_outs[employee_id] = max(
+                    (self._records[record_id].clock_out for _, record_id in self._employee_index.get(employee_id, ())
+                     if self._records[record_id].clock_out is not None),
+                    default=None
+                )
+            return self._last_clock_outs[employee_id]
+
+    def check_open_sessions(self) -> bool:
+        # Nothing outside this object can write to it
+        return True
+
+    def add_session_listener(self, listener: Callable[[int, Optional[TimeRecord]], None]):
+        self._session_listeners.append(listener)
+
+    def auto_clock_out_sessions(self, record_ids: Iterable[int], max_hours: int = 12) -> List[TimeRecord]:
+        now = datetime.datetime.now()
+        max_duration = datetime.timedelta(hours=max_hours)
+        closed = []
+        with self._lock:
+            for record_id in record_ids:
+                record = self._records.get(record_id)
+                if record is None or record.clock_out is not None:
+                    continue
+                deadline = record.clock_in + max_duration
+                if deadline > now:
+                    continue
+                self._set_times(record_id, record.clock_in, deadline)
+                closed.append(self._copy(record))
+        return closed
+
+    def get_last_applied_tap_seq(self) -> int:
+        return self._last_tap_seq
+
+    def _apply_taps(self, taps: list, last_seq: int) -> list:
+        """TapWriter entry point: apply a batch of taps, returning one result per tap.
+
+        Like the SQLite transaction, a batch is all or nothing: it is checked
+        before anything changes, so a bad tap leaves no earlier tap applied.
+        """
+        with self._lock:
+            clocked_in = {}
+            for tap in taps:
+                is_open = clocked_in.get(tap.employee_id, tap.employee_id in self._open_sessions)
+                if tap.action == 'clock_in' and is_open:
+                    raise sqlite3.IntegrityError(f"employee {tap.employee_id} already has an open session")
+                clocked_in[tap.employee_id] = not is_open if tap.action == 'toggle' else tap.action == 'clock_in'
+
+            results = []
+            for tap in taps:
+                if tap.action == 'toggle':
+                    results.append(self.toggle_clock(tap.employee_id, tap.timestamp))
+                elif tap.action == 'clock_in':
+                    results.append(self.clock_in(tap.employee_id, tap.timestamp))
+                else:
+                    results.append(self.clock_out(tap.employee_id, tap.timestamp))
+            self._last_tap_seq = last_seq
+            return results
+
+    # Time records
+
+    def get_time_records(self, employee_id: Optional[int] = None,
+                         start_date: Optional[datetime.date] = None,
+                         end_date: Optional[datetime.date] = None,
+                         overlapping: bool = False) -> List[TimeRecord]:
+        return list(self.iter_time_records(employee_id, start_date, end_date, overlapping=overlapping))
+
+    def iter_time_records(self, employee_id: Optional[int] = None,
+                          start_date: Optional[datetime.date] = None,
+                          end_date: Optional[datetime.date] = None,
+                          chunk_size: int = 500,
+                          descending: bool = True,
+                          overlapping: bool = False) -> Iterator[TimeRecord]:
+        """Records in clock_in order; the matching keys are captured up front, records are copied lazily"""
+        with self._lock:
+            end = datetime.datetime.max
+            if end_date:
+                end = datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min)
+            if start_date and overlapping:
+                start = datetime.datetime.combine(start_date, datetime.time.min)
+                keys = [(record.clock_in, record.id) for record in self._intervals.between(start, end, employee_id)]
+            else:
+                index = self._employee_index.get(employee_id, []) if employee_id else self._index
+                lo, hi = 0, len(index)
+                if start_date:
+                    lo = bisect.bisect_left(index, (datetime.datetime.combine(start_date, datetime.time.min),))
+                if end_date:
+                    hi = bisect.bisect_left(index, (end,))
+                keys = index[lo:hi]
+
+        if descending:
+            keys.reverse()
+        for i in range(0, len(keys), chunk_size):
+            with self._lock:
+                chunk = [self._copy(self._records[record_id])
+                         for _, record_id in keys[i:i + chunk_size] if record_id in self._records]
+            yield from chunk
+
+    def get_time_records_by_ids(self, record_ids: Iterable[int]) -> List[TimeRecord]:
+        with self._lock:
+            return [self._copy(self._records[record_id]) for record_id in record_ids if record_id in self._records]
+
+    def add_time_record(self, employee_id: int, clock_in: datetime.datetime,
+                        clock_out: Optional[datetime.datetime] = None) -> int:
+        with self._lock:
+            self._intervals.check(employee_id, clock_in, clock_out)
+            return self._insert(employee_id, clock_in, clock_out)
+
+    def bulk_insert_time_records(self, records: Iterable[Tuple[int, datetime.datetime, Optional[datetime.datetime]]]) -> int:
+        # Read the whole input before storing anything, so a failing generator stores nothing
+        rows = list(records)
+        with self._lock:
+            open_employee_ids = [employee_id for employee_id, _, clock_out in rows if clock_out is None]
+            if (len(set(open_employee_ids)) < len(open_employee_ids)
+                    or any(self._open_ids.get(employee_id) for employee_id in open_employee_ids)):
+                raise sqlite3.IntegrityError("an employee can only have one open session")
+            batch = IntervalIndex()
+            for employee_id, clock_in, clock_out in rows:
+                self._intervals.check(employee_id, clock_in, clock_out)
+                batch.check(employee_id, clock_in, clock_out)
+                batch.add(TimeRecord(-len(batch) - 1, employee_id, clock_in, clock_out))
+            for employee_id, clock_in, clock_out in rows:
+                self._insert(employee_id, clock_in, clock_out)
+        return len(rows)
+
+    def update_time_record(self, record_id: int, clock_in: datetime.datetime,
+                           clock_out: Optional[datetime.datetime] = None) -> bool:
+        with self._lock:
+            if record_id not in self._records:
+                return False
+            self._intervals.check(self._records[record_id].employee_id, clock_in, clock_out, record_id)
+            self._set_times(record_id, clock_in, clock_out)
+            return True
+
+    def delete_time_record(self, record_id: int) -> bool:
+        with self._lock:
+            record = self._records.get(record_id)
+            if record is None:
+                return False
+            self._log_change(record_id, 'delete')
+            self._add_daily_seconds(record, sign=-1)
+            self._update_last_clock_out(record.employee_id, record.clock_out, None)
+            self._unindex(record)
+            del self._records[record_id]
+            del self._ids_by_uid[self._uids.pop(record_id)]
+            self._refresh_open_session(record.employee_id)
+            return True
+
+    def archive_expired_records(self) -> int:
+        # Everything is in memory already; there is no colder tier to move records to
+        return 0
+
+    def get_archived_record_ids(self, record_ids: Iterable[int]) -> Set[int]:
+        return set()
+
+    def get_sessions_at(self, moment: datetime.datetime) -> List[TimeRecord]:
+        with self._lock:
+            return self._intervals.at(moment)
+
+    def get_sessions_between(self, start: datetime.datetime, end: datetime.datetime,
+                             employee_id: Optional[int] = None) -> List[TimeRecord]:
+        with self._lock:
+            return self._intervals.between(start, end, employee_id)
+
+    # Daily hours rollup
+
+    def get_daily_hours(self, start_date: datetime.date, end_date: datetime.date,
+                        employee_id: Optional[int] = None) -> Dict[int, Dict[datetime.date, float]]:
+        hours = {}
+        with self._lock:
+            day = start_date
+            while day <= end_date:
+                for emp_id, seconds in self._daily_seconds.get(day, {}).items():
+                    if not employee_id or emp_id == employee_id:
+                        hours.setdefault(emp_id, {})[day] = seconds / 3600
+                day += datetime.timedelta(days=1)
+        return hours
+
+    def rebuild_daily_hours(self) -> int:
+        with self._lock:
+            self._daily_seconds = {}
+            for record in self._records.values():
+                self._add_daily_seconds(record, reopen=False)
+            return sum(len(employees) for employees in self._daily_seconds.values())
+
+    # Payroll periods
+
+    def close_payroll_period(self, start_date: datetime.date, end_date: datetime.date) -> PayrollPeriod:
+        if end_date < start_date:
+            raise ValueError("Payroll period ends before it starts")
+        if end_date >= datetime.date.today():
+            raise ValueError(f"Payroll period ending {end_date.isoformat()} has not finished yet")
+
+        with self._lock:
+            for period in self._periods.values():
+                if period.start_date <= end_date and period.end_date >= start_date:
+                    if (period.start_date, period.end_date) != (start_date, end_date):
+                        raise ValueError(f"Overlaps the payroll period {period.start_date.isoformat()} "
+                                         f"to {period.end_date.isoformat()}")
+                    if not period.stale:
+                        return dataclasses.replace(period)
+
+            period_end = datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min)
+            open_sessions = [session for session in self._open_sessions.values() if session.clock_in < period_end]
+            if open_sessions:
+                session = min(open_sessions, key=lambda session: session.clock_in)
+                raise ValueError(f"Employee {session.employee_id} is still clocked in since "
+                                 f"{session.clock_in.strftime('%Y-%m-%d %H:%M')}")
+
+            rows = []
+            day = start_date
+            while day <= end_date:
+                self._period_seconds[day] = dict(self._daily_seconds.get(day, {}))
+                rows.extend((employee_id, day, seconds) for employee_id, seconds in self._period_seconds[day].items())
+                self._period_starts[day] = start_date
+                day += datetime.timedelta(days=1)
+
+            previous = self._periods.get(start_date)
+            period = PayrollPeriod(start_date, end_date, datetime.datetime.now().replace(microsecond=0),
+                                   _period_hash(start_date, end_date, rows),
+                                   reopen_count=previous.reopen_count if previous else 0)
+            self._periods[start_date] = period
+            return dataclasses.replace(period)
+
+    def get_payroll_periods(self, start_date: Optional[datetime.date] = None,
+                            end_date: Optional[datetime.date] = None) -> List[PayrollPeriod]:
+        with self._lock:
+            return [dataclasses.replace(period) for _, period in sorted(self._periods.items())
+                    if (not start_date or period.end_date >= start_date)
+                    and (not end_date or period.start_date <= end_date)]
+
+    def get_period_hours(self, start_date: datetime.date,
+                         end_date: datetime.date) -> Optional[Dict[int, Dict[datetime.date, float]]]:
+        hours = {}
+        with self._lock:
+            day = start_date
+            while day <= end_date:
+                period_start = self._period_starts.get(day)
+                if period_start is None or self._periods[period_start].stale:
+                    return None
+                for emp_id, seconds in self._period_seconds[day].items():
+                    hours.setdefault(emp_id, {})[day] = seconds / 3600
+                day += datetime.timedelta(days=1)
+        return hours
+
+    # Change feed and sync
+
+    def get_change_seq(self) -> int:
+        return len(self._changes)
+
+    def changes_since(self, seq: int, limit: Optional[int] = None) -> List[Change]:
+        # seq n is stored at index n - 1
+        with self._lock:
+            end = seq + limit if limit else len(self._changes)
+            return [Change(c.seq, c.record_id, c.operation, c.uid) for c in self._changes[seq:end]]
+
+    def get_record_uids(self, record_ids: Iterable[int]) -> Dict[int, str]:
+        with self._lock:
+            return {record_id: self._uids[record_id] for record_id in record_ids if record_id in self._uids}
+
+    def get_sync_seq(self, hub_url: str) -> int:
+        return self._sync_seqs.get(hub_url, 0)
+
+    def set_sync_seq(self, hub_url: str, seq: int):
+        self._sync_seqs[hub_url] = seq
+
+    def merge_records(self, records: Iterable[Tuple[str, int, Optional[datetime.datetime], Optional[datetime.datetime], bool]]) -> int:
+        changed = 0
+        with self._lock:
+            for uid, employee_id, clock_in, clock_out, deleted in records:
+                record_id = self._ids_by_uid.get(uid)
+                if deleted:
+                    if record_id is not None:
+                        self.delete_time_record(record_id)
+                        changed += 1
+                    continue
+
+                if clock_out is None:
+                    clock_out = self._resolve_open_session(record_id, employee_id, clock_in)
+
+                if record_id is None:
+                    self._insert(employee_id, clock_in, clock_out, uid)
+                else:
+                    old = self._records[record_id]
+                    if (old.employee_id, old.clock_in, old.clock_out) == (employee_id, clock_in, clock_out):
+                        continue
+                    self._set_times(record_id, clock_in, clock_out, employee_id)
+                changed += 1
+        return changed
+
+    # Internals; callers hold self._lock
+
+    def _resolve_open_session(self, record_id: Optional[int], employee_id: int,
+                              clock_in: datetime.datetime) -> Optional[datetime.datetime]:
+        """Same rule as DatabaseManager: the later clock-in stays open, the earlier session closes when it started"""
+        for other_id in list(self._open_ids.get(employee_id, ())):
+            if other_id == record_id:
+                continue
+            other = self._records[other_id]
+            if other.clock_in > clock_in:
+                return other.clock_in
+            self._set_times(other_id, other.clock_in, clock_in)
+        return None
+
+    def _check_open_session(self, record_id: Optional[int], employee_id: int):
+        if any(other_id != record_id for other_id in self._open_ids.get(employee_id, ())):
+            raise sqlite3.IntegrityError(f"employee {employee_id} already has an open session")
+
+    def _copy(self, record: TimeRecord) -> TimeRecord:
+        return TimeRecord(record.id, record.employee_id, record.clock_in, record.clock_out, record.created_at)
+
+    def _insert(self, employee_id: int, clock_in: datetime.datetime,
+                clock_out: Optional[datetime.datetime], uid: Optional[str] = None) -> int:
+        if clock_out is None:
+            self._check_open_session(None, employee_id)
+        record_id = next(self._record_seq)
+        record = TimeRecord(record_id, employee_id, clock_in, clock_out, datetime.datetime.now())
+        self._records[record_id] = record
+        uid = uid or uuid.uuid4().hex
+        self._uids[record_id] = uid
+        self._ids_by_uid[uid] = record_id
+        self._reindex(record)
+        self._add_daily_seconds(record)
+        self._update_last_clock_out(employee_id, None, clock_out)
+        self._log_change(record_id, 'insert')
+        if clock_out is None:
+            self._refresh_open_session(employee_id)
+        return record_id
+
+    def _set_times(self, record_id: int, clock_in: datetime.datetime, clock_out: Optional[datetime.datetime],
+                   employee_id: Optional[int] = None):
+        record = self._records[record_id]
+        old_employee_id = record.employee_id
+        if clock_out is None:
+            self._check_open_session(record_id, employee_id or old_employee_id)
+        old_seconds = self._session_seconds(record)
+        self._add_daily_seconds(record, sign=-1, reopen=False)
+        self._update_last_clock_out(old_employee_id, record.clock_out, None)
+        self._unindex(record)
+        record.employee_id = employee_id or old_employee_id
+        record.clock_in = clock_in
+        record.clock_out = clock_out
+        self._reindex(record)
+        self._add_daily_seconds(record, reopen=False)
+        # Like SQLite, only days whose hours actually changed reopen their payroll period
+        new_seconds = self._session_seconds(record)
+        for key in sorted(old_seconds.keys() | new_seconds.keys()):
+            if abs(new_seconds.get(key, 0.0) - old_seconds.get(key, 0.0)) >= 0.001:
+                self._reopen_period(key[1], key[0])
+        self._update_last_clock_out(record.employee_id, None, clock_out)
+        self._log_change(record_id, 'update')
+        for affected in {old_employee_id, record.employee_id}:
+            self._refresh_open_session(affected)
+
+    def _reindex(self, record: TimeRecord):
+        key = (record.clock_in, record.id)
+        bisect.insort(self._index, key)
+        bisect.insort(self._employee_index.setdefault(record.employee_id, []), key)
+        self._intervals.add(record)
+        if record.clock_out is None:
+            self._open_ids.setdefault(record.employee_id, set()).add(record.id)
+
+    def _unindex(self, record: TimeRecord):
+        key = (record.clock_in, record.id)
+        for index in (self._index, self._employee_index[record.employee_id]):
+            del index[bisect.bisect_left(index, key)]
+        self._intervals.remove(record.id)
+        self._open_ids.get(record.employee_id, set()).discard(record.id)
+
+    def _add_daily_seconds(self, record: TimeRecord, sign: int = 1, reopen: bool = True):
+        if record.clock_out is None:
+            return
+        for day, seconds in _split_by_day(record.clock_in, record.clock_out):
+            if reopen:
+                self._reopen_period(day, record.employee_id)
+            employees = self._daily_seconds.setdefault(day, {})
+            total = employees.get(record.employee_id, 0.0) + sign * seconds
+            if total < 0.001:
+                employees.pop(record.employee_id, None)
+            else:
+                employees[record.employee_id] = total
+
+    def _session_seconds(self, record: TimeRecord) -> Dict[Tuple[int, datetime.date], float]:
+        if record.clock_out is None:
+            return {}
+        return {(record.employee_id, day): seconds for day, seconds in _split_by_day(record.clock_in, record.clock_out)}
+
+    def _reopen_period(self, day: datetime.date, employee_id: int):
+        """Mark the closed payroll period holding day stale, as SQLite does for every write touching it"""
+        period = self._periods.get(self._period_starts.get(day))
+        if period is None or period.stale:
+            return
+        period.stale = True
+        period.reopen_count += 1
+        self._period_reopens.append((period.start_date, employee_id, datetime.datetime.now(), period.content_hash))
+
+    def _update_last_clock_out(self, employee_id: int, old: Optional[datetime.datetime],
+                               new: Optional[datetime.datetime]):
+        """Keep a cached last clock-out exact when one of the employee's clock_outs changes from old to new"""
+        if employee_id not in self._last_clock_outs:
+            return
+        cached = self._last_clock_outs[employee_id]
+        if new is not None and (cached is None or new >= cached):
+            self._last_clock_outs[employee_id] = new
+        elif old is not None and old == cached:
+            # The latest clock-out was removed or moved earlier; rescan on the next lookup
+            del self._last_clock_outs[employee_id]
+
+    def _log_change(self, record_id: int, operation: str):
+        self._changes.append(Change(len(self._changes) + 1, record_id, operation, self._uids.get(record_id)))
+
+    def _refresh_open_session(self, employee_id: int):
+        """Recompute one employee's open session and notify listeners if it changed"""
+        latest = max((self._records[record_id] for record_id in self._open_ids.get(employee_id, ())),
+                     key=lambda record: (record.clock_in, record.id), default=None)
+        current = self._open_sessions.get(employee_id)
+        if latest is None:
+            if current is None:
+                return
+            del self._open_sessions[employee_id]
+        else:
+            self._open_sessions[employee_id] = latest
+            if current is not None and current.id == latest.id:
+                return
+
+        session = self._copy(latest) if latest else None
+        for listener in self._session_listeners:
+            listener(employee_id, session)
+
+
+def create_backend(database_config) -> StorageBackend:
+    """Create the backend selected by [database] backend in settings.toml"""
+    if database_config.backend == 'sqlite':
+        return DatabaseManager.from_config(database_config)
+    if database_config.backend == 'memory':
+        return MemoryBackend()
+    raise ValueError(f"Unknown storage backend: {database_config.backend}")
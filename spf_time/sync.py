@@ -0,0 +1,289 @@
+"""
+Offline-first sync from kiosks to a central hub.
+
+Each kiosk pushes the records changed since its last acknowledged change_log
+seq as a deflate-compressed JSON batch. Records are identified by their uid,
+so the hub can merge batches from many kiosks and replays are harmless. The
+hub is a small HTTP server that can run locally as a stand-in for testing:
+
+    python -m spf_time.sync hub --db hub.db --port 8765
+    python -m spf_time.sync push --hub http://localhost:8765
+"""
+
+import argparse
+import datetime
+import json
+import random
+import sqlite3
+import sys
+import threading
+import urllib.error
+import urllib.request
+import zlib
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Dict, List, Optional
+
+from .database import DatabaseManager
+
+
+class SyncError(Exception):
+    pass
+
+
+class SyncClient:
+    """Background pusher for one kiosk.
+
+    Progress is the last change_log seq the hub acknowledged, stored in the
+    kiosk database, so each push costs the number of changes since then no
+    matter how large the database is. While the hub is unreachable the kiosk
+    keeps recording locally and retries with exponential backoff.
+    """
+
+    MAX_BACKOFF_SECONDS = 300
+
+    def __init__(self, db_manager: DatabaseManager, hub_url: str, kiosk_id: str,
+                 interval_seconds: float = 30, batch_size: int = 500, timeout: float = 10):
+        self.db_manager = db_manager
+        self.hub_url = hub_url.rstrip('/')
+        self.kiosk_id = kiosk_id
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.failures = 0
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='sync-client', daemon=True)
+
+    @classmethod
+    def from_config(cls, db_manager: DatabaseManager, sync_config) -> 'SyncClient':
+        return cls(
+            db_manager,
+            hub_url=sync_config.hub_url,
+            kiosk_id=sync_config.kiosk_id,
+            interval_seconds=sync_config.interval_seconds,
+            batch_size=sync_config.batch_size
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stopped = True
+        self._wake.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def push_soon(self):
+        """Push without waiting for the next interval, e.g. right after a clock in/out"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopped:
+            # A locked kiosk database or a malformed hub reply must not end the
+            # thread either; like a lost hub they are retried with backoff
+            try:
+                self.push_pending()
+                self.failures = 0
+            except (SyncError, OSError, sqlite3.Error, ValueError) as e:
+                self.failures += 1
+                print(f"Sync to {self.hub_url} failed ({self.failures} in a row): {e}")
+
+            self._wake.wait(self._next_delay())
+            self._wake.clear()
+
+    def _next_delay(self) -> float:
+        if not self.failures:
+            return self.interval_seconds
+        # Full jitter keeps kiosks that lost the hub together from retrying in lockstep
+        backoff = min(self.MAX_BACKOFF_SECONDS, self.interval_seconds * 2 ** self.failures)
+        return random.uniform(self.interval_seconds, max(self.interval_seconds, backoff))
+
+    def push_pending(self) -> int:
+        """Push every unacknowledged change in batches; returns the number of records sent"""
+        sent = 0
+        while True:
+            last_seq = self.db_manager.get_sync_seq(self.hub_url)
+            changes = self.db_manager.changes_since(last_seq, limit=self.batch_size)
+            if not changes:
+                return sent
+
+            records = self._build_records(changes)
+            if records:
+                self._post('/sync', {'kiosk_id': self.kiosk_id, 'records': records})
+                sent += len(records)
+            # Only advance once the hub has acknowledged the batch
+            self.db_manager.set_sync_seq(self.hub_url, changes[-1].seq)
+
+    def _build_records(self, changes) -> List[Dict]:
+        """Coalesce a batch of changes to the current state of each touched record"""
+        latest = {}
+        for change in changes:
+            latest[change.record_id] = change
+
+        live_ids = [record_id for record_id, change in latest.items() if change.operation != 'delete']
+        records = {record.id: record for record in self.db_manager.get_time_records_by_ids(live_ids)}
+        uids = self.db_manager.get_record_uids(live_ids)
+        names = {employee.id: employee.name for employee in self.db_manager.get_employees(active_only=False)}
+
+        payload = []
+        for record_id, change in latest.items():
+            if change.operation == 'delete':
+                # Deletes logged before records had uids cannot be matched on the hub
+                if change.uid:
+                    payload.append({'uid': change.uid, 'deleted': True})
+                continue
+
+            record = records.get(record_id)
+            uid = uids.get(record_id)
+            if record is None or uid is None:
+                # Deleted by a later change (sent with a later batch) or archived since
+                continue
+            payload.append({
+                'uid': uid,
+                'employee': names.get(record.employee_id),
+                'clock_in': record.clock_in.isoformat(),
+                'clock_out': record.clock_out.isoformat() if record.clock_out else None,
+                'deleted': False
+            })
+        return payload
+
+    def _post(self, path: str, body: Dict) -> Dict:
+        data = zlib.compress(json.dumps(body, separators=(',', ':')).encode('utf-8'))
+        request = urllib.request.Request(
+            self.hub_url + path,
+            data=data,
+            headers={'Content-Type': 'application/json', 'Content-Encoding': 'deflate'},
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read() or b'{}')
+        except urllib.error.HTTPError as e:
+            raise SyncError(f"hub returned {e.code}: {e.read().decode('utf-8', 'replace')}") from e
+
+
+class SyncHub:
+    """Central store that merges batches pushed by kiosks.
+
+    Requests are handled one at a time: merges serialize on the database write
+    lock anyway, and a single thread keeps to a single SQLite connection.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, host: str = '0.0.0.0', port: int = 8765):
+        self.db_manager = db_manager
+        self.server = HTTPServer((host, port), self._make_handler())
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def merge_batch(self, batch: Dict) -> int:
+        records = batch.get('records')
+        if not isinstance(records, list):
+            raise ValueError("batch has no records list")
+
+        names = {record['employee'] for record in records if not record.get('deleted')}
+        if None in names:
+            raise ValueError("record without an employee name")
+        employee_ids = self.db_manager.get_employee_ids_by_name(names, create_missing=True)
+
+        def parse(value):
+            return datetime.datetime.fromisoformat(value) if value else None
+
+        rows = []
+        for record in records:
+            if record.get('deleted'):
+                rows.append((record['uid'], None, None, None, True))
+            else:
+                rows.append((record['uid'], employee_ids[record['employee']],
+                             parse(record['clock_in']), parse(record.get('clock_out')), False))
+        return self.db_manager.merge_records(rows)
+
+    def _make_handler(self):
+        hub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/status':
+                    self._reply(404, {'error': 'not found'})
+                    return
+                self._reply(200, {'change_seq': hub.db_manager.get_change_seq()})
+
+            def do_POST(self):
+                if self.path != '/sync':
+                    self._reply(404, {'error': 'not found'})
+                    return
+                try:
+                    body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                    if self.headers.get('Content-Encoding') == 'deflate':
+                        body = zlib.decompress(body)
+                    batch = json.loads(body)
+                    merged = hub.merge_batch(batch)
+                except (ValueError, KeyError, TypeError, zlib.error) as e:
+                    self._reply(400, {'error': str(e)})
+                    return
+                print(f"Merged {merged} of {len(batch['records'])} records from {batch.get('kiosk_id', '?')}")
+                self._reply(200, {'merged': merged})
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Kiosk to hub record sync')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    hub_parser = subparsers.add_parser('hub', help='Run the central hub')
+    hub_parser.add_argument('--db', default='hub.db', help='Hub database file (default: hub.db)')
+    hub_parser.add_argument('--host', default='0.0.0.0')
+    hub_parser.add_argument('--port', type=int, default=8765)
+
+    push_parser = subparsers.add_parser('push', help='Push pending changes from this kiosk once')
+    push_parser.add_argument('--hub', help='Hub URL (default: [sync] hub_url in settings.toml)')
+
+    args = parser.parse_args()
+
+    if args.command == 'hub':
+        hub = SyncHub(DatabaseManager(args.db), args.host, args.port)
+        print(f"Sync hub listening on {args.host}:{hub.port}, storing to {args.db}")
+        try:
+            hub.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    from .config import Config
+    config = Config()
+    db_manager = DatabaseManager.from_config(config.database)
+    client = SyncClient.from_config(db_manager, config.sync)
+    if args.hub:
+        client.hub_url = args.hub.rstrip('/')
+    try:
+        sent = client.push_pending()
+    except (SyncError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        db_manager.close()
+    print(f"Pushed {sent} records to {client.hub_url}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+import datetime
+
+import pytest
+
+from spf_time.database import DatabaseManager, TimeRecord
+from spf_time.interval_index import IntervalIndex, OverlapError
+from spf_time.storage import MemoryBackend
+
+D = datetime.datetime
+
+
+@pytest.fixture(params=['sqlite', 'memory'])
+def db(request, tmp_path):
+    if request.param == 'memory':
+        yield MemoryBackend()
+        return
+    db = DatabaseManager(str(tmp_path / 'time.db'), archive_dir=str(tmp_path / 'archive'))
+    yield db
+    db.close()
+
+
+def test_index_treats_sessions_as_half_open():
+    index = IntervalIndex([TimeRecord(1, 7, D(2024, 3, 4, 9), D(2024, 3, 4, 17))])
+
+    assert index.find_overlap(7, D(2024, 3, 4, 16), D(2024, 3, 4, 18)).id == 1
+    assert index.find_overlap(7, D(2024, 3, 4, 17), D(2024, 3, 4, 18)) is None
+    assert index.find_overlap(7, D(2024, 3, 4, 8), D(2024, 3, 4, 9)) is None
+    assert index.find_overlap(8, D(2024, 3, 4, 10), D(2024, 3, 4, 11)) is None
+    # A record never conflicts with itself
+    assert index.find_overlap(7, D(2024, 3, 4, 10), D(2024, 3, 4, 11), record_id=1) is None
+
+
+def test_index_stabbing_queries_include_long_and_open_sessions():
+    index = IntervalIndex([
+        TimeRecord(1, 7, D(2024, 3, 3, 22), D(2024, 3, 4, 6)),
+        TimeRecord(2, 7, D(2024, 3, 4, 9), D(2024, 3, 4, 10)),
+        TimeRecord(3, 8, D(2024, 3, 1, 9)),
+    ])
+
+    assert [record.id for record in index.at(D(2024, 3, 4, 5))] == [3, 1]
+    assert [record.id for record in index.between(D(2024, 3, 4, 6), D(2024, 3, 4, 9))] == [3]
+    assert [record.id for record in index.between(D(2024, 3, 4, 0), D(2024, 3, 5), employee_id=7)] == [1, 2]
+
+    index.remove(1)
+    assert [record.id for record in index.at(D(2024, 3, 4, 5))] == [3]
+
+
+def test_add_and_update_reject_overlapping_sessions(db):
+    employee_id = db.add_employee('Alice')
+    db.add_time_record(employee_id, D(2024, 3, 4, 9), D(2024, 3, 4, 17))
+    record_id = db.add_time_record(employee_id, D(2024, 3, 5, 9), D(2024, 3, 5, 17))
+
+    with pytest.raises(OverlapError):
+        db.add_time_record(employee_id, D(2024, 3, 4, 16), D(2024, 3, 4, 18))
+    with pytest.raises(OverlapError):
+        db.update_time_record(record_id, D(2024, 3, 4, 12), D(2024, 3, 4, 20))
+
+    # Back to back is fine, and so is moving a record within its own old span
+    db.add_time_record(employee_id, D(2024, 3, 4, 17), D(2024, 3, 4, 18))
+    assert db.update_time_record(record_id, D(2024, 3, 5, 10), D(2024, 3, 5, 16))
+    assert len(db.get_time_records()) == 3
+
+
+def test_bulk_insert_is_all_or_nothing_on_overlap(db):
+    employee_id = db.add_employee('Alice')
+    other_id = db.add_employee('Bob')
+    db.add_time_record(employee_id, D(2024, 3, 4, 9), D(2024, 3, 4, 17))
+
+    # Against a stored session
+    with pytest.raises(OverlapError):
+        db.bulk_insert_time_records(iter([
+            (other_id, D(2024, 3, 4, 9), D(2024, 3, 4, 17)),
+            (employee_id, D(2024, 3, 4, 16), D(2024, 3, 4, 18)),
+        ]))
+    # Against an earlier row of the same batch
+    with pytest.raises(OverlapError):
+        db.bulk_insert_time_records(iter([
+            (employee_id, D(2024, 3, 6, 9), D(2024, 3, 6, 17)),
+            (employee_id, D(2024, 3, 6, 12), D(2024, 3, 6, 13)),
+        ]))
+    assert len(db.get_time_records()) == 1
+
+    assert db.bulk_insert_time_records(iter([
+        (employee_id, D(2024, 3, 4, 17), D(2024, 3, 4, 18)),
+        (other_id, D(2024, 3, 4, 9), D(2024, 3, 4, 17)),
+    ])) == 2
+    # The rows of a successful batch are checked by later writes
+    with pytest.raises(OverlapError):
+        db.add_time_record(other_id, D(2024, 3, 4, 12), D(2024, 3, 4, 13))
+
+
+def test_sessions_at_and_between(db):
+    alice = db.add_employee('Alice')
+    bob = db.add_employee('Bob')
+    db.add_time_record(alice, D(2024, 3, 4, 22), D(2024, 3, 5, 6))
+    db.add_time_record(bob, D(2024, 3, 5, 5), D(2024, 3, 5, 13))
+
+    assert [record.employee_id for record in db.get_sessions_at(D(2024, 3, 5, 5, 30))] == [alice, bob]
+    assert [record.employee_id for record in db.get_sessions_at(D(2024, 3, 5, 6))] == [bob]
+    assert [record.employee_id for record in db.get_sessions_between(
+        D(2024, 3, 5), D(2024, 3, 6), employee_id=alice)] == [alice]
+
+
+def test_overlap_with_archived_session_is_rejected(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'time.db'), archive_dir=str(tmp_path / 'archive'))
+    try:
+        employee_id = db.add_employee('Alice')
+        db.add_time_record(employee_id, D(2022, 12, 31, 22), D(2023, 1, 1, 6))
+        db.add_time_record(employee_id, D(2023, 6, 1, 9), D(2023, 6, 1, 17))
+        record_id = db.add_time_record(employee_id, D(2024, 6, 1, 9), D(2024, 6, 1, 17))
+        assert db.archive_closed_records(datetime.date(2024, 1, 1)) == 2
+
+        with pytest.raises(OverlapError):
+            db.add_time_record(employee_id, D(2023, 6, 1, 12), D(2023, 6, 1, 13))
+        # Reaches back into the previous year's archive
+        with pytest.raises(OverlapError):
+            db.add_time_record(employee_id, D(2023, 1, 1, 5), D(2023, 1, 1, 7))
+        with pytest.raises(OverlapError):
+            db.update_time_record(record_id, D(2023, 6, 1, 16), D(2023, 6, 1, 18))
+        with pytest.raises(OverlapError):
+            db.bulk_insert_time_records([(employee_id, D(2023, 6, 1, 8), D(2023, 6, 1, 10))])
+
+        db.add_time_record(employee_id, D(2023, 6, 1, 17), D(2023, 6, 1, 18))
+        assert [record.clock_in for record in db.get_sessions_at(D(2023, 6, 1, 12))] == [D(2023, 6, 1, 9)]
+    finally:
+        db.close()
@@ -0,0 +1,85 @@
+import datetime
+import sqlite3
+
+from spf_time.database import SCHEMA_VERSION_MASK, DatabaseManager
+
+# Schema written by the first release, before any migration existed
+BASELINE_SCHEMA = '''
+    CREATE TABLE employees (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE,
+        is_active BOOLEAN DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE time_records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id INTEGER NOT NULL,
+        clock_in TIMESTAMP NOT NULL,
+        clock_out TIMESTAMP NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (employee_id) REFERENCES employees (id)
+    );
+    CREATE INDEX idx_employee_id ON time_records(employee_id);
+    CREATE INDEX idx_clock_in ON time_records(clock_in);
+'''
+
+
+def test_upgrade_baseline_database_with_duplicate_open_sessions(tmp_path):
+    db_path = str(tmp_path / 'baseline.db')
+    conn = sqlite3.connect(db_path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute("INSERT INTO employees (name) VALUES ('Alice')")
+    conn.executemany('INSERT INTO time_records (employee_id, clock_in, clock_out) VALUES (1, ?, ?)', [
+        ('2024-03-04 09:00:00', '2024-03-04 12:00:00'),
+        ('2024-03-05 09:00:00', None),
+        ('2024-03-06 09:00:00', None),
+    ])
+    conn.commit()
+    conn.close()
+
+    db = DatabaseManager(db_path)
+    try:
+        latest = db._schema_migrations()[-1][0]
+        assert db._user_version() & SCHEMA_VERSION_MASK == latest
+
+        # The older open session is closed when the next one started; the latest stays open
+        records = sorted(db.get_time_records(), key=lambda record: record.clock_in)
+        assert [record.clock_out for record in records] == [
+            datetime.datetime(2024, 3, 4, 12),
+            datetime.datetime(2024, 3, 6, 9),
+            None,
+        ]
+        assert db.get_current_session(1).clock_in == datetime.datetime(2024, 3, 6, 9)
+
+        hours = db.get_daily_hours(datetime.date(2024, 3, 4), datetime.date(2024, 3, 6))
+        assert hours == {1: {datetime.date(2024, 3, 4): 3.0,
+                             datetime.date(2024, 3, 5): 15.0,
+                             datetime.date(2024, 3, 6): 9.0}}
+        assert db.get_payroll_periods() == []
+    finally:
+        db.close()
+
+
+def test_epoch_conversion_leaves_rollup_equal_to_a_rebuild(tmp_path):
+    db_path = str(tmp_path / 'text.db')
+    archive_dir = str(tmp_path / 'archive')
+    db = DatabaseManager(db_path, archive_dir=archive_dir)
+    try:
+        employee_id = db.add_employee('Alice')
+        # Sub-second parts are dropped by the conversion, in the hot table and in archives
+        db.add_time_record(employee_id, datetime.datetime(2023, 6, 1, 9, 0, 0, 900000),
+                           datetime.datetime(2023, 6, 1, 17, 0, 0, 100000))
+        db.add_time_record(employee_id, datetime.datetime(2024, 3, 4, 22, 0, 0, 250000),
+                           datetime.datetime(2024, 3, 5, 6, 0, 0, 750000))
+        assert db.archive_closed_records(datetime.date(2024, 1, 1)) == 1
+    finally:
+        db.close()
+
+    db = DatabaseManager(db_path, archive_dir=archive_dir, timestamp_storage='epoch')
+    try:
+        converted = db.get_daily_hours(datetime.date(2023, 1, 1), datetime.date(2024, 12, 31))
+        db.rebuild_daily_hours()
+        assert converted == db.get_daily_hours(datetime.date(2023, 1, 1), datetime.date(2024, 12, 31))
+        assert converted[employee_id][datetime.date(2023, 6, 1)] == 8.0
+    finally:
+        db.close()
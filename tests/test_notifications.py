@@ -0,0 +1,93 @@
+import datetime
+import os
+import queue
+import threading
+
+import pytest
+
+from spf_time.business_rules import TimeTrackingRules
+from spf_time.config import Config
+from spf_time.database import DatabaseManager
+from spf_time.notifications import BREAK_REMINDER, NotificationEngine
+from spf_time.scheduler import DeadlineScheduler
+
+SETTINGS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'settings.toml')
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'time.db'))
+    yield db
+    db.close()
+
+
+def test_scheduler_runs_each_key_once_at_its_latest_deadline():
+    fired = queue.Queue()
+    scheduler = DeadlineScheduler(lambda keys: fired.put((sorted(keys), datetime.datetime.now())))
+    scheduler.start()
+    try:
+        now = datetime.datetime.now()
+        scheduler.schedule('a', now + datetime.timedelta(seconds=0.05))
+        scheduler.schedule('b', now + datetime.timedelta(seconds=0.05))
+        scheduler.schedule('cancelled', now + datetime.timedelta(seconds=0.05))
+        scheduler.cancel('cancelled')
+        # Rescheduling replaces the earlier deadline rather than adding one
+        scheduler.schedule('b', now + datetime.timedelta(seconds=0.3))
+
+        keys, fired_at = fired.get(timeout=5)
+        assert keys == ['a']
+        keys, fired_at = fired.get(timeout=5)
+        assert keys == ['b']
+        assert fired_at >= now + datetime.timedelta(seconds=0.3)
+        assert scheduler.get_deadline('b') is None
+        with pytest.raises(queue.Empty):
+            fired.get(timeout=0.2)
+    finally:
+        scheduler.stop(5)
+
+
+def test_scheduler_survives_a_failing_handler():
+    calls = []
+    done = threading.Event()
+
+    def handler(keys):
+        calls.append(keys)
+        if len(calls) == 1:
+            raise RuntimeError('boom')
+        done.set()
+
+    scheduler = DeadlineScheduler(handler)
+    scheduler.start()
+    try:
+        scheduler.schedule('first', datetime.datetime.now())
+        scheduler.schedule('second', datetime.datetime.now() + datetime.timedelta(seconds=0.05))
+        assert done.wait(5)
+        assert calls == [['first'], ['second']]
+    finally:
+        scheduler.stop(5)
+
+
+def test_engine_raises_a_due_break_reminder_and_clears_it_on_clock_out(db):
+    rules = TimeTrackingRules(db, Config(SETTINGS_PATH))
+    updates = queue.Queue()
+    engine = NotificationEngine(rules, rules.config.notifications,
+                                lambda employee_id, alerts: updates.put((employee_id, alerts)))
+    engine.start()
+    try:
+        employee_id = db.add_employee('Alice')
+        # Past the four hour break reminder, but well short of the overtime alert
+        clock_in = datetime.datetime.now() - datetime.timedelta(hours=4, minutes=30)
+        db.add_time_record(employee_id, clock_in, None)
+        engine.on_session_changed(employee_id, db.get_current_session(employee_id))
+
+        notified_id, alerts = updates.get(timeout=5)
+        assert notified_id == employee_id
+        assert [alert.kind for alert in alerts] == [BREAK_REMINDER]
+        assert [alert.kind for alert in engine.get_alerts(employee_id)] == [BREAK_REMINDER]
+
+        db.clock_out(employee_id)
+        engine.on_session_changed(employee_id, None)
+        assert updates.get(timeout=5) == (employee_id, [])
+        assert engine.get_alerts(employee_id) == []
+    finally:
+        engine.stop(5)
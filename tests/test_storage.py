@@ -0,0 +1,115 @@
+import datetime
+import os
+import sqlite3
+
+import pytest
+
+from spf_time.config import Config
+from spf_time.database import DatabaseManager, Tap
+from spf_time.report_generator import ReportGenerator
+from spf_time.storage import MemoryBackend, StorageBackend
+
+H = datetime.timedelta(hours=1)
+SETTINGS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'settings.toml')
+
+
+@pytest.fixture
+def config():
+    return Config(SETTINGS_PATH)
+
+
+@pytest.fixture
+def backends(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'time.db'))
+    yield db, MemoryBackend()
+    db.close()
+
+
+def populate(backend, start_date, end_date):
+    """Sessions around one report period: inside, crossing either edge, outside and still open"""
+    start = datetime.datetime.combine(start_date, datetime.time.min)
+    end = datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min)
+    alice = backend.add_employee('Alice')
+    bob = backend.add_employee('Bob')
+    backend.add_time_record(alice, start - 4 * H, start + 4 * H)
+    backend.add_time_record(alice, start + 30 * H, start + 38 * H)
+    backend.add_time_record(alice, end - 2 * H, end + 6 * H)
+    backend.add_time_record(alice, start - 30 * H, start - 20 * H)
+    backend.add_time_record(bob, start + 9 * H, start + 17 * H)
+    backend.add_time_record(bob, end - H, None)
+
+
+def record_times(records):
+    return [(record.employee_id, record.clock_in, record.clock_out) for record in records]
+
+
+def test_both_backends_implement_the_interface(backends):
+    for backend in backends:
+        assert isinstance(backend, StorageBackend)
+
+
+def test_report_queries_match_across_backends(backends, config):
+    start_date, end_date = ReportGenerator(config, backends[0]).get_previous_complete_weeks_range(1)
+    for backend in backends:
+        populate(backend, start_date, end_date)
+    db, memory = backends
+
+    for kwargs in ({}, {'start_date': start_date, 'end_date': end_date},
+                   {'start_date': start_date, 'end_date': end_date, 'overlapping': True},
+                   {'employee_id': 1, 'start_date': start_date, 'overlapping': True}):
+        assert record_times(db.get_time_records(**kwargs)) == record_times(memory.get_time_records(**kwargs))
+    assert record_times(db.iter_time_records(start_date=start_date, descending=False, overlapping=True)) == \
+        record_times(memory.iter_time_records(start_date=start_date, descending=False, overlapping=True))
+
+    assert db.get_daily_hours(start_date, end_date) == memory.get_daily_hours(start_date, end_date)
+    moment = datetime.datetime.combine(start_date, datetime.time(1))
+    assert record_times(db.get_sessions_at(moment)) == record_times(memory.get_sessions_at(moment))
+
+
+def test_reports_match_across_backends(backends, config):
+    start_date, end_date = ReportGenerator(config, backends[0]).get_previous_complete_weeks_range(1)
+    reports = []
+    for backend in backends:
+        populate(backend, start_date, end_date)
+        generator = ReportGenerator(config, backend)
+        records, employees, report_start, report_end = generator.get_report_data(1)
+        rows = list(generator._session_rows(records, employees, report_start, report_end))
+        totals = generator.calculate_employee_totals(records, employees, report_start, report_end)
+        reports.append((rows, totals, generator.generate_csv_report(records, employees, report_start, report_end)))
+
+    assert reports[0] == reports[1]
+    rows, totals, _ = reports[0]
+    # Rows are clipped to the period, so closed sessions add up to the totals
+    assert totals == {'Alice': 14.0, 'Bob': 8.0}
+    assert all(start_date.isoformat() <= row[1] <= end_date.isoformat() for row in rows)
+
+
+def test_tap_batches_are_all_or_nothing_on_both_backends(backends):
+    now = datetime.datetime(2024, 3, 4, 9)
+    for backend in backends:
+        employee_id = backend.add_employee('Alice')
+        backend.add_time_record(employee_id, now - H, None)
+        with pytest.raises(sqlite3.IntegrityError):
+            backend._apply_taps([
+                Tap(1, 'clock_out', employee_id, now),
+                Tap(2, 'clock_in', employee_id, now + H),
+                Tap(3, 'clock_in', employee_id, now + 2 * H),
+            ], 3)
+        assert record_times(backend.get_time_records()) == [(employee_id, now - H, None)]
+        assert backend.get_last_applied_tap_seq() == 0
+
+
+def test_returned_objects_are_copies(backends):
+    for backend in backends:
+        employee_id = backend.add_employee('Alice')
+        backend.add_time_record(employee_id, datetime.datetime(2024, 3, 4, 9), None)
+
+        backend.get_employee(employee_id).name = 'Mallory'
+        backend.get_employee_by_name('Alice').is_active = False
+        backend.get_current_session(employee_id).clock_in = datetime.datetime(2000, 1, 1)
+        backend.get_open_sessions()[employee_id].employee_id = 99
+
+        assert backend.get_employee(employee_id).name == 'Alice'
+        assert backend.get_employee_by_name('Alice').is_active
+        assert backend.get_current_session(employee_id).clock_in == datetime.datetime(2024, 3, 4, 9)
+        assert backend.get_open_sessions()[employee_id].employee_id == employee_id
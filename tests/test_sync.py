@@ -0,0 +1,112 @@
+import datetime
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from spf_time.database import DatabaseManager
+from spf_time.sync import SyncClient, SyncHub
+
+D = datetime.datetime
+
+
+@pytest.fixture
+def kiosk(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'kiosk.db'))
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def hub(tmp_path):
+    hub = SyncHub(DatabaseManager(str(tmp_path / 'hub.db')), host='127.0.0.1', port=0)
+    thread = threading.Thread(target=hub.serve_forever, daemon=True)
+    thread.start()
+    yield hub
+    hub.shutdown()
+    thread.join(5)
+    hub.db_manager.close()
+
+
+def hub_sessions(hub):
+    names = {employee.id: employee.name for employee in hub.db_manager.get_employees(active_only=False)}
+    return sorted((names[record.employee_id], record.clock_in, record.clock_out)
+                  for record in hub.db_manager.get_time_records())
+
+
+def test_batch_is_coalesced_to_the_latest_state_of_each_record(kiosk):
+    employee_id = kiosk.add_employee('Alice')
+    kept_id = kiosk.add_time_record(employee_id, D(2024, 3, 4, 9), D(2024, 3, 4, 17))
+    kiosk.update_time_record(kept_id, D(2024, 3, 4, 8), D(2024, 3, 4, 16))
+    deleted_id = kiosk.add_time_record(employee_id, D(2024, 3, 5, 9), D(2024, 3, 5, 17))
+    deleted_uid = kiosk.get_record_uids([deleted_id])[deleted_id]
+    kiosk.delete_time_record(deleted_id)
+
+    client = SyncClient(kiosk, 'http://hub.invalid', 'kiosk-1')
+    records = client._build_records(kiosk.changes_since(0))
+
+    assert records == [
+        {'uid': kiosk.get_record_uids([kept_id])[kept_id], 'employee': 'Alice',
+         'clock_in': '2024-03-04T08:00:00', 'clock_out': '2024-03-04T16:00:00', 'deleted': False},
+        {'uid': deleted_uid, 'deleted': True},
+    ]
+
+
+def test_push_merges_into_the_hub_and_follows_edits(kiosk, hub):
+    employee_id = kiosk.add_employee('Alice')
+    record_id = kiosk.add_time_record(employee_id, D(2024, 3, 4, 9), D(2024, 3, 4, 17))
+    kiosk.add_time_record(kiosk.add_employee('Bob'), D(2024, 3, 4, 10), D(2024, 3, 4, 18))
+    client = SyncClient(kiosk, f'http://127.0.0.1:{hub.port}', 'kiosk-1', batch_size=1)
+
+    assert client.push_pending() == 2
+    assert hub_sessions(hub) == [
+        ('Alice', D(2024, 3, 4, 9), D(2024, 3, 4, 17)),
+        ('Bob', D(2024, 3, 4, 10), D(2024, 3, 4, 18)),
+    ]
+    # Only acknowledged changes are skipped next time
+    assert client.push_pending() == 0
+
+    kiosk.update_time_record(record_id, D(2024, 3, 4, 8), D(2024, 3, 4, 16))
+    assert client.push_pending() == 1
+    kiosk.delete_time_record(record_id)
+    assert client.push_pending() == 1
+    assert hub_sessions(hub) == [('Bob', D(2024, 3, 4, 10), D(2024, 3, 4, 18))]
+    assert hub.db_manager.get_daily_hours(D(2024, 3, 4).date(), D(2024, 3, 4).date()) == {
+        hub.db_manager.get_employee_by_name('Bob').id: {D(2024, 3, 4).date(): 8.0}
+    }
+
+
+def test_merging_a_batch_twice_is_harmless(hub):
+    batch = {'kiosk_id': 'kiosk-1', 'records': [
+        {'uid': 'a' * 32, 'employee': 'Alice', 'clock_in': '2024-03-04T09:00:00',
+         'clock_out': '2024-03-04T17:00:00', 'deleted': False},
+    ]}
+
+    assert hub.merge_batch(batch) == 1
+    assert hub.merge_batch(batch) == 0
+    assert hub_sessions(hub) == [('Alice', D(2024, 3, 4, 9), D(2024, 3, 4, 17))]
+
+
+def test_client_thread_survives_database_and_reply_errors(kiosk):
+    client = SyncClient(kiosk, 'http://hub.invalid', 'kiosk-1', interval_seconds=0.01)
+    errors = [sqlite3.OperationalError('database is locked'), ValueError('malformed reply')]
+    calls = []
+
+    def push_pending():
+        calls.append(None)
+        if errors:
+            raise errors.pop(0)
+        return 0
+
+    client.push_pending = push_pending
+    client.start()
+    try:
+        deadline = time.monotonic() + 5
+        while (len(calls) < 3 or client.failures) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # Both errors were counted as failures and retried, and the next push succeeded
+        assert len(calls) >= 3
+        assert client.failures == 0
+    finally:
+        client.stop(5)